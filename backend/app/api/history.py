@@ -0,0 +1,194 @@
+"""
+history.py
+Prediction-history queries over the typed, indexed columns of `predictions`.
+
+- GET /api/history/predictions: newest-first rows for a wallet/protocol with
+  keyset pagination on (timestamp, id), so deep pages cost the same as the
+  first one (served by the (user_wallet|protocol, timestamp) indexes).
+- GET /api/history/aggregates: min/avg/max risk per wallet per time bucket,
+  computed in SQL.
+- GET /api/history/prices: stored price history of one asset as raw points
+  or 1h/1d OHLC bars (services/price_store.py), read as an index range.
+"""
+
+import base64
+import datetime
+from typing import Optional, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import BigInteger, and_, cast, func, or_, select
+from sqlalchemy.orm import Session
+
+from ..db import FEATURE_COLUMNS, Prediction, get_db
+from ..schemas import HistoryPage, PriceHistory, RiskAggregates
+from ..services.market_cache import resolve_asset_id
+from ..services.price_stats import parse_horizon
+from ..services.price_store import RAW, get_store
+
+router = APIRouter(prefix="/api/history", tags=["History"])
+
+MIN_BUCKET_SECONDS = 60
+
+
+def _encode_cursor(ts: datetime.datetime, row_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{ts.isoformat()}|{row_id}".encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime.datetime, int]:
+    try:
+        ts, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.datetime.fromisoformat(ts), int(row_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _filters(wallet, protocol, since, until):
+    conds = []
+    if wallet:
+        conds.append(Prediction.user_wallet == wallet)
+    if protocol:
+        conds.append(Prediction.protocol == protocol)
+    if since:
+        conds.append(Prediction.timestamp >= since)
+    if until:
+        conds.append(Prediction.timestamp < until)
+    return conds
+
+
+@router.get("/predictions", response_model=HistoryPage)
+def prediction_history(
+    wallet: Optional[str] = None,
+    protocol: Optional[str] = None,
+    since: Optional[datetime.datetime] = None,
+    until: Optional[datetime.datetime] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    feature_cols = [getattr(Prediction, name) for name in FEATURE_COLUMNS]
+    q = select(
+        Prediction.id, Prediction.timestamp, Prediction.user_wallet, Prediction.protocol,
+        Prediction.risk_probability, Prediction.risk_class, *feature_cols,
+    ).where(*_filters(wallet, protocol, since, until))
+
+    if cursor:
+        ts, row_id = _decode_cursor(cursor)
+        q = q.where(or_(
+            Prediction.timestamp < ts,
+            and_(Prediction.timestamp == ts, Prediction.id < row_id),
+        ))
+
+    rows = db.execute(
+        q.order_by(Prediction.timestamp.desc(), Prediction.id.desc()).limit(limit + 1)
+    ).all()
+
+    items = [
+        {
+            "id": r.id,
+            "timestamp": r.timestamp,
+            "user_wallet": r.user_wallet,
+            "protocol": r.protocol,
+            "risk_probability": r.risk_probability,
+            "risk_class": r.risk_class,
+            "features": {name: getattr(r, name) for name in FEATURE_COLUMNS},
+        }
+        for r in rows[:limit]
+    ]
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = _encode_cursor(last.timestamp, last.id)
+    return {"items": items, "next_cursor": next_cursor}
+
+
+def _epoch_seconds(db: Session):
+    if db.bind.dialect.name == "sqlite":
+        return cast(func.strftime("%s", Prediction.timestamp), BigInteger)
+    return cast(func.extract("epoch", Prediction.timestamp), BigInteger)
+
+
+@router.get("/aggregates", response_model=RiskAggregates)
+def risk_aggregates(
+    interval: str = "1h",
+    wallet: Optional[str] = None,
+    protocol: Optional[str] = None,
+    since: Optional[datetime.datetime] = None,
+    until: Optional[datetime.datetime] = None,
+    limit: int = Query(1000, ge=1, le=10000),
+    db: Session = Depends(get_db),
+):
+    try:
+        seconds = int(parse_horizon(interval))
+    except (ValueError, IndexError):
+        raise HTTPException(status_code=400, detail=f"Invalid interval {interval!r}")
+    if seconds < MIN_BUCKET_SECONDS:
+        raise HTTPException(status_code=400, detail=f"interval must be >= {MIN_BUCKET_SECONDS}s")
+
+    # Integer division on epoch seconds works the same on SQLite and Postgres
+    bucket = (_epoch_seconds(db) // seconds).label("bucket")
+    rows = db.execute(
+        select(
+            Prediction.user_wallet,
+            bucket,
+            func.count(Prediction.id),
+            func.min(Prediction.risk_probability),
+            func.avg(Prediction.risk_probability),
+            func.max(Prediction.risk_probability),
+        )
+        .where(Prediction.risk_probability.is_not(None), *_filters(wallet, protocol, since, until))
+        .group_by(Prediction.user_wallet, bucket)
+        .order_by(Prediction.user_wallet, bucket)
+        .limit(limit)
+    ).all()
+
+    return {
+        "interval_seconds": seconds,
+        "buckets": [
+            {
+                "user_wallet": w,
+                "bucket_start": datetime.datetime.utcfromtimestamp(int(b) * seconds),
+                "count": n,
+                "min_risk": round(lo, 2),
+                "avg_risk": round(avg, 2),
+                "max_risk": round(hi, 2),
+            }
+            for w, b, n, lo, avg, hi in rows
+        ],
+    }
+
+
+def _epoch(ts: Optional[datetime.datetime]) -> Optional[float]:
+    if ts is None:
+        return None
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=datetime.timezone.utc)
+    return ts.timestamp()
+
+
+@router.get("/prices", response_model=PriceHistory)
+def price_history(
+    asset: str = "eth",
+    resolution: str = "1h",
+    since: Optional[datetime.datetime] = None,
+    until: Optional[datetime.datetime] = None,
+    limit: int = Query(1000, ge=1, le=10000),
+):
+    store = get_store()
+    if resolution != RAW and resolution not in store.resolutions:
+        raise HTTPException(
+            status_code=400,
+            detail=f"resolution must be one of {', '.join((RAW, *store.resolutions))}",
+        )
+    asset_id = resolve_asset_id(asset)
+    bars = store.bars(asset_id, _epoch(since), _epoch(until), resolution, limit)
+    return {
+        "asset": asset_id,
+        "resolution": resolution,
+        "bars": [
+            {
+                "bucket_start": datetime.datetime.utcfromtimestamp(b["ts"]),
+                **{k: b[k] for k in ("open", "high", "low", "close", "count")},
+            }
+            for b in bars
+        ],
+    }
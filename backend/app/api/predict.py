@@ -1,46 +1,55 @@
 from fastapi import APIRouter, HTTPException
-from ..schemas import RiskInput, RiskOutput
-from ..services.risk_model import predict
-from ..db import SessionLocal, Prediction
+from ..schemas import RiskInput, RiskOutput, BatchRiskOutput
+from ..services.risk_model import predict, predict_batch
+from ..services.features import FeatureLike, FeatureVector
+from ..services.market_cache import get_market_data
+from ..db import prediction_row
+from ..services.prediction_writer import submit_predictions
+from ..services.metrics import STAGE_SECONDS, timed
+from ..services.subgraph_loader import loader_scope
+from ..config import settings
+from typing import Dict, List, Tuple
+import asyncio
 import datetime
-import requests
 
 # Router with prefix `/api`
 router = APIRouter(prefix="/api", tags=["Risk Prediction"])
 
 
 # --- 🟢 Market Data Fetcher (Dynamic Asset) ---
-def fetch_market_data(asset_symbol: str):
+async def fetch_market_data(asset_symbol: str):
     """
-    Fetch live asset price (USD) and 24h trend % from CoinGecko for a given symbol.
+    Live asset price (USD) and 24h trend for a given symbol, served from the
+    shared TTL cache (see services/market_cache.py).
     Falls back gracefully if unavailable.
     """
-    symbol_map = {
-        "eth": "ethereum",
-        "btc": "bitcoin",
-        "uni": "uniswap",
-        "aave": "aave",
-        "usdc": "usd-coin",
-        "sol": "solana",
-    }
+    return await get_market_data(asset_symbol)
+
+
+def _needs_market_data(features: FeatureLike) -> bool:
+    return not features.get("asset_price") or not features.get("market_trend")
+
 
-    asset_id = symbol_map.get(asset_symbol.lower(), asset_symbol.lower())
-    try:
-        # ✅ Price
-        url = f"https://api.coingecko.com/api/v3/simple/price?ids={asset_id}&vs_currencies=usd"
-        res = requests.get(url, timeout=5).json()
-        price = res[asset_id]["usd"]
+def _apply_market_data(features: FeatureLike, price: float, trend: float) -> None:
+    features.setdefault("asset_price", price)
+    features.setdefault("market_trend", trend)
 
-        # ✅ Trend (24h %)
-        trend_url = f"https://api.coingecko.com/api/v3/coins/{asset_id}"
-        trend_data = requests.get(trend_url, timeout=5).json()
-        market_trend = trend_data["market_data"]["price_change_percentage_24h"] / 100
 
-        print(f"[MARKET] {asset_symbol.upper()} → ${price:.2f}, trend={market_trend:.4f}")
-        return price, market_trend
-    except Exception as e:
-        print(f"[WARN] Market fetch failed for {asset_symbol}: {e}")
-        return 2000.0, 0.0  # fallback defaults
+async def _save_predictions(rows: List[Tuple[dict, dict]]) -> None:
+    """
+    Queue (input, output) pairs for the write-behind flusher (best-effort).
+    """
+    now = datetime.datetime.utcnow()
+    await submit_predictions([prediction_row(f, r, now) for f, r in rows])
+
+
+def _to_output(result: dict) -> dict:
+    return {
+        "risk_probability": float(result.get("risk_probability", 0.0)),
+        "risk_class": result.get("risk_class", "Unknown"),
+        "action": result.get("action", ""),
+        "explanation": result.get("explanation", ""),
+    }
 
 
 # ✅ FINAL ENDPOINT (matches frontend)
@@ -50,41 +59,67 @@ async def predict_endpoint(payload: RiskInput):
 
     # 🧠 Auto-fetch live market data if not provided
     asset_symbol = features.get("asset_symbol", "eth")
-    if not features.get("asset_price") or not features.get("market_trend"):
-        price, trend = fetch_market_data(asset_symbol)
-        features["asset_price"] = features.get("asset_price", price)
-        features["market_trend"] = features.get("market_trend", trend)
+    if _needs_market_data(features):
+        with timed(STAGE_SECONDS, stage="market_fetch"):
+            price, trend = await fetch_market_data(asset_symbol)
+        _apply_market_data(features, price, trend)
 
     # 🔮 Run the Risk Model (connected to ASI)
     result = await predict(features)
 
-    # 💾 Save to DB (optional best-effort)
-    try:
-        db = SessionLocal()
-        rec = Prediction(
-            timestamp=datetime.datetime.utcnow(),
-            input=features,
-            output=result,
-            protocol=features.get("protocol"),
-            user_wallet=features.get("user_wallet"),
-        )
-        db.add(rec)
-        db.commit()
-    except Exception as e:
-        print(f"[DB WARN] Could not save prediction: {e}")
-    finally:
-        try:
-            db.close()
-        except Exception:
-            pass
+    # 💾 Queue for DB write (write-behind, best-effort)
+    with timed(STAGE_SECONDS, stage="persist"):
+        await _save_predictions([(features, result)])
 
     # 🧩 Validate ASI response
     if "risk_probability" not in result:
         raise HTTPException(status_code=502, detail="ASI returned unexpected response")
 
-    return {
-        "risk_probability": float(result.get("risk_probability", 0.0)),
-        "risk_class": result.get("risk_class", "Unknown"),
-        "action": result.get("action", ""),
-        "explanation": result.get("explanation", ""),
-    }
+    return _to_output(result)
+
+
+# 📦 BATCH ENDPOINT — many positions in one round trip
+@router.post("/predict-risk/batch", response_model=BatchRiskOutput)
+async def predict_batch_endpoint(payload: List[RiskInput]):
+    if len(payload) > settings.BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large: {len(payload)} > {settings.BATCH_MAX_ITEMS}",
+        )
+
+    # Validated once here; everything past this point works on slotted records
+    features_list = [FeatureVector.from_model(p) for p in payload]
+
+    # 🧠 Market data once per distinct asset, fetched concurrently
+    assets = sorted({
+        f.get("asset_symbol", "eth") for f in features_list if _needs_market_data(f)
+    })
+    with timed(STAGE_SECONDS, stage="batch_market_fetch"):
+        market: Dict[str, Tuple[float, float]] = dict(zip(
+            assets,
+            await asyncio.gather(*(fetch_market_data(a) for a in assets)),
+        ))
+    for f in features_list:
+        if _needs_market_data(f):
+            _apply_market_data(f, *market[f.get("asset_symbol", "eth")])
+
+    # 🔮 Bounded-concurrency ASI calls + vectorized local fallback
+    # (wallet positions looked up once per batch, in batched subgraph queries)
+    with loader_scope():
+        results = await predict_batch(features_list, concurrency=settings.ASI_BATCH_CONCURRENCY)
+
+    # 💾 Queue the whole batch for the write-behind flusher
+    with timed(STAGE_SECONDS, stage="batch_persist"):
+        await _save_predictions([
+            (f.as_dict(), r) for f, r in zip(features_list, results) if not isinstance(r, BaseException)
+        ])
+
+    items = []
+    for i, r in enumerate(results):
+        if isinstance(r, BaseException):
+            items.append({"index": i, "ok": False, "error": str(r) or type(r).__name__})
+        elif "risk_probability" not in r:
+            items.append({"index": i, "ok": False, "error": "ASI returned unexpected response"})
+        else:
+            items.append({"index": i, "ok": True, "result": _to_output(r)})
+    return {"results": items}
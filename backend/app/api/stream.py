@@ -0,0 +1,87 @@
+import asyncio
+import json
+from typing import List, Optional
+
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+
+from ..config import settings
+from ..services.risk_stream import Subscription, risk_hub
+
+router = APIRouter(tags=["Risk Stream"])
+
+
+def _split(wallets: Optional[str]) -> List[str]:
+    return [w for w in (wallets or "").split(",") if w.strip()]
+
+
+# 🔌 WebSocket: {"subscribe": [...]} / {"unsubscribe": [...]} in, risk updates out
+@router.websocket("/ws/risk")
+async def risk_websocket(ws: WebSocket, wallets: Optional[str] = None):
+    await ws.accept()
+    sub = risk_hub.connect()
+
+    async def receive():
+        while True:
+            msg = await ws.receive_json()
+            if not isinstance(msg, dict):
+                continue
+            if msg.get("subscribe"):
+                added = sub.subscribe(msg["subscribe"])
+                await ws.send_json({"type": "subscribed", "wallets": added})
+            if msg.get("unsubscribe"):
+                sub.unsubscribe(msg["unsubscribe"])
+
+    async def send():
+        while True:
+            updates = await sub.next_batch()
+            # A client that stops reading is dropped instead of holding the sender forever
+            await asyncio.wait_for(ws.send_json({"type": "risk", "updates": updates}),
+                                   settings.STREAM_SEND_TIMEOUT_SECONDS)
+
+    try:
+        await ws.send_json({"type": "subscribed", "wallets": sub.subscribe(_split(wallets))})
+        tasks = [asyncio.ensure_future(receive()), asyncio.ensure_future(send())]
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for t in pending:
+            t.cancel()
+        for t in done:
+            if not t.cancelled() and isinstance(t.exception(), asyncio.TimeoutError):
+                await ws.close(code=1008)
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        sub.close()
+
+
+async def _sse_events(sub: Subscription):
+    try:
+        yield "retry: 3000\n\n"
+        # Starlette cancels this generator when the client disconnects
+        while True:
+            try:
+                updates = await asyncio.wait_for(sub.next_batch(), settings.STREAM_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            yield f"event: risk\ndata: {json.dumps(updates)}\n\n"
+    finally:
+        sub.close()
+
+
+# 📡 Server-Sent Events: GET /api/risk-stream?wallets=0xabc,0xdef
+@router.get("/api/risk-stream")
+async def risk_sse(wallets: str):
+    sub = risk_hub.connect()
+    sub.subscribe(_split(wallets))
+    return StreamingResponse(
+        _sse_events(sub),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/api/risk-stream/stats")
+def risk_stream_stats():
+    """Connections, watched wallets and published / unchanged / coalesced / sent counters."""
+    return risk_hub.snapshot()
@@ -0,0 +1,51 @@
+from fastapi import APIRouter, HTTPException
+from ..schemas import StressTestInput, StressTestOutput
+from ..services.features import FeatureVector
+from ..services.price_stats import parse_horizon
+from ..services.stress_test import METHODS, run_stress_test
+from ..services.subgraph_loader import loader_scope
+from ..config import settings
+
+# Router with prefix `/api`
+router = APIRouter(prefix="/api", tags=["Stress Test"])
+
+
+# 🎲 Monte Carlo liquidation stress test (one position or a batch)
+@router.post("/stress-test", response_model=StressTestOutput)
+async def stress_test_endpoint(payload: StressTestInput):
+    if len(payload.positions) > settings.STRESS_MAX_POSITIONS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many positions: {len(payload.positions)} > {settings.STRESS_MAX_POSITIONS}",
+        )
+    paths = payload.paths or settings.STRESS_DEFAULT_PATHS
+    steps = payload.steps or settings.STRESS_DEFAULT_STEPS
+    if paths > settings.STRESS_MAX_PATHS or steps > settings.STRESS_MAX_STEPS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"paths/steps limited to {settings.STRESS_MAX_PATHS}/{settings.STRESS_MAX_STEPS}",
+        )
+    if payload.method not in METHODS:
+        raise HTTPException(status_code=422, detail=f"method must be one of {', '.join(METHODS)}")
+    try:
+        horizon = parse_horizon(payload.horizon)
+    except (ValueError, IndexError):
+        horizon = 0.0
+    if horizon <= 0:
+        raise HTTPException(status_code=422, detail=f"Invalid horizon: {payload.horizon!r}")
+
+    # Wallet positions looked up once per request, in batched subgraph queries
+    with loader_scope():
+        results = await run_stress_test(
+            [FeatureVector.from_model(p) for p in payload.positions],
+            horizon=payload.horizon, paths=paths, steps=steps, method=payload.method,
+            use_trend=payload.use_trend, seed=payload.seed,
+        )
+
+    items = []
+    for i, r in enumerate(results):
+        if isinstance(r, BaseException):
+            items.append({"index": i, "ok": False, "error": str(r) or type(r).__name__})
+        else:
+            items.append({"index": i, "ok": True, "result": r})
+    return {"horizon_seconds": horizon, "paths": paths, "steps": steps, "results": items}
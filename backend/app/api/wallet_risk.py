@@ -2,116 +2,119 @@
 wallet_risk.py
 Fetches live wallet data (price, volatility, leverage, collateral ratio)
 from CoinGecko and Aave public API.
+
+Reserves are valued per asset and the volatility is the portfolio's, from
+the shared covariance snapshot (services/covariance.py); the ETH-only
+figures are used when the wallet has no reserves or no snapshot is ready.
+
+Price, rolling price statistics and the Aave subgraph are fetched concurrently, each
+under its own deadline; a source that misses its deadline falls back to
+defaults and is reported in `provenance` ("fallback"), as is a price or
+snapshot served from an expired cache entry ("stale").
 """
 
+import logging
+
 from fastapi import APIRouter
 from pydantic import BaseModel
-import httpx
-import statistics
+
+from ..config import settings
+from ..services.price_stats import AssetStats, get_stats
+from ..services.market_cache import get_price
+from ..services.covariance import get_snapshot
+from ..services.data_fetcher import position_ratios
+from ..services.subgraph_loader import load_user_reserves
+from ..services.upstream import Source, fan_out
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+FALLBACK_PRICE = 2000
+FALLBACK_TREND = 0.05  # trend of the old [2000, 2050, 2100] fallback series
 
 
 class WalletRequest(BaseModel):
     wallet_address: str
 
 
+async def _fetch_history() -> AssetStats:
+    stats = await get_stats("eth")
+    if stats.size < 2:
+        raise ValueError("empty price history")
+    return stats
+
+
 @router.post("/wallet-risk")
 async def wallet_risk(req: WalletRequest):
     wallet = req.wallet_address.lower().strip()
-    print(f"[DEBUG] Fetching risk data for wallet: {wallet}")
-
-    async with httpx.AsyncClient(timeout=20.0) as client:
-        try:
-            # 1️⃣ Fetch ETH price
-            price_resp = await client.get(
-                "https://api.coingecko.com/api/v3/simple/price?ids=ethereum&vs_currencies=usd"
-            )
-            eth_price = price_resp.json().get("ethereum", {}).get("usd", 0)
-        except httpx.ReadTimeout:
-            print("[WARN] CoinGecko price API timed out — using fallback value")
-            eth_price = 2000
-        except Exception as e:
-            print(f"[WARN] Price fetch failed: {e}")
-            eth_price = 2000
-
-        try:
-            # 2️⃣ Fetch ETH 7-day volatility
-            hist_resp = await client.get(
-                "https://api.coingecko.com/api/v3/coins/ethereum/market_chart?vs_currency=usd&days=7"
-            )
-            hist_data = hist_resp.json()
-            prices = [p[1] for p in hist_data.get("prices", [])]
-            volatility = (
-                round(statistics.stdev(prices) / statistics.mean(prices), 4)
-                if len(prices) > 1
-                else 0
-            )
-        except httpx.ReadTimeout:
-            print("[WARN] CoinGecko volatility API timed out — using default 0.3")
-            prices = [2000, 2050, 2100]
-            volatility = 0.3
-        except Exception as e:
-            print(f"[WARN] Volatility fetch failed: {e}")
-            prices = [2000, 2050, 2100]
-            volatility = 0.3
-
-        # 3️⃣ Fetch Aave user data (using Aave v3 subgraph)
-        query = f"""
-        {{
-          userReserves(where: {{user: "{wallet}"}}) {{
-            reserve {{
-              symbol
-              liquidityRate
-            }}
-            scaledATokenBalance
-            currentTotalDebt
-          }}
-        }}
-        """
-        try:
-            aave_resp = await client.post(
-                "https://api.thegraph.com/subgraphs/name/aave/protocol-v3",
-                json={"query": query},
-            )
-            aave_data = aave_resp.json().get("data", {}).get("userReserves", [])
-        except httpx.ReadTimeout:
-            print("[WARN] Aave API timed out — using fallback values")
-            aave_data = []
-        except Exception as e:
-            print(f"[WARN] Failed to parse Aave API: {e}")
-            print("[DEBUG] Raw response:", getattr(aave_resp, "text", "N/A"))
-            aave_data = []
-
-        if not aave_data:
-            collateral_ratio = 1.5
-            leverage = 2.0
-        else:
-            total_collateral = sum(
-                float(res.get("scaledATokenBalance", 0)) for res in aave_data
-            )
-            total_debt = sum(float(res.get("currentTotalDebt", 0)) for res in aave_data)
-            collateral_ratio = round(
-                (total_collateral / total_debt) if total_debt else 1.5, 2
-            )
-            leverage = round(
-                1 + (total_debt / total_collateral), 2
-            ) if total_collateral else 2.0
-
-        # 4️⃣ Market trend
-        market_trend = (
-            round((prices[-1] - prices[0]) / prices[0], 4) if len(prices) > 1 else 0
-        )
+    logger.debug("Fetching risk data for wallet: %s", wallet)
+
+    hedge = settings.UPSTREAM_HEDGE_AFTER_SECONDS
+    values, sources = await fan_out({
+        # 1️⃣ ETH price (shared TTL cache)
+        "price": Source(lambda: get_price("eth", strict=True),
+                        settings.UPSTREAM_PRICE_DEADLINE_SECONDS, FALLBACK_PRICE),
+        # 2️⃣ ETH 7-day rolling stats → volatility + trend
+        "history": Source(_fetch_history,
+                          settings.UPSTREAM_HISTORY_DEADLINE_SECONDS, None, hedge),
+        # 3️⃣ Aave user data (Aave v3 subgraph, batched across concurrent requests)
+        "aave": Source(lambda: load_user_reserves(wallet),
+                       settings.UPSTREAM_SUBGRAPH_DEADLINE_SECONDS, [], hedge),
+        # 4️⃣ Shared asset covariance snapshot → per-reserve valuation + portfolio volatility
+        "portfolio": Source(lambda: get_snapshot(strict=True), settings.UPSTREAM_HISTORY_DEADLINE_SECONDS, None),
+    })
 
-        print(
-            f"[DEBUG] Data fetched: price={eth_price}, vol={volatility}, "
-            f"col={collateral_ratio}, lev={leverage}"
+    eth_price = values["price"]
+
+    stats = values["history"]
+    if stats is None:
+        logger.warning("Volatility fetch failed: %s", sources["history"].get("reason"))
+        volatility = 0.3
+        market_trend = FALLBACK_TREND
+    else:
+        volatility = round(stats.volatility(), 4)
+        market_trend = round(stats.trend(), 4)
+
+    aave_data = values["aave"]
+    snapshot = values["portfolio"]
+    portfolio = snapshot.position(aave_data) if snapshot is not None and aave_data else None
+    volatility_source = sources["history"]
+    if not aave_data and sources["aave"]["source"] == "live":
+        # The subgraph answered: no reserves means no debt
+        collateral_ratio, leverage = position_ratios(0.0, 0.0)
+    elif not aave_data:
+        # Position unknown (subgraph missed its deadline)
+        collateral_ratio = 1.5
+        leverage = 2.0
+    elif portfolio is not None:
+        collateral_ratio, leverage = position_ratios(portfolio["collateral_usd"], portfolio["debt_usd"])
+        volatility = portfolio["volatility"]
+        volatility_source = sources["portfolio"]
+    else:
+        # No snapshot: legacy estimate, summing balances as if one asset
+        total_collateral = sum(
+            float(res.get("scaledATokenBalance", 0)) for res in aave_data
         )
+        total_debt = sum(float(res.get("currentTotalDebt", 0)) for res in aave_data)
+        collateral_ratio, leverage = position_ratios(total_collateral, total_debt)
+
+    logger.debug(
+        "Data fetched: price=%s, vol=%s, col=%s, lev=%s",
+        eth_price, volatility, collateral_ratio, leverage,
+    )
 
-        return {
-            "volatility": volatility,
-            "collateral_ratio": collateral_ratio,
-            "leverage": leverage,
-            "asset_price": eth_price,
-            "market_trend": market_trend,
-        }
+    return {
+        "volatility": volatility,
+        "collateral_ratio": collateral_ratio,
+        "leverage": leverage,
+        "asset_price": eth_price,
+        "market_trend": market_trend,
+        "portfolio": portfolio,
+        "provenance": {
+            "asset_price": sources["price"],
+            "volatility": volatility_source,
+            "market_trend": sources["history"],
+            "collateral_ratio": sources["aave"],
+            "leverage": sources["aave"],
+        },
+    }
@@ -6,6 +6,36 @@ class Settings(BaseSettings):
     # ASI
     ASI_ENDPOINT: str = Field(default="http://127.0.0.1:8001", env="ASI_ENDPOINT")
     ASI_API_KEY: Optional[str] = Field(default=None, env="ASI_API_KEY")
+    ASI_FALLBACK_ENDPOINTS: str = Field(default="", env="ASI_FALLBACK_ENDPOINTS")  # comma-separated
+
+    # ASI routing: per-request deadline, circuit breaker, hedging
+    ASI_REQUEST_DEADLINE_SECONDS: float = Field(default=8.0, env="ASI_REQUEST_DEADLINE_SECONDS")
+    ASI_ATTEMPT_TIMEOUT_SECONDS: float = Field(default=4.0, env="ASI_ATTEMPT_TIMEOUT_SECONDS")
+    ASI_BREAKER_FAILURES: int = Field(default=3, env="ASI_BREAKER_FAILURES")
+    ASI_BREAKER_COOLDOWN_SECONDS: float = Field(default=30.0, env="ASI_BREAKER_COOLDOWN_SECONDS")
+    ASI_EWMA_ALPHA: float = Field(default=0.2, env="ASI_EWMA_ALPHA")
+    ASI_HEDGE_ENABLED: bool = Field(default=False, env="ASI_HEDGE_ENABLED")
+    ASI_HEDGE_MIN_DELAY_SECONDS: float = Field(default=0.05, env="ASI_HEDGE_MIN_DELAY_SECONDS")
+    ASI_HEDGE_MAX_DELAY_SECONDS: float = Field(default=2.0, env="ASI_HEDGE_MAX_DELAY_SECONDS")
+
+    # Micro-batching of concurrent ASI:One chat calls into one prompt
+    ASI_MICROBATCH_ENABLED: bool = Field(default=False, env="ASI_MICROBATCH_ENABLED")
+    ASI_MICROBATCH_WINDOW_MS: float = Field(default=5.0, env="ASI_MICROBATCH_WINDOW_MS")
+    ASI_MICROBATCH_MAX_ITEMS: int = Field(default=16, env="ASI_MICROBATCH_MAX_ITEMS")
+
+    # Upstream data sources
+    COINGECKO_BASE_URL: str = Field(default="https://api.coingecko.com/api/v3", env="COINGECKO_BASE_URL")
+    AAVE_V2_SUBGRAPH_URL: str = Field(default="https://api.thegraph.com/subgraphs/name/aave/protocol-v2", env="AAVE_V2_SUBGRAPH_URL")
+    AAVE_V3_SUBGRAPH_URL: str = Field(default="https://api.thegraph.com/subgraphs/name/aave/protocol-v3", env="AAVE_V3_SUBGRAPH_URL")
+
+    # Batched subgraph lookups (DataLoader-style, see services/subgraph_loader.py)
+    SUBGRAPH_LOADER_WINDOW_MS: float = Field(default=2.0, env="SUBGRAPH_LOADER_WINDOW_MS")
+    SUBGRAPH_LOADER_MAX_KEYS: int = Field(default=100, env="SUBGRAPH_LOADER_MAX_KEYS")
+    SUBGRAPH_PAGE_SIZE: int = Field(default=1000, env="SUBGRAPH_PAGE_SIZE")  # TheGraph caps `first` at 1000
+
+    # Startup: open upstream connections while the app boots
+    STARTUP_HTTP_WARMUP: bool = Field(default=True, env="STARTUP_HTTP_WARMUP")
+    STARTUP_WARMUP_TIMEOUT_SECONDS: float = Field(default=2.0, env="STARTUP_WARMUP_TIMEOUT_SECONDS")
 
     # Database (SQLite default for local dev)
     DATABASE_URL: str = Field(default="sqlite:///./risk.db", env="DATABASE_URL")
@@ -13,13 +43,118 @@ class Settings(BaseSettings):
     # Ethereum RPC (for executor)
     ETH_RPC: Optional[str] = Field(default=None, env="ETH_RPC")
     PRIVATE_KEY: Optional[str] = Field(default=None, env="PRIVATE_KEY")  # only if you send txs
+    EXECUTOR_RPC_BATCH_SIZE: int = Field(default=50, env="EXECUTOR_RPC_BATCH_SIZE")  # calls per JSON-RPC batch
+    EXECUTOR_GAS_MULTIPLIER: float = Field(default=1.2, env="EXECUTOR_GAS_MULTIPLIER")  # headroom over eth_estimateGas
+    EXECUTOR_PRIORITY_FEE_GWEI: float = Field(default=1.5, env="EXECUTOR_PRIORITY_FEE_GWEI")  # if node has no eth_maxPriorityFeePerGas
+    EXECUTOR_MAX_FEE_GWEI: float = Field(default=300.0, env="EXECUTOR_MAX_FEE_GWEI")  # hard cap per gas
+    EXECUTOR_RECEIPT_TIMEOUT_SECONDS: float = Field(default=120.0, env="EXECUTOR_RECEIPT_TIMEOUT_SECONDS")
+    EXECUTOR_RECEIPT_POLL_SECONDS: float = Field(default=1.0, env="EXECUTOR_RECEIPT_POLL_SECONDS")
 
     # Scheduler
-    SCHED_INTERVAL_SECONDS: int = Field(default=30, env="SCHED_INTERVAL_SECONDS")
+    SCHED_INTERVAL_SECONDS: int = Field(default=30, env="SCHED_INTERVAL_SECONDS")  # healthy wallets
+    SCHED_MIN_INTERVAL_SECONDS: float = Field(default=5.0, env="SCHED_MIN_INTERVAL_SECONDS")  # near/above threshold
+    SCHED_TICK_SECONDS: float = Field(default=5.0, env="SCHED_TICK_SECONDS")
+    SCHED_NEAR_BAND: float = Field(default=15.0, env="SCHED_NEAR_BAND")  # risk points below ALERT_THRESHOLD
+    SCHED_CONCURRENCY: int = Field(default=32, env="SCHED_CONCURRENCY")
+    SCHED_MAX_WALLETS_PER_TICK: int = Field(default=0, env="SCHED_MAX_WALLETS_PER_TICK")  # 0 = no cap
+    SCHED_WALLETS: str = Field(default="", env="SCHED_WALLETS")  # comma-separated watch list
+
+    # Sharded monitoring workers (tasks/sharding.py): DB leases + consistent hashing
+    SHARD_LEASE_TTL_SECONDS: float = Field(default=15.0, env="SHARD_LEASE_TTL_SECONDS")
+    SHARD_RENEW_SECONDS: float = Field(default=5.0, env="SHARD_RENEW_SECONDS")
+    SHARD_VNODES: int = Field(default=64, env="SHARD_VNODES")  # ring points per worker
+
+    # Liquidation-price index: re-score on price moves across collateral-ratio bands
+    LIQ_INDEX_ENABLED: bool = Field(default=True, env="LIQ_INDEX_ENABLED")
+    LIQ_INDEX_CR_BANDS: str = Field(default="1.0,1.05,1.1,1.25,1.5,2.0", env="LIQ_INDEX_CR_BANDS")
+    LIQ_INDEX_MAX_INTERVAL_SECONDS: float = Field(default=300.0, env="LIQ_INDEX_MAX_INTERVAL_SECONDS")  # indexed wallets back off to this
 
     # Alerts
     ALERT_THRESHOLD: float = Field(default=70.0, env="ALERT_THRESHOLD")
 
+    # Push streaming of scheduler results (WebSocket /ws/risk, SSE /api/risk-stream)
+    # The routes are always mounted; STREAM_ENABLED only runs the monitoring loop in-process.
+    # Off by default: every API worker would run its own loop and score the same wallets.
+    # Enable it on a single worker (or leave scoring to the scheduler/shard processes).
+    STREAM_ENABLED: bool = Field(default=False, env="STREAM_ENABLED")  # run the monitoring loop in the API
+    STREAM_MAX_WALLETS_PER_CONNECTION: int = Field(default=100, env="STREAM_MAX_WALLETS_PER_CONNECTION")
+    STREAM_RISK_EPSILON: float = Field(default=0.01, env="STREAM_RISK_EPSILON")  # smaller moves are not pushed
+    STREAM_SEND_TIMEOUT_SECONDS: float = Field(default=10.0, env="STREAM_SEND_TIMEOUT_SECONDS")  # then drop the client
+    STREAM_HEARTBEAT_SECONDS: float = Field(default=15.0, env="STREAM_HEARTBEAT_SECONDS")
+
+    # Prediction result cache (features quantized to these steps)
+    PRED_CACHE_ENABLED: bool = Field(default=True, env="PRED_CACHE_ENABLED")
+    PRED_CACHE_TTL_SECONDS: float = Field(default=30.0, env="PRED_CACHE_TTL_SECONDS")
+    PRED_CACHE_MAX_ENTRIES: int = Field(default=10000, env="PRED_CACHE_MAX_ENTRIES")
+    PRED_CACHE_QUANTUM: str = Field(
+        default="volatility=0.001,collateral_ratio=0.01,leverage=0.01,asset_price=1,market_trend=0.001",
+        env="PRED_CACHE_QUANTUM",
+    )
+
+    # Distilled local model (fallback | primary | off)
+    LOCAL_MODEL_PATH: str = Field(default="./models/distilled_risk.json", env="LOCAL_MODEL_PATH")
+    LOCAL_MODEL_MODE: str = Field(default="fallback", env="LOCAL_MODEL_MODE")
+    LOCAL_MODEL_BORDERLINE_BAND: float = Field(default=5.0, env="LOCAL_MODEL_BORDERLINE_BAND")
+
+    # Batch prediction
+    BATCH_MAX_ITEMS: int = Field(default=1000, env="BATCH_MAX_ITEMS")
+    ASI_BATCH_CONCURRENCY: int = Field(default=16, env="ASI_BATCH_CONCURRENCY")
+
+    # Market data cache
+    MARKET_CACHE_TTL_SECONDS: float = Field(default=30.0, env="MARKET_CACHE_TTL_SECONDS")
+    MARKET_CACHE_STALE_SECONDS: float = Field(default=120.0, env="MARKET_CACHE_STALE_SECONDS")
+
+    # Streaming price statistics
+    STATS_HORIZONS: str = Field(default="1d,7d", env="STATS_HORIZONS")
+    STATS_DEFAULT_HORIZON: str = Field(default="7d", env="STATS_DEFAULT_HORIZON")
+    STATS_EWMA_HALF_LIFE: str = Field(default="1d", env="STATS_EWMA_HALF_LIFE")  # time-decayed, not per sample
+    STATS_EWMA_INTERVAL: str = Field(default="1h", env="STATS_EWMA_INTERVAL")  # ewma_volatility is quoted per this
+    STATS_BACKFILL_RETRY_SECONDS: float = Field(default=60.0, env="STATS_BACKFILL_RETRY_SECONDS")
+
+    # Local price history store (services/price_store.py), read by the price statistics
+    PRICE_STORE_ENABLED: bool = Field(default=True, env="PRICE_STORE_ENABLED")
+    PRICE_STORE_RESOLUTIONS: str = Field(default="1h,1d", env="PRICE_STORE_RESOLUTIONS")  # OHLC bars kept besides raw
+    PRICE_STORE_RAW_RETENTION: str = Field(default="30d", env="PRICE_STORE_RAW_RETENTION")  # bars are kept forever
+    PRICE_STORE_MAX_GAP_SECONDS: float = Field(default=900.0, env="PRICE_STORE_MAX_GAP_SECONDS")  # older high-water mark → top up from market_chart
+
+    # Portfolio covariance engine (services/covariance.py)
+    COV_ASSETS: str = Field(default="eth,btc,usdc,usdt,dai,aave,uni,link,wsteth", env="COV_ASSETS")
+    COV_RESAMPLE_SECONDS: float = Field(default=3600.0, env="COV_RESAMPLE_SECONDS")  # common return grid
+    COV_TTL_SECONDS: float = Field(default=30.0, env="COV_TTL_SECONDS")  # API callers; scheduler rebuilds per tick
+
+    # Monte Carlo liquidation stress test (services/stress_test.py)
+    STRESS_TEST_ENABLED: bool = Field(default=True, env="STRESS_TEST_ENABLED")  # mount /api/stress-test
+    STRESS_DEFAULT_PATHS: int = Field(default=10000, env="STRESS_DEFAULT_PATHS")
+    STRESS_MAX_PATHS: int = Field(default=50000, env="STRESS_MAX_PATHS")
+    STRESS_MAX_POSITIONS: int = Field(default=1000, env="STRESS_MAX_POSITIONS")
+    STRESS_DEFAULT_STEPS: int = Field(default=56, env="STRESS_DEFAULT_STEPS")  # 7d horizon → 3h steps
+    STRESS_MAX_STEPS: int = Field(default=1000, env="STRESS_MAX_STEPS")
+    STRESS_CHUNK_ELEMENTS: int = Field(default=32_000_000, env="STRESS_CHUNK_ELEMENTS")  # bytes per shock block / hit mask chunk
+
+    # Columnar analytics export
+    ANALYTICS_STORE_DIR: str = Field(default="./analytics", env="ANALYTICS_STORE_DIR")
+    ANALYTICS_OVERLAP_IDS: int = Field(default=1000, env="ANALYTICS_OVERLAP_IDS")  # re-scanned for late commits
+    ANALYTICS_OVERLAP_SECONDS: float = Field(default=300.0, env="ANALYTICS_OVERLAP_SECONDS")
+
+    # Per-source deadlines for wallet fan-out (seconds); hedging off when unset
+    UPSTREAM_PRICE_DEADLINE_SECONDS: float = Field(default=2.0, env="UPSTREAM_PRICE_DEADLINE_SECONDS")
+    UPSTREAM_HISTORY_DEADLINE_SECONDS: float = Field(default=4.0, env="UPSTREAM_HISTORY_DEADLINE_SECONDS")
+    UPSTREAM_SUBGRAPH_DEADLINE_SECONDS: float = Field(default=4.0, env="UPSTREAM_SUBGRAPH_DEADLINE_SECONDS")
+    UPSTREAM_HEDGE_AFTER_SECONDS: Optional[float] = Field(default=None, env="UPSTREAM_HEDGE_AFTER_SECONDS")
+
+    # Write-behind prediction persistence
+    WRITER_BATCH_SIZE: int = Field(default=200, env="WRITER_BATCH_SIZE")
+    WRITER_FLUSH_INTERVAL_SECONDS: float = Field(default=0.5, env="WRITER_FLUSH_INTERVAL_SECONDS")
+    WRITER_MAX_BUFFER: int = Field(default=10000, env="WRITER_MAX_BUFFER")
+    WRITER_BACKPRESSURE: str = Field(default="block", env="WRITER_BACKPRESSURE")  # block | drop_oldest | drop_new
+
+    # Shared HTTP pool (ASI + upstream market data)
+    HTTP_POOL_LIMIT: int = Field(default=100, env="HTTP_POOL_LIMIT")
+    HTTP_POOL_LIMIT_PER_HOST: int = Field(default=20, env="HTTP_POOL_LIMIT_PER_HOST")
+    HTTP_DNS_TTL_SECONDS: int = Field(default=300, env="HTTP_DNS_TTL_SECONDS")
+    HTTP_KEEPALIVE_SECONDS: float = Field(default=30.0, env="HTTP_KEEPALIVE_SECONDS")
+    HTTP_DEFAULT_TIMEOUT_SECONDS: float = Field(default=15.0, env="HTTP_DEFAULT_TIMEOUT_SECONDS")
+
     class Config:
         env_file = "./.env"  # path relative to backend/
         env_file_encoding = "utf-8"
@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine, Column, Integer, Float, String, JSON, DateTime
+from sqlalchemy import create_engine, event, text, Column, Index, Integer, Float, String, JSON, DateTime
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from .config import settings
@@ -8,6 +8,17 @@ DATABASE_URL = settings.DATABASE_URL
 
 # SQLite-specific kwargs to avoid check_same_thread issues in dev
 engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {})
+
+if DATABASE_URL.startswith("sqlite"):
+    @event.listens_for(engine, "connect")
+    def _sqlite_pragmas(dbapi_conn, _record):
+        # WAL lets readers run alongside the write-behind flusher, and
+        # synchronous=NORMAL drops the per-commit fsync (safe under WAL)
+        cur = dbapi_conn.cursor()
+        cur.execute("PRAGMA journal_mode=WAL")
+        cur.execute("PRAGMA synchronous=NORMAL")
+        cur.close()
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
@@ -20,8 +31,106 @@ class Prediction(Base):
     protocol = Column(String, nullable=True)
     user_wallet = Column(String, nullable=True)
 
+    # Typed copies of the hot JSON fields, extracted at write time
+    risk_probability = Column(Float, nullable=True)
+    risk_class = Column(String, nullable=True)
+    volatility = Column(Float, nullable=True)
+    collateral_ratio = Column(Float, nullable=True)
+    leverage = Column(Float, nullable=True)
+    asset_price = Column(Float, nullable=True)
+    market_trend = Column(Float, nullable=True)
+
+    __table_args__ = (
+        Index("ix_predictions_wallet_ts", "user_wallet", "timestamp"),
+        Index("ix_predictions_protocol_ts", "protocol", "timestamp"),
+    )
+
+# Sharded monitoring (tasks/sharding.py): live workers and per-wallet ownership
+# leases. Times are epoch seconds, so the same rows work on SQLite and Postgres.
+class MonitorWorker(Base):
+    __tablename__ = "monitor_workers"
+    worker_id = Column(String, primary_key=True)
+    started_at = Column(Float, nullable=False)
+    expires_at = Column(Float, nullable=False, index=True)
+
+class WalletLease(Base):
+    __tablename__ = "wallet_leases"
+    wallet = Column(String, primary_key=True)
+    owner = Column(String, nullable=True, index=True)
+    expires_at = Column(Float, nullable=False, default=0.0)
+
+# Local price history (services/price_store.py): raw points plus OHLC bars
+# per resolution. Times are epoch seconds.
+class PricePoint(Base):
+    __tablename__ = "price_points"
+    asset = Column(String, primary_key=True)
+    ts = Column(Float, primary_key=True)
+    price = Column(Float, nullable=False)
+
+    # Covering index: range reads never touch the table
+    __table_args__ = (Index("ix_price_points_asset_ts_price", "asset", "ts", "price"),)
+
+class PriceBar(Base):
+    __tablename__ = "price_bars"
+    asset = Column(String, primary_key=True)
+    resolution = Column(Integer, primary_key=True)  # bucket width in seconds
+    bucket = Column(Float, primary_key=True)  # bucket start
+    open = Column(Float, nullable=False)
+    high = Column(Float, nullable=False)
+    low = Column(Float, nullable=False)
+    close = Column(Float, nullable=False)
+    count = Column(Integer, nullable=False)
+
+# Feature columns mirrored from `input`
+FEATURE_COLUMNS = ("volatility", "collateral_ratio", "leverage", "asset_price", "market_trend")
+
 def init_db():
     Base.metadata.create_all(bind=engine)
+    # Older risk.db files: add the typed columns / composite indexes
+    from .migrations import ensure_schema
+    ensure_schema(engine)
+
+def warm_db():
+    """Create/migrate the schema and open a pooled connection (called at startup)."""
+    init_db()
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+
+def _as_float(value):
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+def typed_columns(features: dict, result: dict) -> dict:
+    """Typed column values derived from the input/output JSON."""
+    cols = {name: _as_float(features.get(name)) for name in FEATURE_COLUMNS}
+    cols["risk_probability"] = _as_float(result.get("risk_probability"))
+    cols["risk_class"] = result.get("risk_class")
+    return cols
+
+def prediction_row(features: dict, result: dict, timestamp: datetime.datetime = None) -> dict:
+    """Column mapping for one predictions row (used by bulk inserts)."""
+    return {
+        "timestamp": timestamp or datetime.datetime.utcnow(),
+        "input": features,
+        "output": result,
+        "protocol": features.get("protocol"),
+        "user_wallet": features.get("user_wallet"),
+        **typed_columns(features, result),
+    }
+
+def insert_predictions(rows: list) -> None:
+    """Bulk-insert prediction_row() mappings in one transaction."""
+    db = SessionLocal()
+    try:
+        db.bulk_insert_mappings(Prediction, rows)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
 
 # Simple helper
 def get_db():
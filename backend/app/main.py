@@ -1,15 +1,100 @@
 # backend/app/main.py
-from fastapi import FastAPI
-from app.api import predict as predict_module
-from .db import init_db
-from .config import settings
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
-from app.services.live_data import fetch_live_wallet_metrics 
-app = FastAPI(title="OmniDeFi Risk Engine (ASI)")
-from .api import predict
+
+from .config import settings
+from .db import warm_db
+from .api import history, predict, stream, wallet_risk
+from .services.asi_client import ASI_ENDPOINTS
+from .services.live_data import fetch_live_wallet_metrics
+from .services.http_client import open_session, close_session, warm_up
+from .services.market_cache import cache_stats
+from .services.prediction_writer import start_writer, stop_writer
+from .services.price_stats import flush_prices
+from .services.local_model import load_local_model
+from .services.endpoint_health import health_snapshot
+from .services.prediction_cache import prediction_cache
+from .services.subgraph_loader import loader_stats
+from .services.metrics import CONTENT_TYPE, MetricsMiddleware, render as render_metrics
+from .services.upstream import AAVE_V2_SUBGRAPH, AAVE_V3_SUBGRAPH, COINGECKO_BASE
+
+# Filled in by the lifespan: how long each startup step took
+startup_timings = {}
+
+
+def _warmup_urls():
+    """One cheap URL per upstream host (CoinGecko, subgraphs, ASI endpoints)."""
+    urls = [f"{COINGECKO_BASE}/ping"]
+    for url in (AAVE_V2_SUBGRAPH, AAVE_V3_SUBGRAPH, *ASI_ENDPOINTS):
+        parts = urlsplit(url)
+        urls.append(f"{parts.scheme}://{parts.netloc}/")
+    return urls
+
+
+async def _timed_step(name: str, coro):
+    start = time.perf_counter()
+    try:
+        return await coro
+    finally:
+        startup_timings[name] = round(time.perf_counter() - start, 4)
+
+
+async def _warm_http():
+    if settings.STARTUP_HTTP_WARMUP:
+        await warm_up(_warmup_urls(), settings.STARTUP_WARMUP_TIMEOUT_SECONDS)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    started = time.perf_counter()
+    # 🔌 One pooled HTTP session for the whole app lifetime
+    await open_session()
+    # 🔥 Warm-up runs concurrently: schema + DB pool, distilled model, upstream connections
+    await asyncio.gather(
+        _timed_step("db", asyncio.to_thread(warm_db)),
+        _timed_step("local_model", asyncio.to_thread(load_local_model)),
+        _timed_step("http", _warm_http()),
+    )
+    # 💾 Background flusher for prediction rows
+    start_writer()
+    # 📡 Monitoring loop for streamed wallets: scored once, pushed to every subscriber
+    monitor = monitor_task = None
+    if settings.STREAM_ENABLED:
+        from .services.risk_stream import risk_hub
+        from .tasks.scheduler import WalletScheduler
+
+        monitor = WalletScheduler(on_result=risk_hub.publish)
+        risk_hub.bind(watch=monitor.add_wallet, unwatch=monitor.remove_wallet)
+        monitor_task = asyncio.create_task(monitor.run_forever())
+    startup_timings["total"] = round(time.perf_counter() - started, 4)
+    try:
+        yield
+    finally:
+        if monitor is not None:
+            monitor.stop()
+            await monitor_task
+        await stop_writer()
+        # 📈 Live prices still queued for the local price store
+        await flush_prices()
+        await close_session()
+
+
+app = FastAPI(title="OmniDeFi Risk Engine (ASI)", lifespan=lifespan)
 app.include_router(predict.router)
-from app.api import wallet_risk
 app.include_router(wallet_risk.router, prefix="/api", tags=["wallet"])
+app.include_router(history.router)
+# 📡 Stream routes stay mounted; STREAM_ENABLED only decides whether this worker runs the loop
+app.include_router(stream.router)
+
+# 🧩 Optional router: its module is only imported when enabled
+if settings.STRESS_TEST_ENABLED:
+    from .api import stress_test
+    app.include_router(stress_test.router)
 
 # Enable CORS
 app.add_middleware(
@@ -19,26 +104,50 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-
-# Initialize DB
-init_db()
-
-# ✅ Mount router directly (no prefix)
-app.include_router(predict_module.router)
+# 📈 In-flight gauge + per-route latency histogram
+app.add_middleware(MetricsMiddleware)
 
 @app.get("/health")
 def health():
-    return {"status": "ok", "asi_endpoint": settings.ASI_ENDPOINT}
+    return {
+        "status": "ok",
+        "asi_endpoint": settings.ASI_ENDPOINT,
+        "asi_endpoints": health_snapshot(),
+        "startup_seconds": startup_timings,
+    }
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus scrape endpoint (stage/upstream latency, fallbacks, scheduler lag)."""
+    return Response(render_metrics(), media_type=CONTENT_TYPE)
 
 @app.get("/")
 def root():
     return {"message": "🚀 OmniDeFi Risk Engine API is running!"}
 @app.get("/api/live-wallet")
-def get_live_wallet(wallet: str):
+async def get_live_wallet(wallet: str):
     """
     Fetch real-time wallet metrics from Aave + CoinGecko.
     """
-    return fetch_live_wallet_metrics(wallet)
+    return await fetch_live_wallet_metrics(wallet)
+
+
+@app.get("/api/market-cache/stats")
+def market_cache_stats():
+    """Hit/miss counters for the shared market-data cache."""
+    return cache_stats()
+
+
+@app.get("/api/prediction-cache/stats")
+def prediction_cache_stats():
+    """Hit ratio and ASI calls saved by the quantized prediction cache."""
+    return prediction_cache.stats()
+
+
+@app.get("/api/subgraph-loader/stats")
+def subgraph_loader_stats():
+    """Batches sent vs. wallet lookups served by the subgraph loaders."""
+    return loader_stats()
 
 
 @app.post("/api/check-wallet-risk")
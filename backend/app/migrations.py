@@ -0,0 +1,101 @@
+"""
+migrations.py
+
+Schema upgrades for existing `predictions` tables (e.g. an old risk.db).
+
+ensure_schema() adds the typed columns and composite indexes introduced
+for the history API; it is idempotent and runs from init_db().
+backfill() fills the typed columns from the input/output JSON of rows
+written before the upgrade, in id-ordered chunks.
+
+    python -m app.migrations            # schema + backfill
+    python -m app.migrations --no-backfill
+"""
+
+import argparse
+import json
+
+from sqlalchemy import inspect, select, text, update
+
+from .db import FEATURE_COLUMNS, Prediction, SessionLocal, engine as default_engine, typed_columns
+
+TYPED_COLUMNS = {
+    "risk_probability": "FLOAT",
+    "risk_class": "VARCHAR",
+    **{name: "FLOAT" for name in FEATURE_COLUMNS},
+}
+
+
+def ensure_schema(engine=default_engine) -> list:
+    """Add missing typed columns and indexes. Returns what was added."""
+    insp = inspect(engine)
+    if not insp.has_table(Prediction.__tablename__):
+        return []
+    existing_cols = {c["name"] for c in insp.get_columns(Prediction.__tablename__)}
+    existing_idx = {i["name"] for i in insp.get_indexes(Prediction.__tablename__)}
+
+    added = []
+    with engine.begin() as conn:
+        for name, sql_type in TYPED_COLUMNS.items():
+            if name not in existing_cols:
+                conn.execute(text(f"ALTER TABLE {Prediction.__tablename__} ADD COLUMN {name} {sql_type}"))
+                added.append(name)
+        for index in Prediction.__table__.indexes:
+            if index.name not in existing_idx:
+                index.create(bind=conn, checkfirst=True)
+                added.append(index.name)
+    if added:
+        print(f"[DB] Migrated predictions schema: added {', '.join(added)}")
+    return added
+
+
+def _load(value):
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return {}
+    return value if isinstance(value, dict) else {}
+
+
+def backfill(chunk_size: int = 1000) -> int:
+    """Fill typed columns for rows where risk_probability is still NULL."""
+    done = 0
+    last_id = 0
+    db = SessionLocal()
+    try:
+        while True:
+            rows = db.execute(
+                select(Prediction.id, Prediction.input, Prediction.output)
+                .where(Prediction.id > last_id, Prediction.risk_probability.is_(None))
+                .order_by(Prediction.id)
+                .limit(chunk_size)
+            ).all()
+            if not rows:
+                break
+            db.execute(
+                update(Prediction),
+                [{"id": rid, **typed_columns(_load(inp), _load(out))} for rid, inp, out in rows],
+            )
+            db.commit()
+            done += len(rows)
+            last_id = rows[-1][0]
+    finally:
+        db.close()
+    return done
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Upgrade the predictions table in place")
+    parser.add_argument("--no-backfill", action="store_true")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    added = ensure_schema()
+    print(json.dumps({"added": added}))
+    if not args.no_backfill:
+        print(json.dumps({"backfilled_rows": backfill(args.chunk_size)}))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Dict, List, Optional
 from datetime import datetime
 
 class RiskInput(BaseModel):
@@ -17,3 +17,90 @@ class RiskOutput(BaseModel):
     risk_class: str
     action: str
     explanation: Optional[str] = None
+
+class BatchRiskItem(BaseModel):
+    index: int
+    ok: bool
+    result: Optional[RiskOutput] = None
+    error: Optional[str] = None
+
+class BatchRiskOutput(BaseModel):
+    results: List[BatchRiskItem]
+
+class HistoryItem(BaseModel):
+    id: int
+    timestamp: datetime
+    user_wallet: Optional[str] = None
+    protocol: Optional[str] = None
+    risk_probability: Optional[float] = None
+    risk_class: Optional[str] = None
+    features: Dict[str, Optional[float]]
+
+class HistoryPage(BaseModel):
+    items: List[HistoryItem]
+    next_cursor: Optional[str] = None
+
+class RiskBucket(BaseModel):
+    user_wallet: Optional[str] = None
+    bucket_start: datetime
+    count: int
+    min_risk: float
+    avg_risk: float
+    max_risk: float
+
+class RiskAggregates(BaseModel):
+    interval_seconds: int
+    buckets: List[RiskBucket]
+
+class PriceBarOut(BaseModel):
+    bucket_start: datetime
+    open: float
+    high: float
+    low: float
+    close: float
+    count: int
+
+class PriceHistory(BaseModel):
+    asset: str
+    resolution: str
+    bars: List[PriceBarOut]
+
+class StressPosition(BaseModel):
+    volatility: Optional[float] = Field(None, description="Volatility over the default stats horizon (fetched when omitted)")
+    collateral_ratio: Optional[float] = Field(None, description="Collateral ratio, e.g., 1.2")
+    leverage: Optional[float] = Field(None, description="Leverage factor; used when collateral_ratio is omitted")
+    asset_price: Optional[float] = Field(None, description="Current asset price in USD")
+    market_trend: Optional[float] = Field(None, description="24h market trend (e.g. -0.1 for -10%)")
+    asset_symbol: Optional[str] = Field("eth", description="Collateral asset ticker")
+    user_wallet: Optional[str] = Field(None, description="Wallet whose Aave position fills missing fields")
+
+class StressTestInput(BaseModel):
+    positions: List[StressPosition] = Field(..., min_length=1)
+    horizon: str = Field("7d", description="Simulated horizon, e.g. 24h or 7d")
+    paths: Optional[int] = Field(None, ge=100, description="Monte Carlo paths per position")
+    steps: Optional[int] = Field(None, ge=1, description="Time steps over the horizon")
+    method: str = Field("gbm", description="gbm | bootstrap (resampled historical returns)")
+    use_trend: bool = Field(True, description="Use market_trend as drift (false: zero drift)")
+    seed: Optional[int] = None
+
+class StressResult(BaseModel):
+    liquidation_probability: float
+    expected_time_to_liquidation_seconds: Optional[float] = None
+    liquidation_price: Optional[float] = None
+    collateral_ratio: Optional[float] = None
+    volatility: float
+    market_trend: float
+    asset_price: Optional[float] = None
+    shocks: str
+
+class StressItem(BaseModel):
+    index: int
+    ok: bool
+    result: Optional[StressResult] = None
+    error: Optional[str] = None
+
+class StressTestOutput(BaseModel):
+    horizon_seconds: float
+    paths: int
+    steps: int
+    results: List[StressItem]
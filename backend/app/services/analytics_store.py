@@ -0,0 +1,277 @@
+"""
+analytics_store.py
+
+Columnar, memory-mapped copy of the `predictions` history for analysis.
+
+Each column lives in its own append-only binary file (<dir>/<column>.bin,
+fixed dtype); wallets and protocols are dictionary-encoded to int32 codes.
+meta.json records the row count, the export watermark (highest exported
+prediction id and newest exported timestamp) and the dictionaries, and is
+replaced atomically after each appended chunk, so a crashed export is
+simply re-run.
+
+- export_incremental() streams rows newer than the watermark with Core
+  keyset queries (no ORM objects) in chunks and appends them. On Postgres
+  ids come from a sequence before commit, so a row with a lower id can
+  become visible after a higher one was exported. Each run therefore
+  re-scans the last ANALYTICS_OVERLAP_IDS ids (limited to rows within
+  ANALYTICS_OVERLAP_SECONDS of the newest exported timestamp) and appends
+  the ones the store does not have yet.
+- AnalyticsStore.column() maps a single column read-only with np.memmap,
+  so aggregates only touch the columns (and pages) they need.
+"""
+
+import datetime
+import json
+import os
+from typing import Dict, List, Optional, Set
+
+import numpy as np
+from sqlalchemy import select
+
+from ..config import settings
+from ..db import FEATURE_COLUMNS, Prediction, SessionLocal, typed_columns
+from ..migrations import ensure_schema
+
+COLUMNS: Dict[str, str] = {
+    "id": "<i8",
+    "timestamp_us": "<i8",  # naive UTC, microseconds since epoch
+    "wallet": "<i4",        # dictionary code, -1 = none
+    "protocol": "<i4",      # dictionary code, -1 = none
+    "risk_probability": "<f8",
+    **{name: "<f8" for name in FEATURE_COLUMNS},
+}
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def _to_us(ts: Optional[datetime.datetime]) -> int:
+    if ts is None:
+        return 0
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return (ts - _EPOCH) // datetime.timedelta(microseconds=1)
+
+
+def _nan(value) -> float:
+    return np.nan if value is None else float(value)
+
+
+class AnalyticsStore:
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or settings.ANALYTICS_STORE_DIR
+        self.meta = self._read_meta()
+
+    # --- metadata ---
+    def _meta_path(self) -> str:
+        return os.path.join(self.path, "meta.json")
+
+    def _read_meta(self) -> dict:
+        try:
+            with open(self._meta_path()) as fh:
+                meta = json.load(fh)
+        except FileNotFoundError:
+            return {"rows": 0, "watermark": 0, "watermark_us": 0,
+                    "wallets": [], "protocols": [], "columns": COLUMNS}
+        if meta.get("columns") != COLUMNS:
+            raise ValueError(f"analytics store at {self.path} has a different column layout; re-export it")
+        return meta
+
+    def _write_meta(self) -> None:
+        tmp = self._meta_path() + ".tmp"
+        with open(tmp, "w") as fh:
+            json.dump(self.meta, fh)
+        os.replace(tmp, self._meta_path())
+
+    def _file(self, column: str) -> str:
+        return os.path.join(self.path, f"{column}.bin")
+
+    def _repair(self) -> None:
+        """Trim column files to the committed row count (after a crash)."""
+        for name, dtype in COLUMNS.items():
+            path = self._file(name)
+            size = self.rows * np.dtype(dtype).itemsize
+            if os.path.exists(path) and os.path.getsize(path) > size:
+                with open(path, "r+b") as fh:
+                    fh.truncate(size)
+
+    @property
+    def rows(self) -> int:
+        return self.meta["rows"]
+
+    @property
+    def watermark(self) -> int:
+        return self.meta["watermark"]
+
+    # --- export ---
+    def _exported_ids(self, above: int) -> Set[int]:
+        """Ids already in the store that are greater than `above`."""
+        ids = self.column("id")
+        return set(ids[ids > above].tolist())
+
+    def export_incremental(self, chunk_size: int = 10000) -> int:
+        """Append predictions with id > watermark, plus late commits in the overlap window.
+
+        Returns rows appended.
+        """
+        ensure_schema()
+        os.makedirs(self.path, exist_ok=True)
+        self._repair()
+        codes = {
+            "wallets": {v: i for i, v in enumerate(self.meta["wallets"])},
+            "protocols": {v: i for i, v in enumerate(self.meta["protocols"])},
+        }
+
+        def encode(kind: str, value: Optional[str]) -> int:
+            if value is None:
+                return -1
+            table = codes[kind]
+            if value not in table:
+                table[value] = len(self.meta[kind])
+                self.meta[kind].append(value)
+            return table[value]
+
+        feature_cols = [getattr(Prediction, n) for n in FEATURE_COLUMNS]
+        base = select(
+            Prediction.id, Prediction.timestamp, Prediction.user_wallet,
+            Prediction.protocol, Prediction.risk_probability, *feature_cols,
+        )
+        appended = 0
+        db = SessionLocal()
+        try:
+            # Late commits: lower ids that were not visible at the last export
+            low = max(0, self.watermark - settings.ANALYTICS_OVERLAP_IDS)
+            if self.rows and low < self.watermark:
+                query = base.where(Prediction.id > low, Prediction.id <= self.watermark)
+                if self.meta.get("watermark_us") and settings.ANALYTICS_OVERLAP_SECONDS:
+                    since = _EPOCH + datetime.timedelta(
+                        microseconds=self.meta["watermark_us"],
+                        seconds=-settings.ANALYTICS_OVERLAP_SECONDS)
+                    query = query.where(Prediction.timestamp >= since)
+                seen = self._exported_ids(low)
+                late = [r for r in db.execute(query.order_by(Prediction.id)) if r.id not in seen]
+                for start in range(0, len(late), chunk_size):
+                    appended += self._append_rows(db, late[start:start + chunk_size], encode)
+
+            while True:
+                rows = db.execute(
+                    base.where(Prediction.id > self.watermark).order_by(Prediction.id).limit(chunk_size)
+                ).all()
+                if not rows:
+                    break
+                appended += self._append_rows(db, rows, encode)
+        finally:
+            db.close()
+        return appended
+
+    def _append_rows(self, db, rows, encode) -> int:
+        """Append one id-ordered chunk and commit it to meta.json."""
+        # Rows that predate the typed columns: derive them from JSON
+        legacy = {
+            rid: typed_columns(inp or {}, out or {})
+            for rid, inp, out in db.execute(
+                select(Prediction.id, Prediction.input, Prediction.output)
+                .where(Prediction.id.in_([r.id for r in rows if r.risk_probability is None]))
+            )
+        } if any(r.risk_probability is None for r in rows) else {}
+
+        chunk = {name: [] for name in COLUMNS}
+        for r in rows:
+            typed = legacy.get(r.id)
+            if typed is None:
+                typed = dict(zip(FEATURE_COLUMNS, r[5:5 + len(FEATURE_COLUMNS)]))
+                typed["risk_probability"] = r.risk_probability
+            chunk["id"].append(r.id)
+            chunk["timestamp_us"].append(_to_us(r.timestamp))
+            chunk["wallet"].append(encode("wallets", r.user_wallet))
+            chunk["protocol"].append(encode("protocols", r.protocol))
+            chunk["risk_probability"].append(_nan(typed["risk_probability"]))
+            for name in FEATURE_COLUMNS:
+                chunk[name].append(_nan(typed[name]))
+
+        for name, dtype in COLUMNS.items():
+            with open(self._file(name), "ab") as fh:
+                np.asarray(chunk[name], dtype=dtype).tofile(fh)
+        self.meta["rows"] += len(rows)
+        self.meta["watermark"] = max(self.watermark, rows[-1].id)
+        self.meta["watermark_us"] = max(self.meta.get("watermark_us", 0), max(chunk["timestamp_us"]))
+        self._write_meta()
+        return len(rows)
+
+    # --- query ---
+    def column(self, name: str) -> np.ndarray:
+        """Read-only, zero-copy view of one column."""
+        if name not in COLUMNS:
+            raise KeyError(f"unknown column {name!r}")
+        if self.rows == 0:
+            return np.empty(0, dtype=COLUMNS[name])
+        return np.memmap(self._file(name), dtype=COLUMNS[name], mode="r", shape=(self.rows,))
+
+    def _mask(self, wallet: Optional[str], protocol: Optional[str],
+              since: Optional[datetime.datetime], until: Optional[datetime.datetime]) -> np.ndarray:
+        mask = np.ones(self.rows, dtype=bool)
+        if wallet is not None:
+            code = self.meta["wallets"].index(wallet) if wallet in self.meta["wallets"] else -2
+            mask &= self.column("wallet") == code
+        if protocol is not None:
+            code = self.meta["protocols"].index(protocol) if protocol in self.meta["protocols"] else -2
+            mask &= self.column("protocol") == code
+        if since is not None or until is not None:
+            ts = self.column("timestamp_us")
+            if since is not None:
+                mask &= ts >= _to_us(since)
+            if until is not None:
+                mask &= ts < _to_us(until)
+        return mask
+
+    def summary(self, column: str = "risk_probability", wallet: Optional[str] = None,
+                protocol: Optional[str] = None, since: Optional[datetime.datetime] = None,
+                until: Optional[datetime.datetime] = None) -> Dict[str, float]:
+        values = self.column(column)[self._mask(wallet, protocol, since, until)]
+        values = values[~np.isnan(values)]
+        if values.size == 0:
+            return {"count": 0}
+        return {
+            "count": int(values.size),
+            "min": float(values.min()),
+            "mean": round(float(values.mean()), 4),
+            "max": float(values.max()),
+            "p95": float(np.percentile(values, 95)),
+        }
+
+    def bucketed(self, interval_seconds: int, column: str = "risk_probability",
+                 by: Optional[str] = "wallet", **filters) -> List[dict]:
+        """min/mean/max of `column` per (`by` code, time bucket)."""
+        mask = self._mask(filters.get("wallet"), filters.get("protocol"),
+                          filters.get("since"), filters.get("until"))
+        values = self.column(column)[mask]
+        buckets = self.column("timestamp_us")[mask] // (interval_seconds * 1_000_000)
+        groups = self.column(by)[mask] if by else np.zeros(values.size, dtype=np.int32)
+        keep = ~np.isnan(values)
+        values, buckets, groups = values[keep], buckets[keep], groups[keep]
+        if values.size == 0:
+            return []
+
+        keys = np.stack([groups.astype(np.int64), buckets])
+        uniq, inverse = np.unique(keys, axis=1, return_inverse=True)
+        inverse = inverse.ravel()
+        n = uniq.shape[1]
+        counts = np.bincount(inverse, minlength=n)
+        sums = np.bincount(inverse, weights=values, minlength=n)
+        mins = np.full(n, np.inf)
+        maxs = np.full(n, -np.inf)
+        np.minimum.at(mins, inverse, values)
+        np.maximum.at(maxs, inverse, values)
+
+        names = self.meta[f"{by}s"] if by else []
+        out = []
+        for i in range(n):
+            code, bucket = int(uniq[0, i]), int(uniq[1, i])
+            out.append({
+                by or "group": (names[code] if by and code >= 0 else None),
+                "bucket_start": (_EPOCH + datetime.timedelta(seconds=bucket * interval_seconds)).isoformat(),
+                "count": int(counts[i]),
+                "min": float(mins[i]),
+                "mean": round(float(sums[i] / counts[i]), 4),
+                "max": float(maxs[i]),
+            })
+        return out
@@ -0,0 +1,182 @@
+"""
+asi_batcher.py
+
+Optional micro-batcher for ASI:One chat-completion endpoints.
+
+Concurrent predictions arriving within ASI_MICROBATCH_WINDOW_MS (capped
+at ASI_MICROBATCH_MAX_ITEMS) are sent as ONE chat completion that lists
+every portfolio and asks for structured JSON back. The parsed results are
+fanned out to the waiting callers. Items the batch cannot answer (HTTP
+error, unparsable JSON, missing ids) fall back to individual calls, so
+batching never loses a prediction. Each caller passes its own deadline:
+the fallback call only gets the time that caller has left, and an item
+whose deadline has already passed fails straight away so the caller can
+move on to the distilled fallback.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+import aiohttp
+
+from ..config import settings
+from .http_client import get_session
+
+logger = logging.getLogger(__name__)
+
+SingleCall = Callable[[str, dict, float], Awaitable[dict]]
+
+BATCH_SYSTEM_PROMPT = (
+    "You are a DeFi risk analysis model. For EACH portfolio estimate the "
+    "liquidation risk probability (0-100) and its class. Reply with JSON only, "
+    'no prose: {"results": [{"id": <id>, "risk_probability": <number>, '
+    '"risk_class": "🟢 Low Risk" | "🟡 Medium Risk" | "🔴 High Risk"}]}'
+)
+
+
+def build_batch_request(payloads: List[dict]) -> dict:
+    portfolios = [{"id": i, **p.get("inputs", p)} for i, p in enumerate(payloads)]
+    return {
+        "model": "asi1-mini",
+        "messages": [
+            {"role": "system", "content": BATCH_SYSTEM_PROMPT},
+            {"role": "user", "content": "Portfolios:\n" + json.dumps(portfolios, separators=(",", ":"))},
+        ],
+        "temperature": 0.2,
+        # ~40 tokens per JSON result plus envelope
+        "max_tokens": 40 * len(payloads) + 50,
+    }
+
+
+def parse_batch_response(data: dict) -> Dict[int, dict]:
+    """Map portfolio id → result dict from a chat-completion response."""
+    text = data["choices"][0]["message"]["content"]
+    start, end = text.find("{"), text.rfind("}")
+    if start < 0 or end <= start:
+        raise ValueError("no JSON object in batched ASI response")
+    parsed = json.loads(text[start:end + 1])
+    results = {}
+    for item in parsed.get("results", []):
+        try:
+            idx = int(item["id"])
+            prob = float(item["risk_probability"])
+        except (KeyError, TypeError, ValueError):
+            continue
+        results[idx] = {
+            "risk_probability": round(prob, 2),
+            "risk_class": item.get("risk_class", "Unknown"),
+            "message": "",
+            "source": "ASI:One Cloud (batched)",
+        }
+    return results
+
+
+class MicroBatcher:
+    def __init__(self, url: str, headers: Dict[str, str], single_call: SingleCall,
+                 window: float, max_items: int):
+        self.url = url
+        self.headers = headers
+        self.single_call = single_call
+        self.window = window
+        self.max_items = max(1, max_items)
+        self._queue: List[Tuple[dict, asyncio.Future, float]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # In-flight sends: the loop only keeps weak references to tasks
+        self._sending: Set[asyncio.Task] = set()
+        self.stats = {"batches": 0, "batched_items": 0, "item_fallbacks": 0, "batch_failures": 0}
+
+    async def submit(self, payload: dict, deadline_at: Optional[float] = None) -> dict:
+        """Queue one payload; `deadline_at` is the caller's time.monotonic() deadline."""
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        if deadline_at is None:
+            deadline_at = time.monotonic() + settings.ASI_ATTEMPT_TIMEOUT_SECONDS
+        self._queue.append((payload, fut, deadline_at))
+        if len(self._queue) >= self.max_items:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await fut
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._queue = self._queue, []
+        if batch:
+            task = asyncio.ensure_future(self._send(batch))
+            self._sending.add(task)
+            task.add_done_callback(self._sending.discard)
+
+    async def _send(self, batch: List[Tuple[dict, asyncio.Future, float]]) -> None:
+        results: Dict[int, dict] = {}
+        if len(batch) > 1:
+            try:
+                # No caller waits past the latest deadline in the batch
+                budget = max(d for _, _, d in batch) - time.monotonic()
+                results = await self._batched_call([p for p, _, _ in batch], budget)
+                self.stats["batches"] += 1
+                self.stats["batched_items"] += len(results)
+            except Exception as e:
+                self.stats["batch_failures"] += 1
+                logger.warning("⚠️ Batched ASI call failed (%d items): %s", len(batch), e)
+
+        retries = []
+        for i, (payload, fut, deadline_at) in enumerate(batch):
+            if fut.done():
+                continue  # caller gave up (deadline / hedge loser)
+            if i in results:
+                fut.set_result(results[i])
+            else:
+                retries.append((payload, fut, deadline_at))
+        if retries:
+            if len(batch) > 1:
+                self.stats["item_fallbacks"] += len(retries)
+            await asyncio.gather(*(self._single(p, f, d) for p, f, d in retries))
+
+    async def _single(self, payload: dict, fut: asyncio.Future, deadline_at: float) -> None:
+        # Only the time this caller has left, never a fresh full attempt timeout
+        budget = min(deadline_at - time.monotonic(), settings.ASI_ATTEMPT_TIMEOUT_SECONDS)
+        try:
+            if budget <= 0:
+                raise asyncio.TimeoutError("ASI request deadline exhausted")
+            result = await self.single_call(self.url, payload, budget)
+        except Exception as e:
+            if not fut.done():
+                fut.set_exception(e)
+            return
+        if not fut.done():
+            fut.set_result(result)
+
+    async def _batched_call(self, payloads: List[dict], budget: float) -> Dict[int, dict]:
+        if budget <= 0:
+            raise asyncio.TimeoutError("ASI request deadline exhausted")
+        session = await get_session()
+        timeout = aiohttp.ClientTimeout(total=min(budget, settings.ASI_ATTEMPT_TIMEOUT_SECONDS))
+        async with session.post(self.url, headers=self.headers,
+                                json=build_batch_request(payloads), timeout=timeout) as resp:
+            if resp.status != 200:
+                raise RuntimeError(f"ASI API returned {resp.status} on {self.url}")
+            data = await resp.json(content_type=None)
+        return parse_batch_response(data)
+
+
+_batchers: Dict[str, MicroBatcher] = {}
+
+
+def get_batcher(url: str, headers: Dict[str, str], single_call: SingleCall) -> MicroBatcher:
+    batcher = _batchers.get(url)
+    if batcher is None:
+        batcher = _batchers[url] = MicroBatcher(
+            url, headers, single_call,
+            window=settings.ASI_MICROBATCH_WINDOW_MS / 1000.0,
+            max_items=settings.ASI_MICROBATCH_MAX_ITEMS,
+        )
+    return batcher
+
+
+def batcher_stats() -> Dict[str, Dict[str, Any]]:
+    return {url: dict(b.stats) for url, b in _batchers.items()}
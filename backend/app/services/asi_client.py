@@ -1,107 +1,213 @@
 """
 asi_client.py — robust ASI:One + local fallback client
+
+Endpoints in ASI_ENDPOINTS are tried in order of health: each one has a
+circuit breaker and an EWMA latency score (see endpoint_health.py), so a
+dead primary is skipped instead of costing a timeout on every request.
+Each request has one overall deadline (ASI_REQUEST_DEADLINE_SECONDS)
+rather than a fixed timeout per endpoint, and with ASI_HEDGE_ENABLED a
+second endpoint is fired when the first is slower than its own p95.
 """
 
 import aiohttp
 import asyncio
+import logging
 import re
 import random
+import time
+from typing import Optional
 from ..config import settings
+from .http_client import get_session
+from .local_model import get_local_model
+from .endpoint_health import EndpointHealth, rank_endpoints
+from .asi_batcher import get_batcher
+from .metrics import upstream_call
+from .upstream import upstream_name
+
+logger = logging.getLogger(__name__)
 
 
 # Default ASI endpoint list (cloud + local fallback)
 ASI_ENDPOINTS = [
     settings.ASI_ENDPOINT or "http://127.0.0.1:8001",
+    *[u.strip() for u in settings.ASI_FALLBACK_ENDPOINTS.split(",") if u.strip()],
 ]
 
 
-async def call_asi_model(payload: dict) -> dict:
+class ASIUnavailable(Exception):
+    """Endpoint answered with a non-200 status."""
+
+
+def _is_chat_endpoint(url: str) -> bool:
+    # ASI:One cloud, or any local stand-in speaking the chat-completions format
+    return "asi1.ai" in url or url.endswith("/chat/completions")
+
+
+def _headers() -> dict:
+    headers = {
+        "Content-Type": "application/json",
+        "Accept": "application/json",
+    }
+
+    if settings.ASI_API_KEY:
+        headers["Authorization"] = f"Bearer {settings.ASI_API_KEY}"
+    return headers
+
+
+def _build_request(url: str, payload: dict):
+    headers = _headers()
+
+    # ✅ Detect if using ASI Cloud or local mock
+    if _is_chat_endpoint(url):
+        # Cloud ASI:One format
+        json_payload = {
+            "model": "asi1-mini",
+            "messages": [
+                {
+                    "role": "system",
+                    "content": "You are a DeFi risk analysis model. Respond concisely with risk probability and class (🟢/🟡/🔴).",
+                },
+                {
+                    "role": "user",
+                    "content": f"Given these metrics, estimate the DeFi portfolio risk:\n{payload}",
+                },
+            ],
+            "temperature": 0.4,
+            "max_tokens": 150,
+        }
+    else:
+        # Local ASI mock expects raw payload
+        json_payload = payload
+    return headers, json_payload
+
+
+def _parse_response(data: dict) -> dict:
+    # 🧠 ASI:One returns "choices" with text inside
+    if "choices" in data:
+        text = data["choices"][0]["message"]["content"]
+
+        # Parse probability (like "Risk probability: 42.5")
+        prob_match = re.search(r"([0-9]+(?:\.[0-9]+)?)", text)
+        prob = float(prob_match.group(1)) if prob_match else random.uniform(20, 80)
+
+        # Parse risk class emoji/text
+        cls_match = re.search(r"(🟢|🟡|🔴)\s*\w*\s*Risk", text)
+        risk_class = cls_match.group(0) if cls_match else "Unknown"
+
+        return {
+            "risk_probability": round(prob, 2),
+            "risk_class": risk_class,
+            "message": text.strip(),
+            "source": "ASI:One Cloud",
+        }
+
+    # Local mock JSON
+    return {
+        "risk_probability": data.get("risk_probability", 0.0),
+        "risk_class": data.get("risk_class", "Unknown"),
+        "message": data.get("message", ""),
+        "source": "ASI-local",
+    }
+
+
+async def _post_single(url: str, payload: dict, budget: float) -> dict:
+    """One un-batched request/response round trip."""
+    headers, json_payload = _build_request(url, payload)
+    session = await get_session()
+    async with session.post(url, headers=headers, json=json_payload,
+                            timeout=aiohttp.ClientTimeout(total=budget)) as resp:
+        if resp.status != 200:
+            raise ASIUnavailable(f"ASI API returned {resp.status} on {url}")
+        data = await resp.json(content_type=None)
+    return _parse_response(data)
+
+
+async def _attempt(health: EndpointHealth, payload: dict, deadline_at: float) -> dict:
+    """One request to one endpoint, recorded against its breaker."""
+    url = health.url.rstrip("/")
+    health.acquire()
+    start = time.monotonic()
+    budget = min(deadline_at - start, settings.ASI_ATTEMPT_TIMEOUT_SECONDS)
+    try:
+        if budget <= 0:
+            raise asyncio.TimeoutError("ASI request deadline exhausted")
+        logger.debug("Trying ASI at: %s", url)
+        with upstream_call(upstream_name(url)):
+            if settings.ASI_MICROBATCH_ENABLED and _is_chat_endpoint(url):
+                # 📦 Coalesce with concurrent callers into one chat completion
+                batcher = get_batcher(url, _headers(), _post_single)
+                result = await asyncio.wait_for(batcher.submit(payload, start + budget), budget)
+            else:
+                result = await _post_single(url, payload, budget)
+    except asyncio.CancelledError:
+        health.release()
+        raise
+    except Exception:
+        health.record_failure()
+        raise
+    health.record_success(time.monotonic() - start)
+    return result
+
+
+async def call_asi_model(payload: dict, deadline: Optional[float] = None) -> dict:
     """
     Try calling ASI endpoints (cloud or local).
     If ASI Cloud (asi1.ai) is reachable, parse real model output.
-    Falls back to local simulated model if all fail.
+    Falls back to local simulated model if all fail or `deadline`
+    (seconds, default ASI_REQUEST_DEADLINE_SECONDS) runs out.
     """
-    timeout = aiohttp.ClientTimeout(total=15)
-    last_error = None
-
-    for base in ASI_ENDPOINTS:
-        url = base.rstrip("/")
-        try:
-            print(f"[DEBUG] Trying ASI at: {url}")
-
-            headers = {
-                "Content-Type": "application/json",
-                "Accept": "application/json",
-            }
-
-            if settings.ASI_API_KEY:
-                headers["Authorization"] = f"Bearer {settings.ASI_API_KEY}"
-
-            # ✅ Detect if using ASI Cloud or local mock
-            if "asi1.ai" in url:
-                # Cloud ASI:One format
-                json_payload = {
-                    "model": "asi1-mini",
-                    "messages": [
-                        {
-                            "role": "system",
-                            "content": "You are a DeFi risk analysis model. Respond concisely with risk probability and class (🟢/🟡/🔴).",
-                        },
-                        {
-                            "role": "user",
-                            "content": f"Given these metrics, estimate the DeFi portfolio risk:\n{payload}",
-                        },
-                    ],
-                    "temperature": 0.4,
-                    "max_tokens": 150,
-                }
-            else:
-                # Local ASI mock expects raw payload
-                json_payload = payload
-
-            async with aiohttp.ClientSession(timeout=timeout) as session:
-                async with session.post(url, headers=headers, json=json_payload) as resp:
-                    data = await resp.json()
-                    if resp.status == 200:
-                        print(f"✅ ASI Cloud responded successfully: {url}")
-
-                        # 🧠 ASI:One returns "choices" with text inside
-                        if "choices" in data:
-                            text = data["choices"][0]["message"]["content"]
-
-                            # Parse probability (like "Risk probability: 42.5")
-                            prob_match = re.search(r"([0-9]+(?:\.[0-9]+)?)", text)
-                            prob = float(prob_match.group(1)) if prob_match else random.uniform(20, 80)
-
-                            # Parse risk class emoji/text
-                            cls_match = re.search(r"(🟢|🟡|🔴)\s*\w*\s*Risk", text)
-                            risk_class = cls_match.group(0) if cls_match else "Unknown"
-
-                            return {
-                                "risk_probability": round(prob, 2),
-                                "risk_class": risk_class,
-                                "message": text.strip(),
-                                "source": "ASI:One Cloud",
-                            }
-
-                        # Local mock JSON
-                        return {
-                            "risk_probability": data.get("risk_probability", 0.0),
-                            "risk_class": data.get("risk_class", "Unknown"),
-                            "message": data.get("message", ""),
-                            "source": "ASI-local",
-                        }
-
-                    else:
-                        print(f"⚠️ ASI API returned {resp.status} on {url}")
-                        last_error = resp.status
-
-        except Exception as e:
-            print(f"⚠️ ASI API call failed on {url}: {e}")
-            last_error = str(e)
+    deadline = settings.ASI_REQUEST_DEADLINE_SECONDS if deadline is None else deadline
+    deadline_at = time.monotonic() + deadline
+    candidates = rank_endpoints(ASI_ENDPOINTS)
+    last_error = None if candidates else "all ASI circuits open"
+
+    pending = set()
+    launched = []
+
+    def launch():
+        h = candidates[len(launched)]
+        launched.append(h)
+        pending.add(asyncio.ensure_future(_attempt(h, payload, deadline_at)))
+
+    try:
+        while True:
+            if not pending:
+                # Sequential failover: next endpoint once the previous one failed
+                if len(launched) >= len(candidates) or time.monotonic() >= deadline_at:
+                    break
+                launch()
+
+            # Hedge: fire the next endpoint if this one runs past its p95
+            can_hedge = settings.ASI_HEDGE_ENABLED and len(launched) < len(candidates)
+            wait_for = launched[-1].hedge_delay() if can_hedge else None
+            done, pending = await asyncio.wait(pending, timeout=wait_for,
+                                               return_when=asyncio.FIRST_COMPLETED)
+            for t in done:
+                if t.exception() is None:
+                    logger.debug("✅ ASI responded successfully")
+                    return t.result()
+                last_error = str(t.exception()) or type(t.exception()).__name__
+                logger.warning("⚠️ ASI API call failed: %s", last_error)
+            if not done and time.monotonic() < deadline_at:
+                launch()
+    finally:
+        for t in pending:
+            t.cancel()
+
+    # 🧠 fallback — distilled local model, if one is trained and enabled
+    model = get_local_model()
+    if model is not None and settings.LOCAL_MODEL_MODE != "off":
+        logger.info("🔍 Final Risk Model Used: distilled_local")
+        return {
+            "risk_probability": model.predict_one(payload.get("inputs", payload)),
+            "risk_class": "Unknown",
+            "message": "Distilled local model used due to ASI unavailability.",
+            "source": "distilled_local",
+            "error": last_error,
+        }
 
     # 🚨 fallback — simulate risk locally
-    print("🔍 Final Risk Model Used: local_fallback")
+    logger.info("🔍 Final Risk Model Used: local_fallback")
 
     prob = round(random.uniform(20, 90), 2)
     if prob < 40:
@@ -0,0 +1,232 @@
+"""
+covariance.py
+
+Shared multi-asset covariance engine for portfolio-level risk.
+
+Once per tick (or every COV_TTL_SECONDS for API callers) a snapshot is
+built over every tracked asset (COV_ASSETS):
+- prices as the market cache already holds them (fresh or stale, no
+  refresh forced); assets it has no entry for are fetched together in
+  one multi-id /simple/price request. An asset that still has no price
+  is NaN in the snapshot: its reserves count as unpriced, and a snapshot
+  with any NaN price is used once but never cached
+- a covariance matrix of log returns, computed in one NumPy pass over
+  the price histories the streaming stats engine already holds (each
+  asset is loaded once per process from the local price store, never
+  per wallet), resampled
+  onto a common COV_RESAMPLE_SECONDS grid and scaled to
+  STATS_DEFAULT_HORIZON
+
+Scoring a wallet is then a valuation of its reserves plus one small
+quadratic form: the volatility of log(collateral / debt) is
+sqrt((wc - wd)' Σ (wc - wd)), where wc / wd are the collateral and debt
+weights per asset. That is the volatility of the health factor, so
+ETH-on-ETH loops score near zero and ETH collateral against stablecoin
+debt scores the ETH volatility.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from ..config import settings
+from .market_cache import entry_age, get_prices, resolve_asset_id
+from .price_stats import get_stats, parse_horizon
+from .upstream import Stale
+
+logger = logging.getLogger(__name__)
+
+
+class CovarianceSnapshot:
+    __slots__ = ("assets", "index", "prices", "cov", "built_at", "stale")
+
+    def __init__(self, assets: List[str], prices: np.ndarray, cov: np.ndarray,
+                 stale: Sequence[str] = ()):
+        self.assets = assets
+        self.index = {a: i for i, a in enumerate(assets)}
+        self.prices = prices
+        self.cov = cov
+        self.built_at = time.monotonic()
+        self.stale = list(stale)  # assets priced from an expired cache entry
+
+    @property
+    def complete(self) -> bool:
+        """Every tracked asset has a price."""
+        return bool(np.isfinite(self.prices).all())
+
+    @property
+    def missing(self) -> List[str]:
+        return [a for a, p in zip(self.assets, self.prices) if not np.isfinite(p)]
+
+    def exposures(self, reserves: Sequence[dict]) -> Dict[str, np.ndarray]:
+        """
+        USD collateral / debt vectors (one slot per tracked asset).
+        `unpriced` counts reserves that could not be valued (untracked asset
+        or no price); `missing_prices` counts those that hold a balance in
+        a tracked asset whose price is missing.
+        """
+        collateral = np.zeros(len(self.assets))
+        debt = np.zeros(len(self.assets))
+        unpriced = missing_prices = 0
+        for r in reserves:
+            reserve = r.get("reserve") or {}
+            i = self.index.get(resolve_asset_id(reserve.get("symbol") or ""))
+            if i is None:
+                unpriced += 1
+                continue
+            scale = 10.0 ** -int(reserve.get("decimals") or 0)
+            c = float(r.get("scaledATokenBalance") or 0) * scale
+            d = float(r.get("currentTotalDebt") or 0) * scale
+            if not np.isfinite(self.prices[i]):
+                unpriced += 1
+                missing_prices += bool(c or d)
+                continue
+            collateral[i] += c * self.prices[i]
+            debt[i] += d * self.prices[i]
+        return {"collateral": collateral, "debt": debt, "unpriced": unpriced,
+                "missing_prices": missing_prices}
+
+    def health_volatility(self, collateral: np.ndarray, debt: np.ndarray) -> float:
+        """Horizon volatility of log(collateral / debt) for one wallet."""
+        c_total, d_total = collateral.sum(), debt.sum()
+        w = (collateral / c_total if c_total else collateral) - (debt / d_total if d_total else debt)
+        return float(np.sqrt(max(w @ self.cov @ w, 0.0)))
+
+    def position(self, reserves: Sequence[dict]) -> Optional[Dict[str, float]]:
+        """
+        Portfolio features for `reserves`, or None when nothing could be
+        valued or a held asset has no price (a partial valuation would skew
+        the collateral ratio).
+        """
+        exp = self.exposures(reserves)
+        if exp["missing_prices"]:
+            return None
+        c_usd, d_usd = float(exp["collateral"].sum()), float(exp["debt"].sum())
+        if c_usd <= 0 and d_usd <= 0:
+            return None
+        # Price driver for liquidation_index.py: the asset whose moves shift the
+        # collateral ratio most (net exposure c - CR * d, weighted by volatility)
+        net = np.abs(exp["collateral"] - (c_usd / d_usd if d_usd else 0.0) * exp["debt"])
+        sens = net * np.sqrt(np.clip(np.diag(self.cov), 0.0, None))
+        i = int(np.argmax(sens if sens.any() else net))
+        return {
+            "collateral_usd": round(c_usd, 2),
+            "debt_usd": round(d_usd, 2),
+            "collateral_ratio": round(c_usd / d_usd, 2) if d_usd else None,
+            "leverage": round(1 + d_usd / c_usd, 2) if c_usd else None,
+            "volatility": round(self.health_volatility(exp["collateral"], exp["debt"]), 4),
+            "unpriced_reserves": exp["unpriced"],
+            "price_driver": {
+                "asset": self.assets[i],
+                "price": float(self.prices[i]),
+                "collateral_usd": round(float(exp["collateral"][i]), 2),
+                "debt_usd": round(float(exp["debt"][i]), 2),
+            },
+        }
+
+
+def resample(points: Sequence[tuple], grid: np.ndarray) -> np.ndarray:
+    """Last price at or before each grid time (NaN before the first point)."""
+    if not points:
+        return np.full(len(grid), np.nan)
+    arr = np.asarray(points, dtype=np.float64)
+    idx = np.searchsorted(arr[:, 0], grid, side="right") - 1
+    out = arr[np.clip(idx, 0, None), 1]
+    out[idx < 0] = np.nan
+    return out
+
+
+def covariance_matrix(histories: Sequence[Sequence[tuple]], step: float, horizon: float,
+                      now: Optional[float] = None) -> np.ndarray:
+    """
+    Covariance of log returns on a common grid, scaled to `horizon`
+    seconds. Pairs are estimated over the periods both assets have data;
+    assets without enough history get zero variance.
+    """
+    n = len(histories)
+    now = time.time() if now is None else now
+    grid = np.arange(now - horizon, now + step / 2, step)
+    prices = np.vstack([resample(h, grid) for h in histories]) if n else np.empty((0, len(grid)))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        returns = np.diff(np.log(prices), axis=1)
+    masked = np.ma.masked_invalid(returns)
+    if masked.shape[1] < 2:
+        return np.zeros((n, n))
+    cov = np.ma.cov(masked, allow_masked=True).filled(0.0)
+    cov = np.atleast_2d(cov)
+    # per-step → horizon
+    return np.nan_to_num(cov) * (horizon / step)
+
+
+def tracked_assets() -> List[str]:
+    return list(dict.fromkeys(
+        resolve_asset_id(a) for a in settings.COV_ASSETS.split(",") if a.strip()
+    ))
+
+
+async def build_snapshot() -> CovarianceSnapshot:
+    assets = tracked_assets()
+    # Prices: whatever the market cache holds, the rest in one multi-id request
+    stats, prices = await asyncio.gather(
+        asyncio.gather(*(get_stats(a) for a in assets)),
+        get_prices(assets),
+    )
+    cov = covariance_matrix(
+        [s.points() for s in stats],
+        step=settings.COV_RESAMPLE_SECONDS,
+        horizon=parse_horizon(settings.STATS_DEFAULT_HORIZON),
+    )
+    stale = [a for a in assets if a in prices and entry_age(a) > settings.MARKET_CACHE_TTL_SECONDS]
+    # Unpriced assets stay NaN: never value them at a default price
+    return CovarianceSnapshot(assets, np.asarray([prices.get(a, np.nan) for a in assets], dtype=np.float64),
+                              cov, stale)
+
+
+_snapshot: Optional[CovarianceSnapshot] = None
+_building: Optional[asyncio.Task] = None
+
+
+def _store(task: asyncio.Task) -> None:
+    global _snapshot
+    if not task.cancelled() and task.exception() is None:
+        snapshot = task.result()
+        if snapshot.complete:
+            _snapshot = snapshot
+        else:
+            # Missing prices: serve this build to its callers, rebuild next time
+            logger.warning("Covariance snapshot not cached, no price for %s", ", ".join(snapshot.missing))
+
+
+async def refresh_snapshot() -> CovarianceSnapshot:
+    """
+    Build a new snapshot (single-flight: concurrent callers share one build,
+    and a caller timing out does not throw the finished build away).
+    """
+    global _building
+    if _building is None or _building.done():
+        _building = asyncio.ensure_future(build_snapshot())
+        _building.add_done_callback(_store)
+    return await asyncio.shield(_building)
+
+
+async def get_snapshot(strict: bool = False):
+    """
+    Current snapshot, rebuilt when older than COV_TTL_SECONDS. With
+    strict=True (provenance-reporting callers) a snapshot with stale or
+    missing prices comes back wrapped in upstream.Stale.
+    """
+    if _snapshot is not None and time.monotonic() - _snapshot.built_at < settings.COV_TTL_SECONDS:
+        snapshot = _snapshot
+    else:
+        snapshot = await refresh_snapshot()
+    if strict and (snapshot.stale or not snapshot.complete):
+        reasons = []
+        if snapshot.stale:
+            reasons.append(f"stale prices for {', '.join(snapshot.stale)}")
+        if not snapshot.complete:
+            reasons.append(f"no price for {', '.join(snapshot.missing)}")
+        return Stale(snapshot, "; ".join(reasons))
+    return snapshot
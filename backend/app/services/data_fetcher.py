@@ -1,38 +1,96 @@
 """
 data_fetcher.py
 
-Placeholders for fetching on-chain or market data. Replace mocks with real calls:
-- TheGraph subgraph queries for Aave/Uniswap
+Fetchers for on-chain and market data:
+- Aave positions: batched TheGraph subgraph queries (subgraph_loader.py),
+  valued per reserve against the shared covariance snapshot (covariance.py)
 - Chainlink or market APIs for price/volatility
+
+Volatility and trend are read from the streaming statistics engine
+(price_stats.py); the constants below are only used until it has data.
 """
 
 import asyncio
-from typing import Dict
+from typing import Dict, Optional, Tuple
+
+from ..config import settings
+from .covariance import CovarianceSnapshot, get_snapshot
+from .market_cache import get_price
+from .price_stats import get_stats
+from .subgraph_loader import load_user_reserves
+
+DEFAULT_VOLATILITY = 0.59
+DEFAULT_TREND = -0.15
+MOCK_POSITION = {
+    "collateral_ratio": 1.2,
+    "leverage": 2.5,
+    "asset_price": 1600.0
+}
+# A wallet without debt cannot be liquidated. Its ratio is capped here (the
+# models need a finite number) and risk_model floors its score; leverage is
+# capped the same way for debt without priced collateral.
+NO_DEBT_COLLATERAL_RATIO = 10.0
+MAX_LEVERAGE = 10.0
+
 
-async def fetch_aave_position(user_address: str) -> Dict:
+def position_ratios(collateral_usd: float, debt_usd: float) -> Tuple[float, float]:
+    """(collateral_ratio, leverage) with no-debt / no-collateral handled explicitly."""
+    if not debt_usd:
+        return NO_DEBT_COLLATERAL_RATIO, 1.0
+    if not collateral_usd:
+        return 0.0, MAX_LEVERAGE
+    return (round(min(collateral_usd / debt_usd, NO_DEBT_COLLATERAL_RATIO), 2),
+            round(min(1 + debt_usd / collateral_usd, MAX_LEVERAGE), 2))
+
+
+async def fetch_aave_position(user_address: str, snapshot: Optional[CovarianceSnapshot] = None) -> Dict:
     """
-    Fetch user's Aave position. Replace with TheGraph or RPC call.
-    Returns a dict with collateral_ratio, leverage, asset_price.
+    Fetch user's Aave v3 position from the subgraph. Lookups are batched
+    with every other wallet fetched in the same window (subgraph_loader.py).
+    Reserves are valued per asset and the portfolio volatility comes from
+    the shared covariance snapshot (pass the tick's `snapshot` to reuse it).
+    Returns a dict with collateral_ratio, leverage, asset_price (+ volatility,
+    collateral_usd, debt_usd). A wallet with no reserves has no debt
+    (debt_usd 0, capped ratio). The mock position is only returned when the
+    position is unknown: the lookup fails or the reserves cannot be valued.
     """
-    # TODO: implement real fetch using subgraph
-    await asyncio.sleep(0)  # placeholder async
+    try:
+        reserves = await asyncio.wait_for(load_user_reserves(user_address),
+                                          settings.UPSTREAM_SUBGRAPH_DEADLINE_SECONDS)
+    except Exception:
+        return dict(MOCK_POSITION)
+    if not reserves:
+        collateral_ratio, leverage = position_ratios(0.0, 0.0)
+        return {"collateral_ratio": collateral_ratio, "leverage": leverage,
+                "collateral_usd": 0.0, "debt_usd": 0.0, "asset_price": await get_price("eth")}
+
+    snapshot = snapshot or await get_snapshot()
+    position = snapshot.position(reserves)
+    if position is None:
+        return dict(MOCK_POSITION)
+    collateral_ratio, leverage = position_ratios(position["collateral_usd"], position["debt_usd"])
     return {
-        "collateral_ratio": 1.2,
-        "leverage": 2.5,
-        "asset_price": 1600.0
+        **position,
+        "collateral_ratio": collateral_ratio,
+        "leverage": leverage,
+        "asset_price": await get_price("eth"),
     }
 
 async def fetch_market_volatility(symbol: str = "ETH") -> float:
     """
-    Return volatility estimate (0-1).
-    Implement using historical OHLC or a volatility oracle.
+    Return volatility estimate (0-1): rolling stdev/mean over the default
+    statistics horizon.
     """
-    await asyncio.sleep(0)
-    return 0.59
+    stats = await get_stats(symbol)
+    if stats.size < 2:
+        return DEFAULT_VOLATILITY
+    return round(stats.volatility(), 4)
 
 async def fetch_market_trend(symbol: str = "ETH") -> float:
     """
     Return market trend as decimal (e.g., -0.1 for -10% in 24h).
     """
-    await asyncio.sleep(0)
-    return -0.15
+    stats = await get_stats(symbol)
+    if stats.size < 2:
+        return DEFAULT_TREND
+    return round(stats.trend("1d" if "1d" in stats.windows else None), 4)
@@ -0,0 +1,128 @@
+"""
+endpoint_health.py
+
+Per-endpoint health tracking for ASI_ENDPOINTS.
+
+Each endpoint has a circuit breaker:
+- closed:    normal traffic
+- open:      ASI_BREAKER_FAILURES consecutive failures; skipped until
+             ASI_BREAKER_COOLDOWN_SECONDS have passed
+- half_open: cooldown elapsed; exactly one probe request is let through,
+             success closes the breaker, failure re-opens it
+
+Healthy endpoints are ranked by an EWMA of observed latency, and recent
+latencies feed a p95 estimate used as the hedging delay.
+"""
+
+import logging
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class EndpointHealth:
+    def __init__(self, url: str):
+        self.url = url
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.ewma_latency: Optional[float] = None
+        self._samples: deque = deque(maxlen=200)
+        self.successes_total = 0
+        self.failures_total = 0
+
+    # --- breaker ---
+    def available(self, now: float) -> bool:
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and now - self.opened_at >= settings.ASI_BREAKER_COOLDOWN_SECONDS:
+            self.state = HALF_OPEN
+        return self.state == HALF_OPEN and not self.probe_in_flight
+
+    def acquire(self) -> None:
+        if self.state == HALF_OPEN:
+            self.probe_in_flight = True
+
+    def record_success(self, latency: float) -> None:
+        self.successes_total += 1
+        self.failures = 0
+        self.state = CLOSED
+        self.probe_in_flight = False
+        alpha = settings.ASI_EWMA_ALPHA
+        self.ewma_latency = latency if self.ewma_latency is None else (
+            alpha * latency + (1 - alpha) * self.ewma_latency
+        )
+        self._samples.append(latency)
+
+    def record_failure(self) -> None:
+        self.failures_total += 1
+        self.failures += 1
+        self.probe_in_flight = False
+        if self.state == HALF_OPEN or self.failures >= settings.ASI_BREAKER_FAILURES:
+            if self.state != OPEN:
+                logger.warning("⚠️ ASI circuit opened for %s", self.url)
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+
+    def release(self) -> None:
+        """Attempt abandoned (e.g. lost a hedge race) — no verdict."""
+        self.probe_in_flight = False
+
+    # --- latency ---
+    def p95(self) -> Optional[float]:
+        if len(self._samples) < 5:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+
+    def hedge_delay(self) -> float:
+        lo = settings.ASI_HEDGE_MIN_DELAY_SECONDS
+        hi = settings.ASI_HEDGE_MAX_DELAY_SECONDS
+        p95 = self.p95()
+        return hi if p95 is None else min(hi, max(lo, p95))
+
+    def snapshot(self) -> Dict[str, object]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "ewma_latency_ms": round(self.ewma_latency * 1000, 1) if self.ewma_latency is not None else None,
+            "p95_ms": round(self.p95() * 1000, 1) if self.p95() is not None else None,
+            "successes": self.successes_total,
+            "failures": self.failures_total,
+        }
+
+
+_health: Dict[str, EndpointHealth] = {}
+
+
+def health_for(url: str) -> EndpointHealth:
+    h = _health.get(url)
+    if h is None:
+        h = _health[url] = EndpointHealth(url)
+    return h
+
+
+def rank_endpoints(urls: List[str]) -> List[EndpointHealth]:
+    """
+    Available endpoints (closed, or half-open with a free probe slot),
+    fastest EWMA first. Endpoints not measured yet go first in configured
+    order, so each one gets sampled once.
+    """
+    now = time.monotonic()
+    candidates = [(i, health_for(u)) for i, u in enumerate(urls)]
+    candidates = [(i, h) for i, h in candidates if h.available(now)]
+    candidates.sort(key=lambda ih: (ih[1].ewma_latency is not None, ih[1].ewma_latency or 0.0, ih[0]))
+    return [h for _, h in candidates]
+
+
+def health_snapshot() -> Dict[str, Dict[str, object]]:
+    return {url: h.snapshot() for url, h in _health.items()}
@@ -5,18 +5,385 @@ Optional: functions that prepare/send transactions to reduce leverage.
 VERY IMPORTANT: sending on-chain transactions requires signing keys and is sensitive.
 This module will only attempt to send txs if PRIVATE_KEY and ETH_RPC are set.
 Use with care and require explicit user opt-in.
+
+Built for bursts (many deleverage txs within seconds of a market drop):
+- one long-lived Executor per process, talking JSON-RPC over the shared
+  HTTP pool (jsonrpc.py) instead of a new Web3/HTTPProvider per tx
+- NonceManager reserves nonces locally and atomically, so concurrent
+  sends never race on eth_getTransactionCount; it tracks reservations
+  that are still in flight, so a resync never hands one out twice
+- fee data and gas estimates for the whole burst come from one batched
+  JSON-RPC request (EIP-1559 fees when the chain has a base fee)
+- signed txs are submitted in concurrent batches, then receipts are
+  polled in batches until mined or EXECUTOR_RECEIPT_TIMEOUT_SECONDS
+
+Tests/dev can run against an in-process chain:
+    from web3 import EthereumTesterProvider
+    Executor(ProviderTransport(EthereumTesterProvider()), private_key=...)
 """
 
-from web3 import Web3, HTTPProvider
+import asyncio
+import heapq
+import time
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Sequence, Set
+
 from app.config import settings
-from typing import Optional
+from .http_client import http_session
+from .jsonrpc import HttpTransport, ProviderTransport, RpcError  # noqa: F401 (re-exported)
+
+if TYPE_CHECKING:  # web3 is heavy (~1s import); only load it when a tx is built
+    from web3 import Web3
 
-def get_web3() -> Optional[Web3]:
+GWEI = 10 ** 9
+
+
+def get_web3() -> Optional["Web3"]:
     if not settings.ETH_RPC:
         return None
+    from web3 import Web3, HTTPProvider
     w3 = Web3(HTTPProvider(settings.ETH_RPC))
     return w3
 
+
+def _to_int(value: Any) -> int:
+    if isinstance(value, str):
+        return int(value, 16) if value.startswith("0x") else int(value)
+    return int(value or 0)
+
+
+def _rpc_tx(tx: dict) -> dict:
+    """Tx dict in JSON-RPC form (hex quantities) for eth_estimateGas."""
+    out = {k: tx[k] for k in ("from", "to", "data") if tx.get(k) is not None}
+    out["value"] = hex(_to_int(tx.get("value", 0)))
+    return out
+
+
+def _is_nonce_error(error: BaseException) -> bool:
+    text = str(error).lower()
+    return "nonce too low" in text or "already known" in text or "replacement transaction" in text
+
+
+class NonceManager:
+    """
+    Local nonce allocator. The first reservation for an address reads the
+    pending count from the node; later ones are served from memory under a
+    per-address lock, so N concurrent txs get N distinct, gap-free nonces.
+
+    Every reserved nonce stays in flight until the caller settles it:
+    confirm() once the node accepted the tx, release() when it never
+    reached the node (the nonce is handed out again, lowest first, so a
+    hole is filled by the next reservation), or abandon() when the outcome
+    is unknown. A resync (reset(), a nonce error, an abandoned burst) only
+    re-reads the node once nothing is in flight, so it cannot reissue a
+    nonce another burst holds.
+    """
+
+    def __init__(self, fetch_pending_count: Callable[[str], Any]):
+        self._fetch = fetch_pending_count
+        self._next: Dict[str, int] = {}
+        self._free: Dict[str, List[int]] = {}  # released nonces (min-heap)
+        self._inflight: Dict[str, Set[int]] = {}
+        self._stale: Set[str] = set()
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    async def reserve(self, address: str, count: int = 1) -> List[int]:
+        lock = self._locks.setdefault(address, asyncio.Lock())
+        async with lock:
+            inflight = self._inflight.setdefault(address, set())
+            if address not in self._next or (address in self._stale and not inflight):
+                self._next[address] = await self._fetch(address)
+                self._free[address] = []
+                self._stale.discard(address)
+            free = self._free.setdefault(address, [])
+            nonces = [heapq.heappop(free) for _ in range(min(count, len(free)))]
+            start = self._next[address]
+            self._next[address] = start + count - len(nonces)
+            nonces.extend(range(start, self._next[address]))
+            inflight.update(nonces)
+            return nonces
+
+    def confirm(self, address: str, nonces: Sequence[int]) -> None:
+        """The node accepted these txs."""
+        self._inflight.get(address, set()).difference_update(nonces)
+
+    def release(self, address: str, nonces: Sequence[int]) -> None:
+        """Return nonces whose tx never reached the node."""
+        inflight = self._inflight.get(address, set())
+        free = self._free.setdefault(address, [])
+        for n in nonces:
+            if n in inflight:
+                inflight.discard(n)
+                heapq.heappush(free, n)
+        # Trailing free nonces shrink the counter instead of staying pooled
+        while free and self._next.get(address) is not None and self._next[address] - 1 in free:
+            self._next[address] -= 1
+            free.remove(self._next[address])
+            heapq.heapify(free)
+
+    def abandon(self, address: str, nonces: Sequence[int]) -> None:
+        """Unknown whether these txs reached the node: free them and resync."""
+        if self._inflight.get(address, set()).intersection(nonces):
+            self.release(address, nonces)
+            self.reset(address)
+
+    def reset(self, address: str) -> None:
+        """Re-read the node's pending count once no reservation is in flight."""
+        if address in self._next:
+            self._stale.add(address)
+
+    def in_flight(self, address: str) -> int:
+        return len(self._inflight.get(address, ()))
+
+
+class Executor:
+    def __init__(
+        self,
+        transport,
+        private_key: Optional[str] = None,
+        signer: Optional[Callable[[dict], str]] = None,
+        address: Optional[str] = None,
+        chain_id: Optional[int] = None,
+    ):
+        """
+        transport:   HttpTransport / ProviderTransport (call + batch)
+        private_key: signs locally with eth_account, or pass `signer`
+                     (tx dict -> raw signed tx hex) plus `address`
+        """
+        self.transport = transport
+        self.chain_id = chain_id
+        self._private_key = private_key
+        self._signer = signer
+        self._address = address
+        self.nonces = NonceManager(self._pending_count)
+
+    # --- account ---
+    def _load_account(self):
+        from eth_account import Account
+        acct = Account.from_key(self._private_key)
+        self._address = acct.address
+
+        def sign(tx: dict) -> str:
+            signed = acct.sign_transaction(tx)
+            raw = (getattr(signed, "raw_transaction", None) or signed.rawTransaction).hex()
+            return raw if raw.startswith("0x") else "0x" + raw
+
+        self._signer = sign
+
+    @property
+    def address(self) -> str:
+        if self._address is None:
+            if not self._private_key:
+                raise RuntimeError("PRIVATE_KEY not set — refusing to sign/send tx")
+            self._load_account()
+        return self._address
+
+    def sign(self, tx: dict) -> str:
+        if self._signer is None:
+            self._load_account()
+        return self._signer(tx)
+
+    async def _pending_count(self, address: str) -> int:
+        return _to_int(await self.transport.call("eth_getTransactionCount", [address, "pending"]))
+
+    async def _batch(self, calls: list, return_exceptions: bool = False) -> list:
+        """
+        Chunk a large batch (nodes cap batch size) and send chunks concurrently.
+        With return_exceptions, a chunk whose request failed (connection
+        error, HTTP 5xx) yields that exception for each of its calls.
+        """
+        size = max(1, settings.EXECUTOR_RPC_BATCH_SIZE)
+        chunks = [calls[i:i + size] for i in range(0, len(calls), size)]
+        results = await asyncio.gather(*(self.transport.batch(c) for c in chunks),
+                                       return_exceptions=return_exceptions)
+        out = []
+        for chunk, result in zip(chunks, results):
+            out.extend([result] * len(chunk) if isinstance(result, BaseException) else result)
+        return out
+
+    # --- fees / gas ---
+    def _fee_fields(self, block: Any, tip: Any, gas_price: Any) -> dict:
+        cap = int(settings.EXECUTOR_MAX_FEE_GWEI * GWEI)
+        base_fee = block.get("baseFeePerGas") if isinstance(block, dict) else None
+        if base_fee is not None:
+            tip = (int(settings.EXECUTOR_PRIORITY_FEE_GWEI * GWEI)
+                   if isinstance(tip, RpcError) else _to_int(tip))
+            max_fee = min(2 * _to_int(base_fee) + tip, cap)
+            return {"maxFeePerGas": max_fee, "maxPriorityFeePerGas": min(tip, max_fee), "type": 2}
+        if isinstance(gas_price, RpcError):
+            raise gas_price
+        return {"gasPrice": min(_to_int(gas_price), cap)}
+
+    async def prepare(self, txs: Sequence[dict]) -> List[Any]:
+        """
+        Fill from/nonce/gas/fees/chainId for every tx using ONE batched
+        request for fee data and gas estimates. Returns a complete tx dict
+        per input, or an exception for txs whose estimate failed (those do
+        not consume a nonce).
+        """
+        sender = self.address
+        calls = [
+            ("eth_getBlockByNumber", ["latest", False]),
+            ("eth_maxPriorityFeePerGas", []),
+            ("eth_gasPrice", []),
+        ]
+        if self.chain_id is None:
+            calls.append(("eth_chainId", []))
+        estimate_at: Dict[int, int] = {}
+        for i, tx in enumerate(txs):
+            if tx.get("gas") is None:
+                estimate_at[i] = len(calls)
+                calls.append(("eth_estimateGas", [_rpc_tx({**tx, "from": sender})]))
+
+        results = await self._batch(calls)
+        block, tip, gas_price = results[:3]
+        if isinstance(block, RpcError):
+            raise block
+        if self.chain_id is None:
+            if isinstance(results[3], RpcError):
+                raise results[3]
+            self.chain_id = _to_int(results[3])
+        fees = self._fee_fields(block, tip, gas_price)
+
+        prepared: List[Any] = []
+        for i, tx in enumerate(txs):
+            if i in estimate_at:
+                estimate = results[estimate_at[i]]
+                if isinstance(estimate, RpcError):
+                    prepared.append(estimate)
+                    continue
+                gas = int(_to_int(estimate) * settings.EXECUTOR_GAS_MULTIPLIER)
+            else:
+                gas = _to_int(tx["gas"])
+            prepared.append({
+                "from": sender,
+                "to": tx.get("to"),
+                "value": _to_int(tx.get("value", 0)),
+                "data": tx.get("data") or "0x",
+                "gas": gas,
+                "chainId": self.chain_id,
+                **fees,
+            })
+
+        ready = [t for t in prepared if isinstance(t, dict)]
+        for tx, nonce in zip(ready, await self.nonces.reserve(sender, len(ready))):
+            tx["nonce"] = nonce
+        return prepared
+
+    # --- submission ---
+    async def send_many(self, txs: Sequence[dict], wait: bool = True) -> List[dict]:
+        """
+        Prepare, sign and submit a burst of txs. Output order matches input:
+        {"nonce", "tx_hash", "status", "block_number", "gas_used", "error"}.
+        With wait=True, receipts are polled until mined or timed out
+        (status "pending").
+        """
+        prepared = await self.prepare(txs)
+        sender = self.address
+        reserved = [tx["nonce"] for tx in prepared if isinstance(tx, dict)]
+        try:
+            out = await self._submit(sender, prepared)
+        finally:
+            # Cancelled or crashed mid-burst: whatever is still in flight may or
+            # may not have reached the node, so give it back and resync
+            self.nonces.abandon(sender, reserved)
+
+        if wait:
+            hashes = [r["tx_hash"] for r in out if r["tx_hash"]]
+            receipts = await self.wait_for_receipts(hashes)
+            for r in out:
+                receipt = receipts.get(r["tx_hash"]) if r["tx_hash"] else None
+                if receipt is not None:
+                    r["status"] = "success" if _to_int(receipt.get("status", 1)) == 1 else "reverted"
+                    r["block_number"] = _to_int(receipt.get("blockNumber"))
+                    r["gas_used"] = _to_int(receipt.get("gasUsed"))
+                elif r["tx_hash"]:
+                    r["status"] = "pending"
+        return out
+
+    async def _submit(self, sender: str, prepared: List[Any]) -> List[dict]:
+        """Sign and send prepared txs, settling every reserved nonce."""
+        out: List[dict] = []
+        to_send: List[int] = []
+        raws: List[str] = []
+        for i, tx in enumerate(prepared):
+            if isinstance(tx, BaseException):
+                out.append({"nonce": None, "tx_hash": None, "status": "failed", "error": str(tx)})
+                continue
+            out.append({"nonce": tx["nonce"], "tx_hash": None, "status": "submitted", "error": None})
+            try:
+                raws.append(self.sign(tx))
+                to_send.append(i)
+            except Exception as e:
+                out[i].update(status="failed", error=f"signing failed: {e}")
+                self.nonces.release(sender, [tx["nonce"]])
+
+        sent = await self._batch([("eth_sendRawTransaction", [raw]) for raw in raws],
+                                 return_exceptions=True)
+        accepted: List[int] = []
+        rejected: List[int] = []
+        unknown: List[int] = []
+        for i, res in zip(to_send, sent):
+            nonce = out[i]["nonce"]
+            if isinstance(res, RpcError):
+                # The node answered and refused the tx: the nonce was not used
+                out[i].update(status="failed", error=str(res))
+                rejected.append(nonce)
+                if _is_nonce_error(res):
+                    self.nonces.reset(sender)
+            elif isinstance(res, BaseException):
+                # Transport failure: the tx may or may not have reached the node
+                out[i].update(status="failed", error=f"submission failed: {res}")
+                unknown.append(nonce)
+            else:
+                out[i]["tx_hash"] = res
+                accepted.append(nonce)
+        self.nonces.confirm(sender, accepted)
+        self.nonces.release(sender, rejected)
+        self.nonces.abandon(sender, unknown)
+        return out
+
+    async def send(self, tx: dict, wait: bool = False) -> dict:
+        return (await self.send_many([tx], wait=wait))[0]
+
+    async def wait_for_receipts(
+        self,
+        hashes: Sequence[str],
+        timeout: Optional[float] = None,
+        poll: Optional[float] = None,
+    ) -> Dict[str, Optional[dict]]:
+        """Poll eth_getTransactionReceipt for all still-pending hashes in one batch per round."""
+        timeout = settings.EXECUTOR_RECEIPT_TIMEOUT_SECONDS if timeout is None else timeout
+        poll = settings.EXECUTOR_RECEIPT_POLL_SECONDS if poll is None else poll
+        receipts: Dict[str, Optional[dict]] = {h: None for h in hashes}
+        deadline = time.monotonic() + timeout
+        pending = list(hashes)
+        while pending:
+            results = await self._batch([("eth_getTransactionReceipt", [h]) for h in pending])
+            for h, r in zip(pending, results):
+                if isinstance(r, dict):
+                    receipts[h] = r
+            pending = [h for h in pending if receipts[h] is None]
+            if not pending or time.monotonic() + poll > deadline:
+                break
+            await asyncio.sleep(poll)
+        return receipts
+
+
+_executor: Optional[Executor] = None
+
+
+def get_executor() -> Executor:
+    """Process-wide executor on ETH_RPC / PRIVATE_KEY (created on first use)."""
+    global _executor
+    if _executor is None:
+        if not settings.ETH_RPC:
+            raise RuntimeError("ETH_RPC not configured — cannot send tx")
+        if not settings.PRIVATE_KEY:
+            raise RuntimeError("PRIVATE_KEY not set — refusing to sign/send tx")
+        _executor = Executor(HttpTransport(settings.ETH_RPC), private_key=settings.PRIVATE_KEY)
+    return _executor
+
+
 def build_reduce_leverage_tx(user_addr: str, position_id: str, reduce_to: float) -> dict:
     """
     Pseudocode tx builder. In production, you'd call a protocol-specific helper contract.
@@ -30,25 +397,22 @@ def build_reduce_leverage_tx(user_addr: str, position_id: str, reduce_to: float)
     }
     return tx
 
+
+async def send_signed_txs(txs: Sequence[dict], wait: bool = True) -> List[dict]:
+    """Burst entry point: submit many deleverage txs concurrently."""
+    return await get_executor().send_many(txs, wait=wait)
+
+
 def send_signed_tx(tx: dict) -> str:
-    w3 = get_web3()
-    if w3 is None:
-        raise RuntimeError("ETH_RPC not configured — cannot send tx")
-
-    if not settings.PRIVATE_KEY:
-        raise RuntimeError("PRIVATE_KEY not set — refusing to sign/send tx")
-
-    acct = w3.eth.account.from_key(settings.PRIVATE_KEY)
-    # Build base tx with gas, nonce etc - you may want to estimate gas in production
-    base_tx = {
-        "from": acct.address,
-        "to": tx.get("to"),
-        "value": tx.get("value", 0),
-        "data": tx.get("data", b""),
-        "gas": tx.get("gas", 300000),
-        "gasPrice": w3.to_wei("30", "gwei"),
-        "nonce": w3.eth.get_transaction_count(acct.address)
-    }
-    signed = acct.sign_transaction(base_tx)
-    tx_hash = w3.eth.send_raw_transaction(signed.rawTransaction)
-    return tx_hash.hex()
+    """
+    Synchronous single-tx helper for scripts (not callable from a running
+    event loop — use `await get_executor().send(tx)` there).
+    """
+    async def run():
+        async with http_session():
+            return await get_executor().send(tx)
+
+    result = asyncio.run(run())
+    if result["error"]:
+        raise RuntimeError(result["error"])
+    return result["tx_hash"]
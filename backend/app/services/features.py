@@ -0,0 +1,120 @@
+"""
+features.py
+
+Compact feature records for the internal scoring paths (scheduler, batch
+predict, stress test). Pydantic models stay at the HTTP edge only.
+
+- FeatureVector: one position as a __slots__ object (no per-instance
+  dict). It has the read side of a mapping (get / setdefault / as_dict),
+  so enrich_features, the prediction cache key, build_asi_payload and the
+  local scorers take it as-is instead of copying it into new dicts.
+  Missing values are None.
+- FEATURE_DTYPE batches: a NumPy structured array with one float64 field
+  per model feature, 40 bytes per position, NaN for missing.
+  feature_matrix() views it as the (n, 5) matrix the scorers use, without
+  copying.
+"""
+
+from typing import Any, Dict, Iterable, Mapping, Optional, Sequence, Union
+
+import numpy as np
+
+FEATURES = ("volatility", "collateral_ratio", "leverage", "asset_price", "market_trend")
+CONTEXT = ("protocol", "user_wallet", "asset_symbol", "collateral_usd", "debt_usd")
+
+FEATURE_DTYPE = np.dtype([(name, np.float64) for name in FEATURES])
+
+
+class FeatureVector:
+    __slots__ = FEATURES + CONTEXT
+
+    def __init__(self, volatility: Optional[float] = None, collateral_ratio: Optional[float] = None,
+                 leverage: Optional[float] = None, asset_price: Optional[float] = None,
+                 market_trend: Optional[float] = None, protocol: Optional[str] = None,
+                 user_wallet: Optional[str] = None, asset_symbol: Optional[str] = None,
+                 collateral_usd: Optional[float] = None, debt_usd: Optional[float] = None):
+        self.volatility = volatility
+        self.collateral_ratio = collateral_ratio
+        self.leverage = leverage
+        self.asset_price = asset_price
+        self.market_trend = market_trend
+        self.protocol = protocol
+        self.user_wallet = user_wallet
+        self.asset_symbol = asset_symbol
+        self.collateral_usd = collateral_usd
+        self.debt_usd = debt_usd
+
+    @classmethod
+    def from_mapping(cls, data: Mapping[str, Any]) -> "FeatureVector":
+        return cls(**{name: data.get(name) for name in cls.__slots__})
+
+    @classmethod
+    def from_model(cls, model: Any) -> "FeatureVector":
+        """From a validated pydantic model (attribute reads, no .dict() copy)."""
+        return cls(**{name: getattr(model, name, None) for name in cls.__slots__})
+
+    # --- mapping-style reads (what the scoring helpers use) ---
+    def get(self, name: str, default: Any = None) -> Any:
+        value = getattr(self, name, None)
+        return default if value is None else value
+
+    def __contains__(self, name: str) -> bool:
+        return getattr(self, name, None) is not None
+
+    def setdefault(self, name: str, value: Any) -> Any:
+        """Fill `name` when it is missing; returns the stored value."""
+        current = getattr(self, name)
+        if current is None:
+            setattr(self, name, value)
+            return value
+        return current
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Present fields only (for persistence / JSON)."""
+        out = {}
+        for name in self.__slots__:
+            value = getattr(self, name)
+            if value is not None:
+                out[name] = value
+        return out
+
+    def __repr__(self) -> str:
+        return f"FeatureVector({self.as_dict()})"
+
+
+# What the scoring helpers accept per item: a plain dict or a FeatureVector
+FeatureLike = Union[Mapping[str, Any], FeatureVector]
+
+
+def to_array(records: Sequence[Any]) -> np.ndarray:
+    """Structured FEATURE_DTYPE batch from FeatureVectors or dicts (NaN for missing)."""
+    batch = np.empty(len(records), dtype=FEATURE_DTYPE)
+    flat = batch.view(np.float64).reshape(len(records), len(FEATURES))
+    for i, r in enumerate(records):
+        for j, name in enumerate(FEATURES):
+            v = r.get(name)
+            flat[i, j] = np.nan if v is None else v
+    return batch
+
+
+def from_array(batch: np.ndarray, context: Optional[Iterable[Dict[str, Any]]] = None) -> list:
+    """FeatureVectors for a structured batch (context: optional per-row extra fields)."""
+    rows = feature_matrix(batch).tolist()
+    context = list(context) if context is not None else [{}] * len(rows)
+    out = []
+    for row, ctx in zip(rows, context):
+        values = {name: (None if v != v else v) for name, v in zip(FEATURES, row)}
+        out.append(FeatureVector(**values, **ctx))
+    return out
+
+
+def feature_matrix(batch: np.ndarray) -> np.ndarray:
+    """(n, 5) float64 view of a FEATURE_DTYPE batch (shares memory)."""
+    return batch.view(np.float64).reshape(len(batch), len(FEATURES))
+
+
+def fill_missing(batch: np.ndarray, defaults: Mapping[str, float]) -> np.ndarray:
+    """(n, 5) matrix with NaN replaced by `defaults` (a copy; `batch` is untouched)."""
+    X = feature_matrix(batch)
+    fill = np.array([defaults[name] for name in FEATURES], dtype=np.float64)
+    return np.where(np.isnan(X), fill, X)
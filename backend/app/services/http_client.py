@@ -0,0 +1,93 @@
+"""
+http_client.py
+
+Shared, app-lifetime aiohttp session for upstream calls (ASI, market data).
+Opening a new ClientSession per request costs a fresh connector and a new
+TCP/TLS handshake every time; this module keeps one pooled session with
+keep-alive, per-host limits and DNS caching instead.
+
+Lifecycle:
+- FastAPI: opened/closed from the lifespan in app/main.py
+- Scheduler / scripts: wrap the work in `async with http_session():`
+- Anything else: get_session() lazily opens the pool on first use
+
+warm_up() opens keep-alive connections to the upstream hosts at startup so
+the first request does not pay for DNS + TCP/TLS setup.
+"""
+
+import aiohttp
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Iterable, Optional
+from ..config import settings
+
+_session: Optional[aiohttp.ClientSession] = None
+
+
+def _build_connector() -> aiohttp.TCPConnector:
+    # NOTE: aiohttp speaks HTTP/1.1 only; keep-alive reuse gives us most of
+    # what HTTP/2 multiplexing would for a handful of upstream hosts.
+    return aiohttp.TCPConnector(
+        limit=settings.HTTP_POOL_LIMIT,
+        limit_per_host=settings.HTTP_POOL_LIMIT_PER_HOST,
+        ttl_dns_cache=settings.HTTP_DNS_TTL_SECONDS,
+        keepalive_timeout=settings.HTTP_KEEPALIVE_SECONDS,
+        enable_cleanup_closed=True,
+    )
+
+
+async def open_session() -> aiohttp.ClientSession:
+    """Create the shared session if it is not already open."""
+    global _session
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession(
+            connector=_build_connector(),
+            timeout=aiohttp.ClientTimeout(total=settings.HTTP_DEFAULT_TIMEOUT_SECONDS),
+            headers={"Accept": "application/json"},
+        )
+    return _session
+
+
+async def close_session() -> None:
+    """Close the shared session and release pooled connections."""
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
+
+async def get_session() -> aiohttp.ClientSession:
+    """Return the shared session, opening it on first use."""
+    if _session is None or _session.closed:
+        return await open_session()
+    return _session
+
+
+async def warm_up(urls: Iterable[str], timeout: float) -> int:
+    """
+    GET each URL once (concurrently, errors ignored) so the pool holds a live
+    connection per upstream host. Returns how many hosts answered.
+    """
+    session = await get_session()
+    client_timeout = aiohttp.ClientTimeout(total=timeout)
+
+    async def touch(url: str) -> bool:
+        try:
+            async with session.get(url, timeout=client_timeout) as resp:
+                await resp.read()
+            return True
+        except Exception:
+            return False
+
+    results = await asyncio.gather(*(touch(u) for u in dict.fromkeys(urls)))
+    return sum(results)
+
+
+@asynccontextmanager
+async def http_session():
+    """Context manager for non-FastAPI entry points (scheduler, benchmarks)."""
+    session = await open_session()
+    try:
+        yield session
+    finally:
+        await close_session()
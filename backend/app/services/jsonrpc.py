@@ -0,0 +1,90 @@
+"""
+jsonrpc.py
+
+Minimal Ethereum JSON-RPC transports used by the executor.
+
+- HttpTransport:     posts to ETH_RPC over the shared aiohttp session;
+                     batch() sends every call in ONE HTTP request
+                     (JSON-RPC 2.0 batch array) instead of N round trips.
+- ProviderTransport: wraps any web3 provider exposing make_request()
+                     (e.g. EthereumTesterProvider) so the executor can
+                     run against an in-process eth-tester chain.
+
+batch() returns results in request order; a failed call is returned as
+an RpcError instance instead of failing the whole batch.
+"""
+
+import asyncio
+import itertools
+from typing import Any, List, Sequence, Tuple, Union
+
+from .http_client import get_session
+from .metrics import upstream_call
+
+Call = Tuple[str, Sequence[Any]]
+
+
+class RpcError(Exception):
+    """JSON-RPC error object returned by the node."""
+
+    def __init__(self, method: str, error: Any):
+        self.method = method
+        self.error = error
+        message = error.get("message") if isinstance(error, dict) else error
+        super().__init__(f"{method}: {message}")
+
+
+def _unwrap(method: str, response: dict) -> Any:
+    if response.get("error") is not None:
+        return RpcError(method, response["error"])
+    return response.get("result")
+
+
+class HttpTransport:
+    def __init__(self, url: str):
+        self.url = url
+        self._ids = itertools.count(1)
+
+    async def call(self, method: str, params: Sequence[Any] = ()) -> Any:
+        result = (await self.batch([(method, params)]))[0]
+        if isinstance(result, RpcError):
+            raise result
+        return result
+
+    async def batch(self, calls: Sequence[Call]) -> List[Union[Any, RpcError]]:
+        if not calls:
+            return []
+        ids = [next(self._ids) for _ in calls]
+        body = [{"jsonrpc": "2.0", "id": i, "method": m, "params": list(p)}
+                for i, (m, p) in zip(ids, calls)]
+        session = await get_session()
+        with upstream_call("eth_rpc"):
+            async with session.post(self.url, json=body) as resp:
+                resp.raise_for_status()
+                payload = await resp.json(content_type=None)
+        # Nodes may answer a batch out of order; a non-list means the whole batch failed
+        if isinstance(payload, dict):
+            return [RpcError(m, payload.get("error", payload)) for m, _ in calls]
+        by_id = {r.get("id"): r for r in payload}
+        return [
+            _unwrap(m, by_id[i]) if i in by_id else RpcError(m, "missing response")
+            for i, (m, _) in zip(ids, calls)
+        ]
+
+
+class ProviderTransport:
+    """Adapter for synchronous web3 providers (eth-tester in tests/dev)."""
+
+    def __init__(self, provider):
+        self.provider = provider
+
+    async def call(self, method: str, params: Sequence[Any] = ()) -> Any:
+        result = (await self.batch([(method, params)]))[0]
+        if isinstance(result, RpcError):
+            raise result
+        return result
+
+    async def batch(self, calls: Sequence[Call]) -> List[Union[Any, RpcError]]:
+        def run():
+            return [_unwrap(m, self.provider.make_request(m, list(p))) for m, p in calls]
+        return await asyncio.to_thread(run)
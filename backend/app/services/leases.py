@@ -0,0 +1,133 @@
+"""
+leases.py
+
+Database-backed worker membership and wallet ownership leases for the
+sharded monitor (tasks/sharding.py).
+
+- monitor_workers: one row per live worker, kept alive by heartbeat();
+  a worker whose row expired is considered dead.
+- wallet_leases:   one row per watched wallet with its current owner and
+  lease expiry. acquire() only takes a row that is free, already ours,
+  or expired, in a single conditional UPDATE, so two workers can never
+  both hold a live lease on the same wallet.
+
+Only portable SQL is used (conditional UPDATE, plain INSERT), so the same
+code runs on SQLite locally and Postgres in prod. Methods are blocking;
+callers run them in a worker thread.
+"""
+
+import time
+from typing import Iterable, List, Optional, Sequence, Set
+
+from sqlalchemy import delete, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+
+from ..db import MonitorWorker, WalletLease, engine as default_engine
+
+CHUNK = 500  # keeps IN (...) lists under SQLite's bound-parameter limit
+
+
+def _chunks(items: Sequence[str]) -> Iterable[List[str]]:
+    items = list(items)
+    for i in range(0, len(items), CHUNK):
+        yield items[i:i + CHUNK]
+
+
+class LeaseStore:
+    def __init__(self, worker_id: str, ttl: float, engine=default_engine):
+        self.worker_id = worker_id
+        self.ttl = ttl
+        self.engine = engine
+
+    # --- membership ---
+    def heartbeat(self, now: Optional[float] = None) -> None:
+        now = time.time() if now is None else now
+        with self.engine.begin() as conn:
+            res = conn.execute(
+                update(MonitorWorker)
+                .where(MonitorWorker.worker_id == self.worker_id)
+                .values(expires_at=now + self.ttl)
+            )
+            if res.rowcount == 0:
+                conn.execute(insert(MonitorWorker).values(
+                    worker_id=self.worker_id, started_at=now, expires_at=now + self.ttl))
+
+    def live_workers(self, now: Optional[float] = None) -> List[str]:
+        now = time.time() if now is None else now
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                select(MonitorWorker.worker_id).where(MonitorWorker.expires_at >= now)
+            ).all()
+        return sorted(r[0] for r in rows)
+
+    def leave(self) -> None:
+        """Graceful shutdown: drop our membership row and free every lease we hold."""
+        with self.engine.begin() as conn:
+            conn.execute(delete(MonitorWorker).where(MonitorWorker.worker_id == self.worker_id))
+            conn.execute(
+                update(WalletLease)
+                .where(WalletLease.owner == self.worker_id)
+                .values(owner=None, expires_at=0.0)
+            )
+
+    # --- wallet leases ---
+    def register(self, wallets: Iterable[str]) -> int:
+        """Create lease rows for wallets that have none yet. Returns how many were added."""
+        added = 0
+        for chunk in _chunks(sorted(set(wallets))):
+            while True:
+                try:
+                    with self.engine.begin() as conn:
+                        existing = {r[0] for r in conn.execute(
+                            select(WalletLease.wallet).where(WalletLease.wallet.in_(chunk)))}
+                        missing = [w for w in chunk if w not in existing]
+                        if missing:
+                            conn.execute(insert(WalletLease),
+                                         [{"wallet": w, "owner": None, "expires_at": 0.0} for w in missing])
+                    added += len(missing)
+                    break
+                except IntegrityError:
+                    continue  # another worker registered some of them meanwhile; re-read
+        return added
+
+    def acquire(self, wallets: Iterable[str], now: Optional[float] = None) -> None:
+        """Take (or extend) the lease on each wallet that is free, ours, or expired."""
+        now = time.time() if now is None else now
+        with self.engine.begin() as conn:
+            for chunk in _chunks(list(wallets)):
+                conn.execute(
+                    update(WalletLease)
+                    .where(WalletLease.wallet.in_(chunk))
+                    .where(or_(WalletLease.owner.is_(None),
+                               WalletLease.owner == self.worker_id,
+                               WalletLease.expires_at < now))
+                    .values(owner=self.worker_id, expires_at=now + self.ttl)
+                )
+
+    def renew(self, now: Optional[float] = None) -> None:
+        """Extend every lease we still hold (one statement, whatever the shard size)."""
+        now = time.time() if now is None else now
+        with self.engine.begin() as conn:
+            conn.execute(
+                update(WalletLease)
+                .where(WalletLease.owner == self.worker_id, WalletLease.expires_at >= now)
+                .values(expires_at=now + self.ttl)
+            )
+
+    def release(self, wallets: Iterable[str]) -> None:
+        with self.engine.begin() as conn:
+            for chunk in _chunks(list(wallets)):
+                conn.execute(
+                    update(WalletLease)
+                    .where(WalletLease.wallet.in_(chunk), WalletLease.owner == self.worker_id)
+                    .values(owner=None, expires_at=0.0)
+                )
+
+    def owned(self, now: Optional[float] = None) -> Set[str]:
+        now = time.time() if now is None else now
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                select(WalletLease.wallet)
+                .where(WalletLease.owner == self.worker_id, WalletLease.expires_at >= now)
+            ).all()
+        return {r[0] for r in rows}
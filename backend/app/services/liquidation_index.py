@@ -0,0 +1,177 @@
+"""
+liquidation_index.py
+
+Price-band index of monitored positions, so a price tick only re-scores
+the wallets it actually moves across a risk band.
+
+Each indexed position has a price driver: the asset whose moves shift
+its collateral ratio most (see CovarianceSnapshot.position). With that
+asset's collateral c and debt d, and the rest of the book C - c / D - d
+held fixed, the collateral ratio at price P0 * x is
+
+    CR(x) = ((C - c) + c * x) / ((D - d) + d * x)
+
+so each band b in LIQ_INDEX_CR_BANDS is crossed at one price:
+
+    x = (b * (D - d) - (C - c)) / (c - b * d)
+
+(leverage = 1 + 1 / CR, so the same prices are its band boundaries).
+Boundaries are kept per asset in a blocked sorted list of (price, wallet)
+(sorted blocks of ~BLOCK_SIZE entries, as in sortedcontainers), so
+re-indexing a wallet is O(log n + BLOCK_SIZE) and a tick from p_old to
+p_new is a bisect plus the matches: O(log n + affected), independent of
+how many wallets are watched.
+"""
+
+import bisect
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+BLOCK_SIZE = 512
+
+Entry = Tuple[float, str]
+
+
+def parse_bands(spec: str) -> List[float]:
+    return sorted({float(b) for b in spec.split(",") if b.strip()})
+
+
+def boundary_prices(position: dict, bands: Sequence[float]) -> List[float]:
+    """Driver-asset prices at which the position's collateral_ratio crosses each band."""
+    driver = position.get("price_driver")
+    if not driver or not driver.get("price"):
+        return []
+    c, d = float(driver["collateral_usd"]), float(driver["debt_usd"])
+    c_rest = float(position.get("collateral_usd") or 0.0) - c
+    d_rest = float(position.get("debt_usd") or 0.0) - d
+    prices = []
+    for b in bands:
+        denom = c - b * d
+        if denom == 0:
+            continue
+        x = (b * d_rest - c_rest) / denom
+        if x > 0:
+            prices.append(driver["price"] * x)
+    return prices
+
+
+class _SortedBook:
+    """Sorted (price, wallet) entries stored as a list of sorted blocks."""
+
+    def __init__(self):
+        self._blocks: List[List[Entry]] = []
+        self._maxes: List[Entry] = []
+        self._len = 0
+
+    def __len__(self) -> int:
+        return self._len
+
+    def add(self, entry: Entry) -> None:
+        if not self._blocks:
+            self._blocks.append([entry])
+            self._maxes.append(entry)
+            self._len = 1
+            return
+        i = min(bisect.bisect_left(self._maxes, entry), len(self._blocks) - 1)
+        block = self._blocks[i]
+        bisect.insort(block, entry)
+        self._maxes[i] = block[-1]
+        self._len += 1
+        if len(block) > 2 * BLOCK_SIZE:
+            self._blocks[i:i + 1] = [block[:BLOCK_SIZE], block[BLOCK_SIZE:]]
+            self._maxes[i:i + 1] = [block[BLOCK_SIZE - 1], block[-1]]
+
+    def discard(self, entry: Entry) -> None:
+        i = bisect.bisect_left(self._maxes, entry)
+        if i == len(self._blocks):
+            return
+        block = self._blocks[i]
+        j = bisect.bisect_left(block, entry)
+        if j == len(block) or block[j] != entry:
+            return
+        del block[j]
+        self._len -= 1
+        if block:
+            self._maxes[i] = block[-1]
+        else:
+            del self._blocks[i]
+            del self._maxes[i]
+
+    def irange(self, lo: float, hi: float) -> Iterator[Entry]:
+        """Entries with lo <= price <= hi, in order."""
+        start, stop = (lo, ""), (hi, "\U0010ffff")
+        for i in range(bisect.bisect_left(self._maxes, start), len(self._blocks)):
+            block = self._blocks[i]
+            j = bisect.bisect_left(block, start) if block[0] < start else 0
+            for entry in block[j:]:
+                if entry > stop:
+                    return
+                yield entry
+
+
+class LiquidationIndex:
+    def __init__(self, bands: Sequence[float]):
+        self.bands = sorted(bands)
+        self._books: Dict[str, _SortedBook] = {}
+        self._entries: Dict[str, Tuple[str, List[float]]] = {}
+        self._last_price: Dict[str, float] = {}
+        self.stats = {"updates": 0, "ticks": 0, "triggered": 0}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, wallet: str) -> bool:
+        return wallet in self._entries
+
+    @property
+    def assets(self) -> List[str]:
+        return [a for a, book in self._books.items() if book]
+
+    def update(self, wallet: str, position: dict) -> bool:
+        """(Re)index `wallet` from a freshly fetched position. Returns whether it is indexed."""
+        self.remove(wallet)
+        prices = boundary_prices(position, self.bands)
+        if not prices:
+            return False
+        driver = position["price_driver"]
+        asset = driver["asset"]
+        book = self._books.setdefault(asset, _SortedBook())
+        for p in prices:
+            book.add((p, wallet))
+        self._entries[wallet] = (asset, prices)
+        self._last_price.setdefault(asset, float(driver["price"]))
+        self.stats["updates"] += 1
+        return True
+
+    def remove(self, wallet: str) -> None:
+        entry = self._entries.pop(wallet, None)
+        if entry is None:
+            return
+        asset, prices = entry
+        book = self._books[asset]
+        for p in prices:
+            book.discard((p, wallet))
+
+    def crossed(self, asset: str, old: float, new: float) -> Set[str]:
+        """Wallets with a band boundary between `old` and `new` (either direction)."""
+        book = self._books.get(asset)
+        if not book or old == new:
+            return set()
+        return {wallet for _, wallet in book.irange(min(old, new), max(old, new))}
+
+    def on_price(self, asset: str, price: float) -> Set[str]:
+        """Record a price tick; returns the wallets it moved across a band."""
+        old: Optional[float] = self._last_price.get(asset)
+        self._last_price[asset] = price
+        self.stats["ticks"] += 1
+        if old is None:
+            return set()
+        affected = self.crossed(asset, old, price)
+        self.stats["triggered"] += len(affected)
+        return affected
+
+    def snapshot(self) -> Dict[str, float]:
+        return {
+            **self.stats,
+            "wallets": len(self._entries),
+            "boundaries": sum(len(b) for b in self._books.values()),
+        }
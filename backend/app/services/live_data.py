@@ -1,63 +1,75 @@
-import requests
+import logging
 
-def fetch_live_wallet_metrics(wallet: str):
+from ..config import settings
+from .market_cache import get_price
+from .metrics import LIVE_WALLET_SOURCE
+from .subgraph_loader import load_aave_user
+from .upstream import Source, fan_out
+
+logger = logging.getLogger(__name__)
+
+FALLBACK_ETH_PRICE = 2000
+
+
+async def fetch_live_wallet_metrics(wallet: str):
     """
     Fetch live DeFi wallet metrics from Aave and CoinGecko.
     Falls back to mock data if wallet not found or API fails.
+    Both upstreams run concurrently under their own deadlines.
     """
-    try:
-        # ✅ 1. Get ETH price
-        cg = requests.get(
-            "https://api.coingecko.com/api/v3/simple/price?ids=ethereum&vs_currencies=usd"
-        ).json()
-        eth_price = cg["ethereum"]["usd"]
-
-        # ✅ 2. Query Aave subgraph
-        query = f"""
-        {{
-          users(where: {{id: "{wallet.lower()}"}}) {{
-            totalCollateralETH
-            totalBorrowsETH
-          }}
-        }}
-        """
-
-        resp = requests.post(
-            "https://api.thegraph.com/subgraphs/name/aave/protocol-v2",
-            json={"query": query},
-        ).json()
-
-        users = resp.get("data", {}).get("users", [])
-        if not users:
-            return {
-                "volatility": 0.5,
-                "collateral_ratio": 1.0,
-                "leverage": 1.5,
-                "eth_price": eth_price,
-                "source": "mock",
-            }
-
-        user = users[0]
-        collateral = float(user["totalCollateralETH"])
-        borrows = float(user["totalBorrowsETH"])
-
-        collateral_ratio = collateral / max(borrows, 0.0001)
-        leverage = 1 + (borrows / max(collateral, 0.0001))
+    values, sources = await fan_out({
+        # ✅ 1. ETH price (shared TTL cache)
+        "price": Source(lambda: get_price("eth", strict=True),
+                        settings.UPSTREAM_PRICE_DEADLINE_SECONDS, FALLBACK_ETH_PRICE),
+        # ✅ 2. Aave subgraph (batched with concurrent lookups)
+        "aave": Source(lambda: load_aave_user(wallet),
+                       settings.UPSTREAM_SUBGRAPH_DEADLINE_SECONDS, None,
+                       settings.UPSTREAM_HEDGE_AFTER_SECONDS),
+    })
+    eth_price = values["price"]
+    users = values["aave"]
+    provenance = {
+        "eth_price": sources["price"],
+        "collateral_ratio": sources["aave"],
+        "leverage": sources["aave"],
+    }
 
-        return {
-            "volatility": 0.4,
-            "collateral_ratio": round(collateral_ratio, 2),
-            "leverage": round(leverage, 2),
-            "eth_price": eth_price,
-            "source": "live",
-        }
-
-    except Exception as e:
-        print("❌ Error fetching live DeFi data:", e)
+    if users is None:
+        logger.warning("❌ Error fetching live DeFi data: %s", sources["aave"].get("reason"))
+        LIVE_WALLET_SOURCE.inc(source="fallback")
         return {
             "volatility": 0.6,
             "collateral_ratio": 1.1,
             "leverage": 2.0,
-            "eth_price": 2000,
+            "eth_price": eth_price,
             "source": "fallback",
-        } 
\ No newline at end of file
+            "provenance": provenance,
+        }
+
+    if not users:
+        LIVE_WALLET_SOURCE.inc(source="mock")
+        return {
+            "volatility": 0.5,
+            "collateral_ratio": 1.0,
+            "leverage": 1.5,
+            "eth_price": eth_price,
+            "source": "mock",
+            "provenance": provenance,
+        }
+
+    LIVE_WALLET_SOURCE.inc(source="live")
+    user = users[0]
+    collateral = float(user["totalCollateralETH"])
+    borrows = float(user["totalBorrowsETH"])
+
+    collateral_ratio = collateral / max(borrows, 0.0001)
+    leverage = 1 + (borrows / max(collateral, 0.0001))
+
+    return {
+        "volatility": 0.4,
+        "collateral_ratio": round(collateral_ratio, 2),
+        "leverage": round(leverage, 2),
+        "eth_price": eth_price,
+        "source": "live",
+        "provenance": provenance,
+    }
@@ -0,0 +1,205 @@
+"""
+local_model.py
+
+Distilled local risk model: a CPU-only logistic regression (NumPy, no ML
+runtime) trained offline on the input/output history in the `predictions`
+table, so it mimics what ASI answered for similar inputs.
+
+It is loaded once (FastAPI lifespan, or lazily on first use) and scored
+vectorized in-process. Depending on LOCAL_MODEL_MODE it is used as:
+- "fallback": replaces the random score when every ASI endpoint fails
+- "primary":  scores first; ASI is only consulted for borderline scores
+              (within LOCAL_MODEL_BORDERLINE_BAND of a risk-class boundary)
+- "off":      never used
+
+Train / evaluate with: python -m app.tasks.train_local_model --help
+"""
+
+import json
+import logging
+import math
+import os
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from ..config import settings
+from .features import FEATURES, fill_missing
+
+logger = logging.getLogger(__name__)
+
+# Same defaults the local fallback formula uses for missing inputs
+DEFAULTS = {"volatility": 0.5, "collateral_ratio": 1.2, "leverage": 2.0,
+            "asset_price": 2000.0, "market_trend": 0.1}
+# Risk-class boundaries used by risk_model.finalize_result
+CLASS_BOUNDARIES = (40.0, 70.0)
+# Rows whose output did not come from ASI are not used as labels
+NON_ASI_SOURCES = ("fallback", "distilled_local", "mock")
+
+
+def feature_matrix(payloads: Union[Sequence[Dict[str, Any]], np.ndarray]) -> np.ndarray:
+    """
+    Raw (n, 5) float matrix in FEATURES order, defaults for missing.
+    `payloads` is a sequence of dicts / FeatureVectors or a FEATURE_DTYPE batch.
+    """
+    if isinstance(payloads, np.ndarray):
+        return fill_missing(payloads, DEFAULTS)
+    X = np.empty((len(payloads), len(FEATURES)), dtype=np.float64)
+    for i, p in enumerate(payloads):
+        for j, name in enumerate(FEATURES):
+            v = p.get(name)
+            X[i, j] = DEFAULTS[name] if v is None else float(v)
+    return X
+
+
+def _design(X: np.ndarray) -> np.ndarray:
+    # v, c, l, t, |t|, log(price)
+    return np.column_stack([
+        X[:, 0], X[:, 1], X[:, 2], X[:, 4], np.abs(X[:, 4]),
+        np.log1p(np.maximum(X[:, 3], 0.0)),
+    ])
+
+
+def _sigmoid(z: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-np.clip(z, -35, 35)))
+
+
+class DistilledRiskModel:
+    def __init__(self, mean: np.ndarray, scale: np.ndarray, weights: np.ndarray,
+                 bias: float, meta: Optional[Dict[str, Any]] = None):
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self.weights = np.asarray(weights, dtype=np.float64)
+        self.bias = float(bias)
+        self.meta = meta or {}
+
+    # --- scoring ---
+    def predict_matrix(self, X: np.ndarray) -> np.ndarray:
+        """Risk probability (0-100) for a raw (n, 5) feature matrix."""
+        Z = (_design(X) - self.mean) / self.scale
+        return np.round(100.0 * _sigmoid(Z @ self.weights + self.bias), 2)
+
+    def predict_many(self, payloads: Sequence[Dict[str, Any]]) -> np.ndarray:
+        return self.predict_matrix(feature_matrix(payloads))
+
+    def predict_one(self, payload: Dict[str, Any]) -> float:
+        return float(self.predict_many([payload])[0])
+
+    # --- persistence ---
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "features": list(FEATURES),
+            "mean": self.mean.tolist(),
+            "scale": self.scale.tolist(),
+            "weights": self.weights.tolist(),
+            "bias": self.bias,
+            "meta": self.meta,
+        }
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as fh:
+            json.dump(self.to_dict(), fh, indent=2)
+
+    @classmethod
+    def load(cls, path: str) -> "DistilledRiskModel":
+        with open(path) as fh:
+            d = json.load(fh)
+        if tuple(d.get("features", ())) != FEATURES:
+            raise ValueError(f"model at {path} was trained on different features")
+        return cls(d["mean"], d["scale"], d["weights"], d["bias"], d.get("meta"))
+
+
+def train(X: np.ndarray, y: np.ndarray, l2: float = 1e-3, iterations: int = 50) -> DistilledRiskModel:
+    """
+    Fit logistic regression on soft targets y/100 with Newton (IRLS) steps.
+    X is the raw (n, 5) matrix, y the ASI risk_probability (0-100).
+    """
+    if len(X) < 10:
+        raise ValueError(f"need at least 10 labelled rows to train, got {len(X)}")
+    D = _design(X)
+    mean = D.mean(axis=0)
+    scale = D.std(axis=0)
+    scale[scale < 1e-9] = 1.0
+    Z = np.column_stack([(D - mean) / scale, np.ones(len(D))])
+    target = np.clip(np.asarray(y, dtype=np.float64) / 100.0, 0.0, 1.0)
+
+    w = np.zeros(Z.shape[1])
+    reg = np.full(Z.shape[1], l2)
+    reg[-1] = 0.0  # do not penalise the bias
+    n = len(Z)
+    for _ in range(iterations):
+        p = _sigmoid(Z @ w)
+        grad = Z.T @ (p - target) / n + reg * w
+        H = (Z * (p * (1 - p))[:, None]).T @ Z / n + np.diag(reg) + 1e-9 * np.eye(len(w))
+        step = np.linalg.solve(H, grad)
+        w -= step
+        if np.max(np.abs(step)) < 1e-8:
+            break
+
+    return DistilledRiskModel(mean, scale, w[:-1], w[-1], {"rows": int(n), "l2": l2})
+
+
+def is_asi_label(output: Dict[str, Any]) -> bool:
+    source = str(output.get("source") or "")
+    return not any(tag in source for tag in NON_ASI_SOURCES)
+
+
+def labelled_rows(rows: Iterable[Tuple[Dict[str, Any], Dict[str, Any]]]) -> Tuple[np.ndarray, np.ndarray]:
+    """(input, output) pairs → (X, y) keeping only ASI-labelled rows."""
+    inputs: List[Dict[str, Any]] = []
+    labels: List[float] = []
+    for inp, out in rows:
+        if not isinstance(inp, dict) or not isinstance(out, dict) or not is_asi_label(out):
+            continue
+        try:
+            label = float(out.get("risk_probability"))
+        except (TypeError, ValueError):
+            continue
+        if math.isfinite(label):
+            inputs.append(inp)
+            labels.append(label)
+    return feature_matrix(inputs), np.asarray(labels, dtype=np.float64)
+
+
+def is_borderline(scores: np.ndarray, band: Optional[float] = None) -> np.ndarray:
+    """True where a score is within `band` points of a class boundary."""
+    band = settings.LOCAL_MODEL_BORDERLINE_BAND if band is None else band
+    scores = np.asarray(scores, dtype=np.float64)
+    dist = np.min(np.abs(scores[:, None] - np.asarray(CLASS_BOUNDARIES)[None, :]), axis=1)
+    return dist < band
+
+
+# --- process-wide instance ------------------------------------------------
+_model: Optional[DistilledRiskModel] = None
+_load_attempted = False
+
+
+def load_local_model(path: Optional[str] = None) -> Optional[DistilledRiskModel]:
+    """Load the model file once; a missing or bad file disables the tier."""
+    global _model, _load_attempted
+    _load_attempted = True
+    path = path or settings.LOCAL_MODEL_PATH
+    if settings.LOCAL_MODEL_MODE == "off":
+        _model = None
+        return None
+    try:
+        _model = DistilledRiskModel.load(path)
+        logger.info("[MODEL] Loaded distilled risk model from %s", path)
+    except FileNotFoundError:
+        _model = None
+    except Exception as e:
+        _model = None
+        logger.warning("Could not load distilled model %s: %s", path, e)
+    return _model
+
+
+def get_local_model() -> Optional[DistilledRiskModel]:
+    if not _load_attempted:
+        load_local_model()
+    return _model
+
+
+def local_mode() -> str:
+    """Effective mode: 'off' whenever no model is loaded."""
+    return settings.LOCAL_MODEL_MODE if get_local_model() is not None else "off"
@@ -0,0 +1,264 @@
+"""
+market_cache.py
+
+Async TTL cache for CoinGecko market data (price + 24h trend), keyed by asset.
+
+- Fresh entries (age < MARKET_CACHE_TTL_SECONDS) are served directly.
+- Stale entries (within MARKET_CACHE_STALE_SECONDS past the TTL) are served
+  immediately while one background refresh runs (stale-while-revalidate).
+- Concurrent misses for the same asset share a single upstream fetch
+  (single-flight), so N callers cause one pair of CoinGecko requests.
+- get_prices() serves many assets from whatever is cached (no refresh is
+  forced) and fetches the rest with one multi-id /simple/price call.
+  Assets with no price at all are left out instead of getting
+  DEFAULT_PRICE, so callers can tell "unpriced" from a real quote.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import aiohttp
+
+from ..config import settings
+from .http_client import get_session
+from .upstream import COINGECKO_BASE, Stale
+from .metrics import upstream_call
+from .price_stats import record_price
+from .prediction_cache import on_market_update
+
+logger = logging.getLogger(__name__)
+
+# Fallback values used when upstream fails and nothing is cached
+DEFAULT_PRICE = 2000.0
+DEFAULT_TREND = 0.0
+
+SYMBOL_MAP = {
+    "eth": "ethereum",
+    "btc": "bitcoin",
+    "uni": "uniswap",
+    "aave": "aave",
+    "usdc": "usd-coin",
+    "sol": "solana",
+    # Aave reserve symbols
+    "weth": "ethereum",
+    "wbtc": "bitcoin",
+    "usdt": "tether",
+    "dai": "dai",
+    "link": "chainlink",
+    "wsteth": "wrapped-steth",
+}
+
+
+class _Entry:
+    __slots__ = ("price", "trend", "fetched_at")
+
+    def __init__(self, price: float, trend: float, fetched_at: float):
+        self.price = price
+        self.trend = trend
+        self.fetched_at = fetched_at
+
+
+_cache: Dict[str, _Entry] = {}
+_inflight: Dict[str, asyncio.Task] = {}
+_stats: Dict[str, int] = {
+    "hits": 0,
+    "stale_hits": 0,
+    "misses": 0,
+    "coalesced": 0,
+    "upstream_fetches": 0,
+    "upstream_errors": 0,
+}
+
+
+def resolve_asset_id(asset_symbol: str) -> str:
+    """Map a ticker (eth, btc, ...) to its CoinGecko id."""
+    return SYMBOL_MAP.get(asset_symbol.lower(), asset_symbol.lower())
+
+
+async def _fetch_upstream(asset_id: str) -> Tuple[float, float]:
+    session = await get_session()
+    timeout = aiohttp.ClientTimeout(total=5)
+
+    async def get_json(url: str) -> dict:
+        with upstream_call("coingecko"):
+            async with session.get(url, timeout=timeout) as resp:
+                return await resp.json(content_type=None)
+
+    price_data, coin_data = await asyncio.gather(
+        get_json(f"{COINGECKO_BASE}/simple/price?ids={asset_id}&vs_currencies=usd"),
+        get_json(f"{COINGECKO_BASE}/coins/{asset_id}"),
+    )
+    price = float(price_data[asset_id]["usd"])
+    trend = float(coin_data["market_data"]["price_change_percentage_24h"]) / 100
+    return price, trend
+
+
+async def _fetch_many_upstream(asset_ids: List[str]) -> Dict[str, Tuple[float, Optional[float]]]:
+    """(price, trend or None) for several assets in one /simple/price request."""
+    session = await get_session()
+    timeout = aiohttp.ClientTimeout(total=5)
+    url = (f"{COINGECKO_BASE}/simple/price?ids={','.join(asset_ids)}"
+           f"&vs_currencies=usd&include_24hr_change=true")
+    with upstream_call("coingecko"):
+        async with session.get(url, timeout=timeout) as resp:
+            data = await resp.json(content_type=None)
+    out = {}
+    for asset_id in asset_ids:
+        row = data.get(asset_id) or {}
+        if row.get("usd") is None:
+            continue
+        change = row.get("usd_24h_change")
+        out[asset_id] = (float(row["usd"]), None if change is None else float(change) / 100)
+    return out
+
+
+def _store_entry(asset_id: str, price: float, trend: float) -> _Entry:
+    previous = _cache.get(asset_id)
+    entry = _Entry(price, trend, time.monotonic())
+    _cache[asset_id] = entry
+    record_price(asset_id, price)
+    if previous is None or (previous.price, previous.trend) != (price, trend):
+        on_market_update(asset_id)
+    logger.debug("[MARKET] %s → $%.2f, trend=%.4f", asset_id, price, trend)
+    return entry
+
+
+async def _run_fetch(asset_id: str) -> _Entry:
+    _stats["upstream_fetches"] += 1
+    try:
+        price, trend = await _fetch_upstream(asset_id)
+    except Exception:
+        _stats["upstream_errors"] += 1
+        raise
+    finally:
+        _inflight.pop(asset_id, None)
+    return _store_entry(asset_id, price, trend)
+
+
+def _refresh(asset_id: str) -> asyncio.Task:
+    """Return the in-flight fetch for `asset_id`, starting one if needed."""
+    task = _inflight.get(asset_id)
+    if task is not None and not task.done():
+        _stats["coalesced"] += 1
+        return task
+    task = asyncio.ensure_future(_run_fetch(asset_id))
+    # Background refreshes may never be awaited; consume their errors
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+    _inflight[asset_id] = task
+    return task
+
+
+async def get_market_data(asset_symbol: str = "eth", strict: bool = False):
+    """
+    Return (price_usd, trend_24h) for `asset_symbol`, served from cache
+    where possible. Falls back to the last known value, then to defaults.
+
+    strict=True is for callers that report provenance (upstream.Source):
+    a value from an expired entry comes back wrapped in upstream.Stale, and
+    with nothing cached the fetch error is raised instead of the defaults.
+    """
+    asset_id = resolve_asset_id(asset_symbol)
+    entry = _cache.get(asset_id)
+
+    if entry is not None:
+        age = time.monotonic() - entry.fetched_at
+        if age < settings.MARKET_CACHE_TTL_SECONDS:
+            _stats["hits"] += 1
+            return entry.price, entry.trend
+        if age < settings.MARKET_CACHE_TTL_SECONDS + settings.MARKET_CACHE_STALE_SECONDS:
+            _stats["stale_hits"] += 1
+            _refresh(asset_id)
+            if strict:
+                return Stale((entry.price, entry.trend), f"cached {age:.0f}s ago, refresh in progress")
+            return entry.price, entry.trend
+
+    _stats["misses"] += 1
+    try:
+        # shield: one caller being cancelled must not cancel the shared fetch
+        fresh = await asyncio.shield(_refresh(asset_id))
+        return fresh.price, fresh.trend
+    except Exception as e:
+        logger.warning("Market fetch failed for %s: %s", asset_symbol, e)
+        if entry is not None:
+            if strict:
+                age = time.monotonic() - entry.fetched_at
+                return Stale((entry.price, entry.trend), f"fetch failed ({e}), last value {age:.0f}s old")
+            return entry.price, entry.trend
+        if strict:
+            raise
+        return DEFAULT_PRICE, DEFAULT_TREND
+
+
+async def get_price(asset_symbol: str = "eth", strict: bool = False):
+    """Price only; strict as in get_market_data (Stale-wrapped or raising)."""
+    data = await get_market_data(asset_symbol, strict)
+    if isinstance(data, Stale):
+        return Stale(data.value[0], data.reason)
+    return data[0]
+
+
+def entry_age(asset_symbol: str) -> Optional[float]:
+    """Seconds since `asset_symbol` was last fetched (None: never)."""
+    entry = _cache.get(resolve_asset_id(asset_symbol))
+    return None if entry is None else time.monotonic() - entry.fetched_at
+
+
+async def get_prices(asset_symbols: Iterable[str]) -> Dict[str, float]:
+    """
+    Prices keyed by CoinGecko id, for callers that need many assets at once
+    (the covariance snapshot). Cached entries, fresh or stale, are used as
+    they are, without starting a refresh. Only assets with no usable entry
+    are fetched, all in one multi-id /simple/price request. Falls back to
+    the last known value; assets that were never priced are omitted (never
+    DEFAULT_PRICE, which would value a stablecoin at $2000).
+    """
+    now = time.monotonic()
+    out: Dict[str, float] = {}
+    missing: List[str] = []
+    for asset_id in dict.fromkeys(resolve_asset_id(a) for a in asset_symbols):
+        entry = _cache.get(asset_id)
+        if entry is not None and now - entry.fetched_at < settings.MARKET_CACHE_TTL_SECONDS + settings.MARKET_CACHE_STALE_SECONDS:
+            _stats["hits"] += 1
+            out[asset_id] = entry.price
+        else:
+            _stats["misses"] += 1
+            missing.append(asset_id)
+    if not missing:
+        return out
+
+    _stats["upstream_fetches"] += 1
+    try:
+        fetched = await _fetch_many_upstream(missing)
+    except Exception as e:
+        _stats["upstream_errors"] += 1
+        logger.warning("Market fetch failed for %s: %s", ", ".join(missing), e)
+        fetched = {}
+    for asset_id in missing:
+        previous = _cache.get(asset_id)
+        if asset_id in fetched:
+            price, trend = fetched[asset_id]
+            if trend is None:
+                trend = previous.trend if previous is not None else DEFAULT_TREND
+            out[asset_id] = _store_entry(asset_id, price, trend).price
+        elif previous is not None:
+            out[asset_id] = previous.price
+    return out
+
+
+def invalidate(asset_symbol: Optional[str] = None) -> None:
+    """Drop one asset (or everything) from the cache."""
+    if asset_symbol is None:
+        _cache.clear()
+    else:
+        _cache.pop(resolve_asset_id(asset_symbol), None)
+
+
+def cache_stats() -> Dict[str, float]:
+    lookups = _stats["hits"] + _stats["stale_hits"] + _stats["misses"]
+    return {
+        **_stats,
+        "entries": len(_cache),
+        "hit_ratio": round((_stats["hits"] + _stats["stale_hits"]) / lookups, 4) if lookups else 0.0,
+    }
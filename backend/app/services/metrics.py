@@ -0,0 +1,264 @@
+"""
+metrics.py
+
+In-process metrics with Prometheus text exposition (GET /metrics).
+
+Counters, gauges and histograms are plain dicts keyed by label values,
+guarded by a lock (the write-behind flusher observes from a worker
+thread). Recording a sample is a perf_counter() call plus a dict update,
+so it is cheap enough for the request hot path, unlike printing to stdout.
+
+Usage:
+    with timed(STAGE_SECONDS, stage="asi_call"):
+        ...
+    PREDICTION_SOURCE.inc(source="local_fallback")
+"""
+
+import contextlib
+import math
+import threading
+import time
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_REGISTRY: List["_Metric"] = []
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _fmt_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _REGISTRY.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def _samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        head = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        return "\n".join(head + list(self._samples()))
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> Iterator[str]:
+        with self._lock:
+            items = list(self._values.items())
+        for key, v in items:
+            yield f"{self.name}_total{_fmt_labels(self.labelnames, key)} {_fmt_value(v)}"
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> Iterator[str]:
+        with self._lock:
+            items = list(self._values.items())
+        if not items and not self.labelnames:
+            items = [((), 0.0)]
+        for key, v in items:
+            yield f"{self.name}{_fmt_labels(self.labelnames, key)} {_fmt_value(v)}"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # label key -> [per-bucket counts..., sum, count]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            row = self._values.get(key)
+            if row is None:
+                row = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    row[i] += 1
+                    break
+            row[-2] += value
+            row[-1] += 1
+
+    def count(self, **labels) -> int:
+        row = self._values.get(self._key(labels))
+        return int(row[-1]) if row else 0
+
+    def _samples(self) -> Iterator[str]:
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._values.items()]
+        for key, row in items:
+            cumulative = 0.0
+            for bound, n in zip(self.buckets, row):
+                cumulative += n
+                le = f'le="{_fmt_value(bound)}"'
+                yield f"{self.name}_bucket{_fmt_labels(self.labelnames, key, le)} {_fmt_value(cumulative)}"
+            labels = _fmt_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_fmt_value(row[-2])}"
+            yield f"{self.name}_count{labels} {_fmt_value(row[-1])}"
+
+
+@contextlib.contextmanager
+def timed(histogram: Histogram, **labels):
+    """Observe the wall time of the `with` block (also on error)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(time.perf_counter() - start, **labels)
+
+
+@contextlib.contextmanager
+def upstream_call(upstream: str):
+    """Time one upstream call into UPSTREAM_SECONDS, labelled ok/error."""
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        UPSTREAM_SECONDS.observe(time.perf_counter() - start, upstream=upstream, outcome=outcome)
+
+
+def render() -> str:
+    """Every registered metric in Prometheus text format (0.0.4)."""
+    return "\n".join(m.render() for m in _REGISTRY) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+# --- Metric definitions ------------------------------------------------------
+# Prediction pipeline: market_fetch → enrich → cache → asi_call →
+# postprocess → persist (queue) → db_write (flusher)
+STAGE_SECONDS = Histogram(
+    "risk_stage_seconds", "Time spent in each prediction pipeline stage", ["stage"])
+
+UPSTREAM_SECONDS = Histogram(
+    "risk_upstream_request_seconds", "Latency of individual upstream HTTP calls",
+    ["upstream", "outcome"])
+
+UPSTREAM_FALLBACK = Counter(
+    "risk_upstream_fallback", "Fan-out sources that missed their deadline or failed",
+    ["source"])
+
+PREDICTION_SOURCE = Counter(
+    "risk_prediction_source", "Predictions by the model that produced them "
+    "(ASI-cloud, ASI-local, distilled_local, local_fallback, cache)", ["source"])
+
+LIVE_WALLET_SOURCE = Counter(
+    "risk_live_wallet_source", "Live wallet metrics by data source (live, mock, fallback)",
+    ["source"])
+
+HTTP_INFLIGHT = Gauge("risk_http_inflight_requests", "HTTP requests currently being served")
+
+HTTP_SECONDS = Histogram(
+    "risk_http_request_seconds", "HTTP request latency by route", ["method", "route", "status"])
+
+SCHED_TICK_LAG = Histogram(
+    "risk_scheduler_tick_lag_seconds", "Delay between a tick's scheduled and actual start")
+
+SCHED_TICK_SECONDS = Histogram(
+    "risk_scheduler_tick_seconds", "Duration of a scheduler tick",
+    buckets=DEFAULT_BUCKETS + (30.0, 60.0))
+
+SCHED_BACKLOG = Gauge("risk_scheduler_backlog", "Wallets overdue at the end of the last tick")
+
+STREAM_SUBSCRIBERS = Gauge("risk_stream_connections", "Open WebSocket/SSE risk stream connections")
+
+STREAM_UPDATES = Counter(
+    "risk_stream_updates", "Risk stream updates by outcome (sent, coalesced, unchanged)",
+    ["outcome"])
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware: in-flight gauge plus latency per route template
+    (the matched path, e.g. /api/history/{wallet}, so cardinality stays bounded).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        HTTP_INFLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_INFLIGHT.dec()
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_SECONDS.observe(time.perf_counter() - start, method=scope["method"],
+                                 route=route, status=str(status["code"]))
@@ -0,0 +1,176 @@
+"""
+prediction_cache.py
+
+LRU + TTL cache of risk_model.predict results.
+
+Keys are the five model features quantized to PRED_CACHE_QUANTUM steps
+plus the protocol, so near-identical requests (same wallet, market
+unchanged since the last tick) share one ASI answer. The cache holds at
+most PRED_CACHE_MAX_ENTRIES entries (bounded memory), entries expire after
+PRED_CACHE_TTL_SECONDS.
+
+Each entry is tagged with the asset its market features came from (the
+payload's asset_symbol, ETH by default). When market_cache sees that
+asset's price or trend change, on_market_update() drops only that
+asset's entries, so results for callers that supplied their own
+features do not outlive a market move, and entries for other assets stay
+valid. invalidate() drops everything in O(1) by bumping a generation
+(explicit flush only). Fallback results are never cached so ASI is
+retried once it recovers.
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from ..config import settings
+from .features import FEATURES, feature_matrix
+UNCACHEABLE_SOURCES = ("local_fallback", "distilled_local")
+DEFAULT_ASSET = "eth"
+
+
+def _parse_quanta(spec: str) -> Dict[str, float]:
+    quanta = {}
+    for part in spec.split(","):
+        if "=" in part:
+            name, step = part.split("=", 1)
+            quanta[name.strip()] = float(step)
+    return quanta
+
+
+class PredictionCache:
+    def __init__(self, max_entries: int, ttl: float, quanta: Dict[str, float]):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.quanta = quanta
+        # key -> (stored_at, generation, result, asset tag)
+        self._data: "OrderedDict[Tuple, Tuple[float, int, Dict[str, Any], Optional[str]]]" = OrderedDict()
+        self._by_asset: Dict[str, Set[Tuple]] = {}
+        self._generation = 0
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "asi_calls_saved": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": 0,
+            "market_updates": 0,
+            "asset_invalidations": 0,
+        }
+
+    def key(self, payload: Dict[str, Any]) -> Optional[Tuple]:
+        """Quantized feature key, or None if a feature is missing."""
+        parts = [payload.get("protocol")]
+        for name in FEATURES:
+            value = payload.get(name)
+            if value is None:
+                return None
+            step = self.quanta.get(name, 0.0)
+            parts.append(round(float(value) / step) if step > 0 else float(value))
+        return tuple(parts)
+
+    def keys(self, batch: np.ndarray, protocols: Sequence[Optional[str]]) -> List[Optional[Tuple]]:
+        """key() for every row of a FEATURE_DTYPE batch, quantized in one NumPy pass."""
+        X = feature_matrix(batch)
+        steps = np.array([self.quanta.get(name, 0.0) for name in FEATURES])
+        quantized = np.where(steps > 0, np.round(X / np.where(steps > 0, steps, 1.0)), X)
+        complete = ~np.isnan(X).any(axis=1)
+        return [(protocol, *row) if ok else None
+                for protocol, row, ok in zip(protocols, quantized.tolist(), complete.tolist())]
+
+    @staticmethod
+    def asset_of(payload: Any) -> str:
+        """CoinGecko id of the asset whose market data the payload depends on."""
+        from .market_cache import resolve_asset_id  # market_cache imports this module
+        return resolve_asset_id(payload.get("asset_symbol") or DEFAULT_ASSET)
+
+    def _drop(self, key: Tuple) -> None:
+        entry = self._data.pop(key, None)
+        if entry is not None and entry[3] is not None:
+            tagged = self._by_asset.get(entry[3])
+            if tagged is not None:
+                tagged.discard(key)
+                if not tagged:
+                    del self._by_asset[entry[3]]
+
+    def get(self, key: Optional[Tuple]) -> Optional[Dict[str, Any]]:
+        if key is None:
+            return None
+        entry = self._data.get(key)
+        if entry is None:
+            self._stats["misses"] += 1
+            return None
+        stored_at, generation, result, _ = entry
+        if generation != self._generation or time.monotonic() - stored_at > self.ttl:
+            self._drop(key)
+            self._stats["expirations"] += 1
+            self._stats["misses"] += 1
+            return None
+        self._data.move_to_end(key)
+        self._stats["hits"] += 1
+        self._stats["asi_calls_saved"] += 1
+        return dict(result)
+
+    def put(self, key: Optional[Tuple], result: Dict[str, Any], asset: Optional[str] = None) -> None:
+        """Store `result`; `asset` tags it for invalidate_asset()."""
+        if key is None or result.get("source") in UNCACHEABLE_SOURCES:
+            return
+        self._drop(key)
+        self._data[key] = (time.monotonic(), self._generation, dict(result), asset)
+        if asset is not None:
+            self._by_asset.setdefault(asset, set()).add(key)
+        while len(self._data) > self.max_entries:
+            self._drop(next(iter(self._data)))
+            self._stats["evictions"] += 1
+
+    def record_coalesced(self, n: int = 1) -> None:
+        """Count ASI calls saved by de-duplicating identical keys in a batch."""
+        self._stats["asi_calls_saved"] += n
+
+    def invalidate_asset(self, asset: str) -> int:
+        """Drop the entries tagged with `asset`. Returns how many were dropped."""
+        keys = self._by_asset.pop(asset, ())
+        for key in keys:
+            self._data.pop(key, None)
+        self._stats["market_updates"] += 1
+        self._stats["asset_invalidations"] += len(keys)
+        return len(keys)
+
+    def invalidate(self) -> None:
+        """Drop every entry (lazily, via the generation counter)."""
+        self._generation += 1
+        self._stats["invalidations"] += 1
+
+    def clear(self) -> None:
+        self._data.clear()
+        self._by_asset.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._stats["hits"] + self._stats["misses"]
+        return {
+            **self._stats,
+            "size": len(self._data),
+            "max_entries": self.max_entries,
+            "hit_ratio": round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+        }
+
+
+prediction_cache = PredictionCache(
+    max_entries=settings.PRED_CACHE_MAX_ENTRIES,
+    ttl=settings.PRED_CACHE_TTL_SECONDS,
+    quanta=_parse_quanta(settings.PRED_CACHE_QUANTUM),
+)
+
+
+def cache_enabled() -> bool:
+    return settings.PRED_CACHE_ENABLED
+
+
+def on_market_update(asset_id: str) -> None:
+    """
+    Called by market_cache when an asset's price or trend changed: drops
+    the cached results that depend on that asset, and only those.
+    """
+    prediction_cache.invalidate_asset(asset_id)
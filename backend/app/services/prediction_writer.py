@@ -0,0 +1,175 @@
+"""
+prediction_writer.py
+
+Write-behind queue for Prediction rows.
+
+Request handlers hand rows to submit_predictions() and return without
+waiting on a DB commit. A background task flushes the buffer with one
+bulk insert whenever WRITER_BATCH_SIZE rows are queued or every
+WRITER_FLUSH_INTERVAL_SECONDS, whichever comes first. The buffer is
+bounded (WRITER_MAX_BUFFER) with a configurable backpressure policy:
+
+- "block":       submitters wait until the flusher frees space
+- "drop_oldest": evict the oldest queued row to make room
+- "drop_new":    discard the incoming row
+
+stop_writer() drains everything still buffered before returning; rows
+submitted after stop() (or blocked on a full buffer when it ran) are
+inserted directly instead of waiting on a flusher that is gone.
+"""
+
+import asyncio
+import logging
+from collections import deque
+from typing import Dict, List, Optional
+
+from ..config import settings
+from ..db import insert_predictions
+from .metrics import STAGE_SECONDS, timed
+
+logger = logging.getLogger(__name__)
+
+POLICIES = ("block", "drop_oldest", "drop_new")
+
+
+class PredictionWriter:
+    def __init__(
+        self,
+        batch_size: int,
+        flush_interval: float,
+        max_buffer: int,
+        policy: str = "block",
+    ):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown backpressure policy {policy!r}, expected one of {POLICIES}")
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.max_buffer = max(self.batch_size, max_buffer)
+        self.policy = policy
+
+        self._buffer: deque = deque()
+        self._wakeup = asyncio.Event()
+        self._space = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self._stats = {"written": 0, "dropped": 0, "failed": 0, "flushes": 0}
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._closing = False
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        """Stop the flush loop and drain the buffer."""
+        if not self.running:
+            return
+        self._closing = True
+        self._wakeup.set()
+        self._space.set()  # blocked submitters write their rows directly
+        await self._task
+        self._task = None
+        self._space.set()
+
+    @property
+    def accepting(self) -> bool:
+        return self.running and not self._closing
+
+    async def submit(self, rows: List[dict]) -> None:
+        if not self.accepting:
+            await insert_now(rows)
+            return
+        for i, row in enumerate(rows):
+            while len(self._buffer) >= self.max_buffer:
+                if self.policy == "drop_new":
+                    self._stats["dropped"] += 1
+                    break
+                if self.policy == "drop_oldest":
+                    self._buffer.popleft()
+                    self._stats["dropped"] += 1
+                    continue
+                # block until the flusher makes room
+                self._space.clear()
+                self._wakeup.set()
+                await self._space.wait()
+                if not self.accepting:
+                    # stopped while we waited: nothing will flush the buffer again
+                    await insert_now(rows[i:])
+                    return
+            else:
+                self._buffer.append(row)
+
+        if len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+
+    async def _run(self) -> None:
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self._flush_available()
+        # shutdown: drain whatever is left
+        await self._flush_available()
+
+    async def _flush_available(self) -> None:
+        while self._buffer:
+            n = min(self.batch_size, len(self._buffer))
+            batch = [self._buffer.popleft() for _ in range(n)]
+            self._space.set()
+            try:
+                with timed(STAGE_SECONDS, stage="db_write"):
+                    await asyncio.to_thread(insert_predictions, batch)
+                self._stats["written"] += n
+            except Exception as e:
+                self._stats["failed"] += n
+                logger.warning("[DB WARN] Could not save %d predictions: %s", n, e)
+            self._stats["flushes"] += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {**self._stats, "buffered": len(self._buffer)}
+
+
+writer = PredictionWriter(
+    batch_size=settings.WRITER_BATCH_SIZE,
+    flush_interval=settings.WRITER_FLUSH_INTERVAL_SECONDS,
+    max_buffer=settings.WRITER_MAX_BUFFER,
+    policy=settings.WRITER_BACKPRESSURE,
+)
+
+
+def start_writer() -> None:
+    writer.start()
+
+
+async def stop_writer() -> None:
+    await writer.stop()
+
+
+async def submit_predictions(rows: List[dict]) -> None:
+    """
+    Queue rows for the background flusher. Outside the FastAPI app (no
+    running writer) rows are inserted directly, off the event loop.
+    """
+    if not rows:
+        return
+    if writer.accepting:
+        await writer.submit(rows)
+        return
+    await insert_now(rows)
+
+
+async def insert_now(rows: List[dict]) -> None:
+    """Insert rows directly, off the event loop (best-effort)."""
+    if not rows:
+        return
+    try:
+        with timed(STAGE_SECONDS, stage="db_write"):
+            await asyncio.to_thread(insert_predictions, rows)
+    except Exception as e:
+        logger.warning("[DB WARN] Could not save prediction: %s", e)
@@ -0,0 +1,308 @@
+"""
+price_stats.py
+
+Per-asset streaming statistics over appended price points.
+
+- RollingWindow: time-based sliding window with O(1) Welford add/remove,
+  giving mean, sample stdev, coefficient of variation ("volatility" as
+  used by /api/wallet-risk) and first→last trend.
+- AssetStats: one RollingWindow per configured horizon (STATS_HORIZONS)
+  plus an EWMA of the log-return variance rate (squared return / elapsed
+  time). Its weight decays with elapsed time, alpha = 1 - exp(-dt / tau)
+  with tau = STATS_EWMA_HALF_LIFE / ln 2, so the estimate does not depend
+  on how often points arrive. It is quoted per STATS_EWMA_INTERVAL.
+
+Points are appended as they arrive (market_cache refreshes feed every new
+price in). Each asset is loaded once per process from the local price
+store (price_store.py), which is topped up from CoinGecko's market_chart
+only when its high-water mark is missing or older than
+PRICE_STORE_MAX_GAP_SECONDS. Live points are queued and written behind to
+the store once the asset's history is loaded. Queries never touch the raw
+history and run in O(1).
+"""
+
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from typing import Deque, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from ..config import settings
+from .upstream import COINGECKO_BASE, fetch_json
+
+logger = logging.getLogger(__name__)
+
+_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_horizon(spec: str) -> float:
+    """'24h' → 86400.0, '7d' → 604800.0, '90' → 90.0 (seconds)."""
+    spec = spec.strip().lower()
+    if spec[-1] in _UNITS:
+        return float(spec[:-1]) * _UNITS[spec[-1]]
+    return float(spec)
+
+
+class RollingWindow:
+    __slots__ = ("horizon", "_points", "n", "mean", "_m2")
+
+    def __init__(self, horizon: float):
+        self.horizon = horizon
+        self._points: deque = deque()
+        self.n = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def _add(self, x: float) -> None:
+        self.n += 1
+        d = x - self.mean
+        self.mean += d / self.n
+        self._m2 += d * (x - self.mean)
+
+    def _remove(self, x: float) -> None:
+        self.n -= 1
+        if self.n == 0:
+            self.mean = 0.0
+            self._m2 = 0.0
+            return
+        d = x - self.mean
+        self.mean -= d / self.n
+        self._m2 = max(0.0, self._m2 - d * (x - self.mean))
+
+    def append(self, ts: float, price: float) -> None:
+        self._points.append((ts, price))
+        self._add(price)
+        cutoff = ts - self.horizon
+        while self._points and self._points[0][0] < cutoff:
+            self._remove(self._points.popleft()[1])
+
+    @property
+    def stdev(self) -> float:
+        return math.sqrt(self._m2 / (self.n - 1)) if self.n > 1 else 0.0
+
+    @property
+    def volatility(self) -> float:
+        """Coefficient of variation (stdev / mean) over the window."""
+        return self.stdev / self.mean if self.n > 1 and self.mean else 0.0
+
+    @property
+    def trend(self) -> float:
+        """Simple return from the oldest to the newest point in the window."""
+        if self.n < 2:
+            return 0.0
+        first, last = self._points[0][1], self._points[-1][1]
+        return (last - first) / first if first else 0.0
+
+
+class AssetStats:
+    def __init__(self, horizons: Dict[str, float], ewma_half_life: float, ewma_interval: float):
+        self.windows = {name: RollingWindow(h) for name, h in horizons.items()}
+        self.ewma_tau = ewma_half_life / math.log(2)
+        self.ewma_interval = ewma_interval
+        self._ewma_rate: Optional[float] = None  # variance of log returns per second
+        self.last_ts: Optional[float] = None
+        self.last_price: Optional[float] = None
+
+    def append(self, ts: float, price: float) -> None:
+        if price <= 0 or (self.last_ts is not None and ts <= self.last_ts):
+            return  # ignore bad or out-of-order points
+        if self.last_price is not None:
+            dt = ts - self.last_ts
+            rate = math.log(price / self.last_price) ** 2 / dt
+            if self._ewma_rate is None:
+                self._ewma_rate = rate
+            else:
+                alpha = -math.expm1(-dt / self.ewma_tau)
+                self._ewma_rate += alpha * (rate - self._ewma_rate)
+        for w in self.windows.values():
+            w.append(ts, price)
+        self.last_ts = ts
+        self.last_price = price
+
+    def extend(self, points: Iterable[Tuple[float, float]]) -> None:
+        for ts, price in points:
+            self.append(ts, price)
+
+    @property
+    def size(self) -> int:
+        return max((w.n for w in self.windows.values()), default=0)
+
+    def points(self) -> Iterable[Tuple[float, float]]:
+        """Points retained by the longest window."""
+        longest = max(self.windows.values(), key=lambda w: w.horizon)
+        return list(longest._points)
+
+    def window(self, horizon: Optional[str] = None) -> RollingWindow:
+        return self.windows[horizon or settings.STATS_DEFAULT_HORIZON]
+
+    def volatility(self, horizon: Optional[str] = None) -> float:
+        return self.window(horizon).volatility
+
+    def trend(self, horizon: Optional[str] = None) -> float:
+        return self.window(horizon).trend
+
+    def ewma_volatility(self) -> float:
+        """EWMA stdev of log returns over one STATS_EWMA_INTERVAL."""
+        return math.sqrt(self._ewma_rate * self.ewma_interval) if self._ewma_rate is not None else 0.0
+
+    def snapshot(self) -> Dict[str, float]:
+        out = {"price": self.last_price, "ewma_volatility": round(self.ewma_volatility(), 6)}
+        for name, w in self.windows.items():
+            out[f"volatility_{name}"] = round(w.volatility, 6)
+            out[f"trend_{name}"] = round(w.trend, 6)
+        return out
+
+
+# --- registry -------------------------------------------------------------
+_engines: Dict[str, AssetStats] = {}
+_backfills: Dict[str, asyncio.Task] = {}
+_backfilled: set = set()
+_backfill_failed_at: Dict[str, float] = {}
+# Live points waiting for the price store (only flushed once the asset is backfilled)
+PENDING_MAX_POINTS = 10000
+_pending: Dict[str, Deque[Tuple[float, float]]] = {}
+_flush_task: Optional[asyncio.Task] = None
+
+
+def _horizons() -> Dict[str, float]:
+    return {h.strip(): parse_horizon(h) for h in settings.STATS_HORIZONS.split(",") if h.strip()}
+
+
+def _new_engine() -> AssetStats:
+    return AssetStats(_horizons(), parse_horizon(settings.STATS_EWMA_HALF_LIFE),
+                      parse_horizon(settings.STATS_EWMA_INTERVAL))
+
+
+def get_engine(asset_id: str) -> AssetStats:
+    engine = _engines.get(asset_id)
+    if engine is None:
+        engine = _engines[asset_id] = _new_engine()
+    return engine
+
+
+def record_price(asset_id: str, price: float, ts: Optional[float] = None) -> None:
+    """Append one live price point (called on every market-cache refresh)."""
+    ts = time.time() if ts is None else ts
+    get_engine(asset_id).append(ts, price)
+    if settings.PRICE_STORE_ENABLED:
+        _pending.setdefault(asset_id, deque(maxlen=PENDING_MAX_POINTS)).append((ts, price))
+        _schedule_flush()
+
+
+def _schedule_flush() -> None:
+    global _flush_task
+    if _flush_task is not None and not _flush_task.done():
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return  # no event loop: the next flush picks the points up
+    _flush_task = loop.create_task(flush_prices())
+
+
+async def flush_prices() -> int:
+    """Write queued live points of backfilled assets to the price store. Returns how many were added."""
+    from .price_store import get_store
+
+    task = _flush_task
+    if task is not None and task is not asyncio.current_task() and not task.done():
+        await asyncio.gather(task, return_exceptions=True)
+    written = 0
+    while True:
+        ready = [a for a, points in _pending.items() if points and a in _backfilled]
+        if not ready:
+            return written
+        for asset_id in ready:
+            points = list(_pending.pop(asset_id))
+            try:
+                written += await asyncio.to_thread(get_store().append, asset_id, points)
+            except SQLAlchemyError as e:
+                logger.warning("Could not store %d prices for %s: %s", len(points), asset_id, e)
+
+
+def _days(seconds: float) -> int:
+    return max(1, math.ceil(seconds / 86400))
+
+
+async def _fetch_history(asset_id: str, days: int = 7) -> list:
+    data = await fetch_json(
+        f"{COINGECKO_BASE}/coins/{asset_id}/market_chart?vs_currency=usd&days={days}"
+    )
+    return [(p[0] / 1000.0, float(p[1])) for p in data.get("prices", [])]
+
+
+async def _load_stored(asset_id: str, longest: float) -> list:
+    from .price_store import get_store
+
+    store = get_store()
+    now = time.time()
+    mark = await asyncio.to_thread(store.high_water, asset_id)
+    if mark is None or now - mark > settings.PRICE_STORE_MAX_GAP_SECONDS:
+        # Only the gap since the high-water mark is downloaded (the whole horizon the first time)
+        gap = longest if mark is None else min(longest, now - mark)
+        history = await _fetch_history(asset_id, _days(gap))
+        added = await asyncio.to_thread(store.append, asset_id, history)
+        logger.debug("[STATS] Stored %d new points for %s", added, asset_id)
+    return await asyncio.to_thread(store.series, asset_id, now - longest)
+
+
+async def _load_history(asset_id: str) -> list:
+    """History covering the longest horizon: from the price store, or market_chart without one."""
+    longest = max(_horizons().values(), default=7 * 86400.0)
+    if settings.PRICE_STORE_ENABLED:
+        try:
+            return await _load_stored(asset_id, longest)
+        except SQLAlchemyError as e:
+            logger.warning("Price store unavailable for %s, using market_chart: %s", asset_id, e)
+    return await _fetch_history(asset_id, _days(longest))
+
+
+async def _backfill(asset_id: str) -> None:
+    try:
+        history = await _load_history(asset_id)
+        live = get_engine(asset_id).points()
+        # History goes in front of any live points recorded meanwhile
+        first_live = live[0][0] if live else float("inf")
+        engine = _new_engine()
+        engine.extend(p for p in history if p[0] < first_live)
+        engine.extend(live)
+        _engines[asset_id] = engine
+        _backfilled.add(asset_id)
+        logger.info("[STATS] Backfilled %d points for %s", len(history), asset_id)
+        if _pending.get(asset_id):
+            _schedule_flush()
+    finally:
+        _backfills.pop(asset_id, None)
+
+
+async def ensure_backfilled(asset_id: str) -> AssetStats:
+    """
+    Backfill `asset_id` from the price store once (single-flight). A failed
+    backfill is retried after STATS_BACKFILL_RETRY_SECONDS.
+    """
+    if asset_id in _backfilled:
+        return _engines[asset_id]
+    failed_at = _backfill_failed_at.get(asset_id)
+    if failed_at is not None and time.monotonic() - failed_at < settings.STATS_BACKFILL_RETRY_SECONDS:
+        return get_engine(asset_id)
+
+    task = _backfills.get(asset_id)
+    if task is None:
+        task = _backfills[asset_id] = asyncio.ensure_future(_backfill(asset_id))
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+    try:
+        await asyncio.shield(task)
+    except Exception as e:
+        _backfill_failed_at[asset_id] = time.monotonic()
+        logger.warning("Price history backfill failed for %s: %s", asset_id, e)
+    return get_engine(asset_id)
+
+
+async def get_stats(asset_symbol: str = "eth") -> AssetStats:
+    """Backfilled statistics engine for a ticker or CoinGecko id."""
+    from .market_cache import resolve_asset_id
+
+    return await ensure_backfilled(resolve_asset_id(asset_symbol))
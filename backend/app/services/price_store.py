@@ -0,0 +1,178 @@
+"""
+price_store.py
+
+Local price history per asset, in the app database (SQLite locally,
+Postgres in prod).
+
+- price_points: raw (asset, ts, price) rows. The covering index on
+  (asset, ts, price) means a range read is one index range scan that never
+  touches the table or the rest of the series.
+- price_bars:   OHLC bars per (asset, resolution, bucket) for each width
+  in PRICE_STORE_RESOLUTIONS (default 1h and 1d). They are kept up to date
+  on append, so a downsampled read only scans its own bars.
+
+append() only takes points newer than the asset's high-water mark (its
+latest stored ts), so sending overlapping history again is a no-op and
+only the newest bar per resolution is ever updated in place. Raw points
+older than PRICE_STORE_RAW_RETENTION are pruned; bars are kept.
+
+Methods are blocking; async callers run them in a worker thread.
+"""
+
+import math
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, delete, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from ..config import settings
+from ..db import PriceBar, PricePoint, engine as default_engine
+from .price_stats import parse_horizon
+
+RAW = "raw"
+BAR_FIELDS = ("ts", "open", "high", "low", "close", "count")
+
+
+def parse_resolutions(spec: str) -> Dict[str, int]:
+    """'1h,1d' → {'1h': 3600, '1d': 86400}"""
+    return {r.strip(): int(parse_horizon(r)) for r in spec.split(",") if r.strip()}
+
+
+def _bars(points: List[Tuple[float, float]], width: int) -> "OrderedDict[float, list]":
+    """Time-ordered points → bucket start → [open, high, low, close, count]."""
+    out: "OrderedDict[float, list]" = OrderedDict()
+    for ts, price in points:
+        bucket = math.floor(ts / width) * width
+        bar = out.get(bucket)
+        if bar is None:
+            out[bucket] = [price, price, price, price, 1]
+        else:
+            bar[1] = max(bar[1], price)
+            bar[2] = min(bar[2], price)
+            bar[3] = price
+            bar[4] += 1
+    return out
+
+
+class PriceStore:
+    def __init__(self, resolutions: Dict[str, int], raw_retention: Optional[float] = None,
+                 engine=default_engine):
+        self.resolutions = resolutions
+        self.raw_retention = raw_retention
+        self.engine = engine
+
+    def high_water(self, asset: str, conn=None) -> Optional[float]:
+        """Latest stored ts for `asset` (None when nothing is stored)."""
+        query = select(func.max(PricePoint.ts)).where(PricePoint.asset == asset)
+        if conn is not None:
+            return conn.execute(query).scalar()
+        with self.engine.connect() as c:
+            return c.execute(query).scalar()
+
+    def append(self, asset: str, points: Iterable[Tuple[float, float]]) -> int:
+        """Store the points newer than the high-water mark. Returns how many were added."""
+        points = sorted((float(ts), float(price)) for ts, price in points if price and price > 0)
+        attempts = 3
+        while True:
+            try:
+                with self.engine.begin() as conn:
+                    return self._append(conn, asset, points)
+            except IntegrityError:
+                # another process appended the same points meanwhile; re-read the mark
+                attempts -= 1
+                if not attempts:
+                    raise
+
+    def _append(self, conn, asset: str, points: List[Tuple[float, float]]) -> int:
+        mark = self.high_water(asset, conn)
+        fresh: List[Tuple[float, float]] = []
+        for ts, price in points:
+            if mark is not None and ts <= mark:
+                continue
+            if fresh and fresh[-1][0] == ts:
+                fresh[-1] = (ts, price)  # same timestamp twice: keep the later value
+            else:
+                fresh.append((ts, price))
+        if not fresh:
+            return 0
+
+        conn.execute(insert(PricePoint), [{"asset": asset, "ts": ts, "price": p} for ts, p in fresh])
+        for width in self.resolutions.values():
+            bars = _bars(fresh, width)
+            first = next(iter(bars))
+            key = and_(PriceBar.asset == asset, PriceBar.resolution == width, PriceBar.bucket == first)
+            current = conn.execute(
+                select(PriceBar.open, PriceBar.high, PriceBar.low, PriceBar.count).where(key)
+            ).first()
+            if current is not None:
+                # Only the newest stored bar can still be open: merge into it
+                o, h, l, c, n = bars.pop(first)
+                conn.execute(update(PriceBar).where(key).values(
+                    high=max(current.high, h), low=min(current.low, l), close=c,
+                    count=current.count + n))
+            if bars:
+                conn.execute(insert(PriceBar), [
+                    {"asset": asset, "resolution": width, "bucket": b,
+                     "open": o, "high": h, "low": l, "close": c, "count": n}
+                    for b, (o, h, l, c, n) in bars.items()
+                ])
+        if self.raw_retention:
+            conn.execute(delete(PricePoint).where(
+                PricePoint.asset == asset, PricePoint.ts < fresh[-1][0] - self.raw_retention))
+        return len(fresh)
+
+    def _width(self, resolution: str) -> int:
+        if resolution not in self.resolutions:
+            raise ValueError(f"resolution must be one of {', '.join((RAW, *self.resolutions))}")
+        return self.resolutions[resolution]
+
+    def series(self, asset: str, since: Optional[float] = None, until: Optional[float] = None,
+               resolution: str = RAW, limit: Optional[int] = None) -> List[Tuple[float, float]]:
+        """(ts, price) in [since, until), oldest first; bars give (bucket start, close)."""
+        if resolution == RAW:
+            cols, ts_col = (PricePoint.ts, PricePoint.price), PricePoint.ts
+            conds = [PricePoint.asset == asset]
+        else:
+            cols, ts_col = (PriceBar.bucket, PriceBar.close), PriceBar.bucket
+            conds = [PriceBar.asset == asset, PriceBar.resolution == self._width(resolution)]
+        if since is not None:
+            conds.append(ts_col >= since)
+        if until is not None:
+            conds.append(ts_col < until)
+        query = select(*cols).where(*conds).order_by(ts_col)
+        if limit is not None:
+            query = query.limit(limit)
+        with self.engine.connect() as conn:
+            rows = conn.execute(query).all()
+        return [(float(ts), float(price)) for ts, price in rows]
+
+    def bars(self, asset: str, since: Optional[float] = None, until: Optional[float] = None,
+             resolution: str = "1h", limit: Optional[int] = None) -> List[Dict[str, float]]:
+        """OHLC rows in [since, until), oldest first (raw points come back as one-point bars)."""
+        if resolution == RAW:
+            return [{"ts": ts, "open": p, "high": p, "low": p, "close": p, "count": 1}
+                    for ts, p in self.series(asset, since, until, limit=limit)]
+        conds = [PriceBar.asset == asset, PriceBar.resolution == self._width(resolution)]
+        if since is not None:
+            conds.append(PriceBar.bucket >= since)
+        if until is not None:
+            conds.append(PriceBar.bucket < until)
+        query = select(PriceBar.bucket, PriceBar.open, PriceBar.high, PriceBar.low,
+                       PriceBar.close, PriceBar.count).where(*conds).order_by(PriceBar.bucket)
+        if limit is not None:
+            query = query.limit(limit)
+        with self.engine.connect() as conn:
+            rows = conn.execute(query).all()
+        return [dict(zip(BAR_FIELDS, row)) for row in rows]
+
+
+_store: Optional[PriceStore] = None
+
+
+def get_store() -> PriceStore:
+    global _store
+    if _store is None:
+        _store = PriceStore(parse_resolutions(settings.PRICE_STORE_RESOLUTIONS),
+                            parse_horizon(settings.PRICE_STORE_RAW_RETENTION))
+    return _store
@@ -6,54 +6,96 @@ post-process result and return RiskOutput-like dict.
 """
 
 from .asi_client import call_asi_model
+from .features import FeatureLike, FeatureVector, to_array
+from .local_model import feature_matrix, get_local_model, is_borderline, local_mode
+from .prediction_cache import cache_enabled, prediction_cache
 from .data_fetcher import fetch_market_volatility, fetch_market_trend, fetch_aave_position
-from typing import Dict, Any
+from .metrics import PREDICTION_SOURCE, STAGE_SECONDS, timed
+from typing import Dict, Any, List, Sequence, Union
 import asyncio
+import numpy as np
 
-async def predict(features: Dict[str, Any]) -> Dict[str, Any]:
+async def enrich_features(features: FeatureLike) -> FeatureLike:
     """
-    features: may contain volatility, collateral_ratio, leverage, asset_price, market_trend
-    Enrich features where missing, then call ASI.
-    Returns dictionary matching RiskOutput schema.
+    Fill in volatility / market_trend / position fields that are missing
+    from `features`. Returns the merged payload (caller values win).
+    A FeatureVector is filled in place and returned as-is.
     """
-    tasks = []
+    if isinstance(features, FeatureVector):
+        return await _enrich_vector(features)
+    names, tasks = [], []
     enriched = {}
 
     # If volatility missing
     if "volatility" not in features or features.get("volatility") is None:
+        names.append("volatility")
         tasks.append(fetch_market_volatility())
     else:
         enriched["volatility"] = features["volatility"]
 
     # If market trend missing
     if "market_trend" not in features or features.get("market_trend") is None:
+        names.append("market_trend")
         tasks.append(fetch_market_trend())
     else:
         enriched["market_trend"] = features["market_trend"]
 
     # If collateral_ratio/leverage missing but user_wallet provided
     if (("collateral_ratio" not in features or "leverage" not in features) and features.get("user_wallet")):
+        names.append("position")
         tasks.append(fetch_aave_position(features["user_wallet"]))
 
     # Wait for async enrichment
     if tasks:
-        results = await asyncio.gather(*tasks, return_exceptions=False)
-        for r in results:
-            if isinstance(r, dict) and "collateral_ratio" in r:
-                enriched.setdefault("collateral_ratio", r.get("collateral_ratio"))
-                enriched.setdefault("leverage", r.get("leverage"))
-                enriched.setdefault("asset_price", r.get("asset_price"))
-            elif isinstance(r, float):
-                if "volatility" not in enriched:
-                    enriched["volatility"] = r
-                elif "market_trend" not in enriched:
-                    enriched["market_trend"] = r
+        results = dict(zip(names, await asyncio.gather(*tasks, return_exceptions=False)))
+        position = results.get("position")
+        if isinstance(position, dict):
+            enriched.setdefault("collateral_ratio", position.get("collateral_ratio"))
+            enriched.setdefault("leverage", position.get("leverage"))
+            enriched.setdefault("asset_price", position.get("asset_price"))
+            # A valued multi-asset portfolio beats the ETH-only market volatility
+            for key in ("volatility", "collateral_usd", "debt_usd"):
+                if position.get(key) is not None:
+                    enriched.setdefault(key, position[key])
+        for key in ("volatility", "market_trend"):
+            if key in results:
+                enriched.setdefault(key, results[key])
 
     # Final merged payload
-    payload = {**enriched, **features}
+    return {**enriched, **features}
+
+
+async def _enrich_vector(vec: FeatureVector) -> FeatureVector:
+    names, tasks = [], []
+    if vec.volatility is None:
+        names.append("volatility")
+        tasks.append(fetch_market_volatility())
+    if vec.market_trend is None:
+        names.append("market_trend")
+        tasks.append(fetch_market_trend())
+    if (vec.collateral_ratio is None or vec.leverage is None) and vec.user_wallet:
+        names.append("position")
+        tasks.append(fetch_aave_position(vec.user_wallet))
+    if not tasks:
+        return vec
 
-    # Wrap for ASI API
-    asi_payload = {
+    results = dict(zip(names, await asyncio.gather(*tasks, return_exceptions=False)))
+    position = results.get("position")
+    if isinstance(position, dict):
+        # Position first: portfolio volatility beats the ETH-only market volatility
+        for key in ("collateral_ratio", "leverage", "asset_price", "volatility",
+                    "collateral_usd", "debt_usd"):
+            if position.get(key) is not None:
+                vec.setdefault(key, position[key])
+    for key in ("volatility", "market_trend"):
+        if key in results:
+            vec.setdefault(key, results[key])
+    return vec
+
+
+def build_asi_payload(payload: FeatureLike) -> Dict[str, Any]:
+    """Wrap merged features in the request shape ASI expects."""
+    return {
         "inputs": {
             "volatility": payload.get("volatility"),
             "collateral_ratio": payload.get("collateral_ratio"),
@@ -67,25 +109,32 @@ async def predict(features: Dict[str, Any]) -> Dict[str, Any]:
         }
     }
 
-    # Call ASI model
-    result = await call_asi_model(asi_payload)
 
-    # --- Postprocess result safely ---
+def local_scores(payloads: Union[Sequence[FeatureLike], np.ndarray]) -> np.ndarray:
+    """
+    Vectorized local fallback formula over many payloads (or a
+    FEATURE_DTYPE batch) at once:
+        base = v*40 + l*10 - c*5 - t*20, clipped to [5, 95]
+    Missing inputs take local_model.DEFAULTS (v 0.5, c 1.2, l 2, t 0.1).
+    """
+    X = feature_matrix(payloads)
+    v, c, l, t = X[:, 0], X[:, 1], X[:, 2], X[:, 4]
+
+    base = (v * 40) + (l * 10) - (c * 5) - (t * 20)
+    return np.round(np.clip(base, 5, 95), 2)
+
+
+def needs_local_fallback(result: Dict[str, Any]) -> bool:
+    """Normalise risk_probability and report whether ASI gave a flat/zero result."""
     try:
         result["risk_probability"] = float(result.get("risk_probability", 0))
     except Exception:
         result["risk_probability"] = 0.0
+    return result["risk_probability"] in [0, 35, 31]
 
-    # ✅ Use local fallback if ASI gave a flat or zero result
-    if result["risk_probability"] in [0, 35, 31]:
-        v = payload.get("volatility", 0.5)
-        c = payload.get("collateral_ratio", 1.2)
-        l = payload.get("leverage", 2)
-        t = payload.get("market_trend", 0.1)
-
-        base = (v * 40) + (l * 10) - (c * 5) - (t * 20)
-        result["risk_probability"] = round(max(5, min(95, base)), 2)
 
+def finalize_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Map risk_probability to class/message and fill safety defaults."""
     # ✅ Always map risk_class dynamically
     rp = result["risk_probability"]
 
@@ -104,3 +153,170 @@ async def predict(features: Dict[str, Any]) -> Dict[str, Any]:
     result.setdefault("explanation", result.get("explanation", ""))
 
     return result
+
+
+def _distilled_result(score: float) -> Dict[str, Any]:
+    return {"risk_probability": score, "source": "distilled_local"}
+
+
+# Score for a position with no debt (the floor of the local formula)
+NO_DEBT_RISK = 5.0
+
+
+def is_debt_free(payload: FeatureLike) -> bool:
+    """Known to carry no debt (debt_usd is 0, not merely missing)."""
+    return payload.get("debt_usd") == 0
+
+
+def _no_debt_result() -> Dict[str, Any]:
+    return {
+        "risk_probability": NO_DEBT_RISK,
+        "source": "no_debt",
+        "explanation": "No outstanding debt: the position cannot be liquidated.",
+    }
+
+
+async def predict(features: FeatureLike) -> Dict[str, Any]:
+    """
+    features: may contain volatility, collateral_ratio, leverage, asset_price, market_trend
+    (a dict, or a FeatureVector for internal callers)
+    Enrich features where missing, then call ASI.
+    Returns dictionary matching RiskOutput schema.
+    Each stage is timed into STAGE_SECONDS (see metrics.py).
+    """
+    with timed(STAGE_SECONDS, stage="enrich"):
+        payload = await enrich_features(features)
+
+    # 🟢 Nothing borrowed: nothing to liquidate, no model call needed
+    if is_debt_free(payload):
+        PREDICTION_SOURCE.inc(source="no_debt")
+        return finalize_result(_no_debt_result())
+
+    # ♻️ Quantized-feature cache: same inputs → reuse the last ASI answer
+    with timed(STAGE_SECONDS, stage="cache"):
+        key = prediction_cache.key(payload) if cache_enabled() else None
+        cached = prediction_cache.get(key)
+    if cached is not None:
+        PREDICTION_SOURCE.inc(source="cache")
+        return cached
+
+    # ⚡ Fast tier: distilled model answers unless the score is borderline
+    if local_mode() == "primary":
+        with timed(STAGE_SECONDS, stage="local_model"):
+            score = get_local_model().predict_many([payload])
+        if not is_borderline(score)[0]:
+            PREDICTION_SOURCE.inc(source="distilled_local")
+            return finalize_result(_distilled_result(float(score[0])))
+
+    # Call ASI model
+    with timed(STAGE_SECONDS, stage="asi_call"):
+        result = await call_asi_model(build_asi_payload(payload))
+
+    with timed(STAGE_SECONDS, stage="postprocess"):
+        # ✅ Use local fallback if ASI gave a flat or zero result
+        if needs_local_fallback(result):
+            result["risk_probability"] = float(local_scores([payload])[0])
+
+        result = finalize_result(result)
+        prediction_cache.put(key, result, prediction_cache.asset_of(payload))
+    PREDICTION_SOURCE.inc(source=result.get("source", "unknown"))
+    return result
+
+
+async def predict_batch(
+    features_list: Sequence[FeatureLike],
+    concurrency: int = 8,
+) -> List[Union[Dict[str, Any], BaseException]]:
+    """
+    Batch form of predict(). Cache hits are answered first and items with
+    the same quantized key share one ASI call. ASI calls run with at most
+    `concurrency` in flight. After enrichment the features are packed into
+    one FEATURE_DTYPE array, and cache keys, the distilled model (primary
+    mode) and the local fallback formula each run over it in one NumPy
+    operation. Output order matches input order; a failed item is returned
+    as its exception instead of failing the whole batch.
+    """
+    sem = asyncio.Semaphore(max(1, concurrency))
+
+    async def enrich_one(features: FeatureLike):
+        async with sem:
+            return await enrich_features(features)
+
+    with timed(STAGE_SECONDS, stage="batch_enrich"):
+        payloads = await asyncio.gather(*(enrich_one(f) for f in features_list),
+                                        return_exceptions=True)
+    outcomes: List[Any] = list(payloads)
+    ok_idx = [i for i, p in enumerate(payloads) if not isinstance(p, BaseException)]
+    # One structured row per enriched item (row[i] = its index in `batch`)
+    batch = to_array([payloads[i] for i in ok_idx])
+    row = {i: r for r, i in enumerate(ok_idx)}
+
+    # ♻️ Cache lookups; duplicates of the same key ride along with one call
+    if cache_enabled():
+        keys = dict(zip(ok_idx, prediction_cache.keys(batch, [payloads[i].get("protocol") for i in ok_idx])))
+    else:
+        keys = dict.fromkeys(ok_idx)
+    followers: Dict[int, List[int]] = {}
+    leader_for_key: Dict[Any, int] = {}
+    pending_idx = []
+    for i in ok_idx:
+        if is_debt_free(payloads[i]):
+            outcomes[i] = finalize_result(_no_debt_result())
+            PREDICTION_SOURCE.inc(source="no_debt")
+            continue
+        key = keys[i]
+        cached = prediction_cache.get(key)
+        if cached is not None:
+            outcomes[i] = cached
+            PREDICTION_SOURCE.inc(source="cache")
+        elif key is not None and key in leader_for_key:
+            followers.setdefault(leader_for_key[key], []).append(i)
+            prediction_cache.record_coalesced()
+        else:
+            if key is not None:
+                leader_for_key[key] = i
+            pending_idx.append(i)
+    ok_idx = pending_idx
+
+    # ⚡ Distilled model over the whole batch; only borderline items go to ASI
+    asi_idx = ok_idx
+    if ok_idx and local_mode() == "primary":
+        scores = get_local_model().predict_many(batch[[row[i] for i in ok_idx]])
+        borderline = is_borderline(scores)
+        asi_idx = [i for i, b in zip(ok_idx, borderline) if b]
+        for i, score, b in zip(ok_idx, scores.tolist(), borderline):
+            if not b:
+                outcomes[i] = finalize_result(_distilled_result(score))
+                PREDICTION_SOURCE.inc(source="distilled_local")
+
+    async def call_one(i: int):
+        async with sem:
+            return await call_asi_model(build_asi_payload(payloads[i]))
+
+    with timed(STAGE_SECONDS, stage="batch_asi_call"):
+        asi_results = await asyncio.gather(*(call_one(i) for i in asi_idx),
+                                           return_exceptions=True)
+
+    with timed(STAGE_SECONDS, stage="batch_postprocess"):
+        # Collect every item that needs the local formula and score them together
+        fallback_idx = []
+        for i, r in zip(asi_idx, asi_results):
+            outcomes[i] = r
+            if not isinstance(r, BaseException) and needs_local_fallback(r):
+                fallback_idx.append(i)
+        if fallback_idx:
+            scores = local_scores(batch[[row[i] for i in fallback_idx]])
+            for i, score in zip(fallback_idx, scores.tolist()):
+                outcomes[i]["risk_probability"] = score
+
+        for i, r in zip(asi_idx, asi_results):
+            if not isinstance(r, BaseException):
+                outcomes[i] = finalize_result(r)
+                prediction_cache.put(keys[i], outcomes[i], prediction_cache.asset_of(payloads[i]))
+                PREDICTION_SOURCE.inc(source=r.get("source", "unknown"))
+
+    for leader, idx in followers.items():
+        for i in idx:
+            r = outcomes[leader]
+            outcomes[i] = r if isinstance(r, BaseException) else dict(r)
+    return outcomes
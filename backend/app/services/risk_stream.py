@@ -0,0 +1,162 @@
+"""
+risk_stream.py
+
+Fan-out of scheduler results to push subscribers (WebSocket /ws/risk,
+SSE /api/risk-stream).
+
+- The monitoring loop (tasks/scheduler.py) scores each watched wallet
+  once and calls `risk_hub.publish(wallet, result)`. Results whose risk
+  class, action and risk_probability (within STREAM_RISK_EPSILON) match
+  the last published one are dropped, so clients only see changes.
+- Each connection owns a Subscription: a mailbox holding the LATEST
+  pending update per wallet. A slow client never queues more than one
+  update per subscribed wallet; a newer update replaces (coalesces) the
+  one it has not read yet. The connection's sender drains the mailbox
+  at the client's own pace, which is the per-connection backpressure.
+- The first subscriber of a wallet adds it to the scheduler's watch list
+  and the last one to leave removes it (see `bind`). New subscribers get
+  the last published result straight away.
+"""
+
+import asyncio
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from ..config import settings
+from .metrics import STREAM_SUBSCRIBERS, STREAM_UPDATES
+
+UPDATE_FIELDS = ("risk_probability", "risk_class", "action", "explanation", "source")
+
+
+def normalize_wallet(wallet: str) -> str:
+    return wallet.strip().lower()
+
+
+class Subscription:
+    def __init__(self, hub: "RiskHub"):
+        self.hub = hub
+        self.wallets: Set[str] = set()
+        self._pending: Dict[str, dict] = {}
+        self._ready = asyncio.Event()
+        self.closed = False
+
+    def offer(self, wallet: str, update: dict) -> None:
+        if wallet in self._pending:
+            STREAM_UPDATES.inc(outcome="coalesced")
+            self.hub.stats["coalesced"] += 1
+            del self._pending[wallet]  # re-insert: the mailbox stays in arrival order
+        self._pending[wallet] = update
+        self._ready.set()
+
+    async def next_batch(self) -> List[dict]:
+        """Wait for pending updates and take all of them (one per wallet, oldest first)."""
+        await self._ready.wait()
+        self._ready.clear()
+        batch, self._pending = list(self._pending.values()), {}
+        STREAM_UPDATES.inc(len(batch), outcome="sent")
+        self.hub.stats["sent"] += len(batch)
+        return batch
+
+    def subscribe(self, wallets: Iterable[str]) -> List[str]:
+        return self.hub.subscribe(self, wallets)
+
+    def unsubscribe(self, wallets: Iterable[str]) -> None:
+        self.hub.unsubscribe(self, wallets)
+
+    def close(self) -> None:
+        self.hub.close(self)
+
+
+class RiskHub:
+    def __init__(self):
+        self._subs: Dict[str, Set[Subscription]] = {}
+        self._last: Dict[str, dict] = {}
+        self._connections: Set[Subscription] = set()
+        self._watch: Optional[Callable[[str], None]] = None
+        self._unwatch: Optional[Callable[[str], None]] = None
+        self.stats = {"published": 0, "unchanged": 0, "coalesced": 0, "sent": 0}
+
+    def bind(self, watch: Callable[[str], None], unwatch: Callable[[str], None]) -> None:
+        """Hook the monitoring loop's watch list (called once at startup)."""
+        self._watch, self._unwatch = watch, unwatch
+        for wallet in self._subs:
+            watch(wallet)
+
+    def connect(self) -> Subscription:
+        sub = Subscription(self)
+        self._connections.add(sub)
+        STREAM_SUBSCRIBERS.set(len(self._connections))
+        return sub
+
+    def subscribe(self, sub: Subscription, wallets: Iterable[str]) -> List[str]:
+        """Add wallets to `sub` (capped at STREAM_MAX_WALLETS_PER_CONNECTION). Returns the ones added."""
+        added = []
+        for wallet in map(normalize_wallet, wallets):
+            if not wallet or wallet in sub.wallets:
+                continue
+            if len(sub.wallets) >= settings.STREAM_MAX_WALLETS_PER_CONNECTION:
+                break
+            sub.wallets.add(wallet)
+            subs = self._subs.setdefault(wallet, set())
+            if not subs and self._watch is not None:
+                self._watch(wallet)
+            subs.add(sub)
+            added.append(wallet)
+            if wallet in self._last:
+                sub.offer(wallet, self._last[wallet])
+        return added
+
+    def unsubscribe(self, sub: Subscription, wallets: Iterable[str]) -> None:
+        for wallet in map(normalize_wallet, wallets):
+            sub.wallets.discard(wallet)
+            subs = self._subs.get(wallet)
+            if subs is None:
+                continue
+            subs.discard(sub)
+            if not subs:
+                del self._subs[wallet]
+                self._last.pop(wallet, None)
+                if self._unwatch is not None:
+                    self._unwatch(wallet)
+
+    def close(self, sub: Subscription) -> None:
+        if sub.closed:
+            return
+        sub.closed = True
+        self.unsubscribe(sub, list(sub.wallets))
+        self._connections.discard(sub)
+        STREAM_SUBSCRIBERS.set(len(self._connections))
+
+    def _changed(self, previous: Optional[dict], update: dict) -> bool:
+        if previous is None:
+            return True
+        if (previous["risk_class"], previous["action"]) != (update["risk_class"], update["action"]):
+            return True
+        return abs(previous["risk_probability"] - update["risk_probability"]) >= settings.STREAM_RISK_EPSILON
+
+    def publish(self, wallet: str, result: dict) -> bool:
+        """Push `result` to the wallet's subscribers if it differs from the last one."""
+        wallet = normalize_wallet(wallet)
+        if wallet not in self._subs:
+            return False
+        update = {"wallet": wallet, **{k: result.get(k) for k in UPDATE_FIELDS}, "ts": time.time()}
+        update["risk_probability"] = float(update["risk_probability"] or 0.0)
+        if not self._changed(self._last.get(wallet), update):
+            STREAM_UPDATES.inc(outcome="unchanged")
+            self.stats["unchanged"] += 1
+            return False
+        self._last[wallet] = update
+        self.stats["published"] += 1
+        for sub in self._subs[wallet]:
+            sub.offer(wallet, update)
+        return True
+
+    def snapshot(self) -> dict:
+        return {
+            **self.stats,
+            "connections": len(self._connections),
+            "wallets": len(self._subs),
+        }
+
+
+risk_hub = RiskHub()
@@ -0,0 +1,285 @@
+"""
+stress_test.py
+
+Vectorized Monte Carlo liquidation stress test.
+
+Each position is described by the same features risk_model.predict uses:
+- collateral_ratio (or leverage: ratio = 1 / (leverage - 1))
+- volatility over STATS_DEFAULT_HORIZON (the window price_stats and the
+  covariance engine measure it over) and market_trend, a 24h change
+- asset_price
+Missing features are filled by risk_model.enrich_features and the market
+cache, exactly as for /api/predict-risk.
+
+The collateral is simulated against stable debt, so the ratio moves with
+the price: CR_t = CR_0 * S_t / S_0, and the position is liquidated the
+first time CR_t <= 1, i.e. when the price falls to asset_price / CR_0.
+
+Shocks are drawn once per request and shared by every position that
+tracks the same asset (common random numbers). Standard normals give
+GBM. "bootstrap" resamples standardized historical log returns from
+price_stats, keeping their fat tails. A position with per-step drift m
+and per-step vol v is liquidated at step k when
+
+    m * k + v * W_k <= -log(CR_0)   <=>   W_k <= (-log(CR_0) - m * k) / v
+
+where W is the cumulative shock path. So each (position, path, step) is
+one comparison against a per-position threshold row. The barrier gets a
+continuity correction, so the result barely depends on the step count.
+Shocks are drawn in blocks of paths, and each block is compared against
+chunks of positions. Every intermediate array (shock block, cumulative
+walk, bootstrap indices, hit mask) stays within STRESS_CHUNK_ELEMENTS
+bytes, which bounds memory whatever the paths × steps × positions.
+"""
+
+import asyncio
+import itertools
+import math
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Union
+
+import numpy as np
+
+from ..config import settings
+from .market_cache import get_market_data, resolve_asset_id
+from .metrics import STAGE_SECONDS, timed
+from .price_stats import get_stats, parse_horizon
+from .features import FeatureLike, FeatureVector, to_array
+from .risk_model import enrich_features, is_debt_free
+
+MIN_BOOTSTRAP_RETURNS = 30
+BGK_BETA = 0.5826  # -zeta(1/2) / sqrt(2 pi)
+TREND_PERIOD_SECONDS = 86400.0  # market_trend is a 24h change
+METHODS = ("gbm", "bootstrap")
+
+
+def gbm_shocks(rng: np.random.Generator, paths: int, steps: int) -> np.ndarray:
+    return rng.standard_normal((paths, steps), dtype=np.float32)
+
+
+def standardized_returns(prices: Sequence[float]) -> Optional[np.ndarray]:
+    """
+    Historical log returns scaled to mean 0 / stdev 1 for bootstrapping, or
+    None when there is too little history (callers fall back to GBM).
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    prices = prices[prices > 0]
+    returns = np.diff(np.log(prices))
+    if len(returns) < MIN_BOOTSTRAP_RETURNS or returns.std() == 0:
+        return None
+    return ((returns - returns.mean()) / returns.std()).astype(np.float32)
+
+
+def block_paths(steps: int, chunk_elements: Optional[int] = None) -> int:
+    """
+    Paths per shock block. Blocks are float32 (4 bytes per value against
+    1 for the hit mask), so a block gets a quarter of STRESS_CHUNK_ELEMENTS
+    values and every array stays within that many bytes.
+    """
+    return max(1, (chunk_elements or settings.STRESS_CHUNK_ELEMENTS) // (4 * max(1, steps)))
+
+
+def shock_blocks(rng: np.random.Generator, paths: int, steps: int,
+                 returns: Optional[np.ndarray] = None,
+                 chunk_elements: Optional[int] = None) -> Iterator[np.ndarray]:
+    """
+    The (paths, steps) shock matrix, drawn block by block so it never exists
+    whole: standard normals (GBM), or `returns` resampled with replacement
+    (bootstrap).
+    """
+    block = block_paths(steps, chunk_elements)
+    for start in range(0, paths, block):
+        n = min(block, paths - start)
+        if returns is None:
+            yield gbm_shocks(rng, n, steps)
+        else:
+            yield returns[rng.integers(0, len(returns), size=(n, steps), dtype=np.int32)]
+
+
+def collateral_ratios(features: Union[Sequence[FeatureLike], np.ndarray]) -> np.ndarray:
+    """collateral_ratio per position, derived from leverage when missing (inf: no debt)."""
+    batch = features if isinstance(features, np.ndarray) else to_array(features)
+    cr = batch["collateral_ratio"].copy()
+    missing = np.isnan(cr)
+    if missing.any():
+        leverage = batch["leverage"][missing]
+        with np.errstate(divide="ignore"):
+            cr[missing] = np.where(leverage > 1.0, 1.0 / (leverage - 1.0), math.inf)
+    return cr
+
+
+def simulate(shocks: Union[np.ndarray, Iterable[np.ndarray]], collateral_ratio: np.ndarray,
+             volatility: np.ndarray, trend: np.ndarray, horizon: float, period: float,
+             trend_period: Optional[float] = None,
+             chunk_elements: Optional[int] = None) -> Dict[str, np.ndarray]:
+    """
+    Liquidation statistics for P positions driven by one set of shock
+    paths: a (paths, steps) matrix, or (n, steps) blocks of it (see
+    shock_blocks). Every block is applied to every position before the
+    next one is drawn, so positions still share the same paths.
+
+    volatility is per `period` seconds and trend per `trend_period`
+    (default: `period`); the simulation covers `horizon` seconds. Returns per-position arrays:
+    - probability:   share of paths liquidated within the horizon
+    - expected_time: mean seconds to liquidation over the liquidated
+                     paths (NaN when none were)
+    """
+    chunk_elements = chunk_elements or settings.STRESS_CHUNK_ELEMENTS
+    if isinstance(shocks, np.ndarray):
+        matrix, block = shocks, block_paths(shocks.shape[1], chunk_elements)
+        shocks = (matrix[i:i + block] for i in range(0, len(matrix), block))
+    blocks = iter(shocks)
+    first_block = next(blocks)
+    steps = first_block.shape[1]
+    step_seconds = horizon / steps
+    dt = step_seconds / period
+
+    cr = np.asarray(collateral_ratio, dtype=np.float64)
+    vol = np.abs(np.asarray(volatility, dtype=np.float64))
+    mu = np.log1p(np.clip(np.asarray(trend, dtype=np.float64), -0.99, None))
+    drift = mu * step_seconds / (trend_period or period) - 0.5 * vol ** 2 * dt
+    step_vol = vol * math.sqrt(dt)
+    with np.errstate(divide="ignore"):
+        # Broadie-Glasserman-Kou shift: checking the barrier only at step
+        # ends misses crossings in between, so move it up by 0.5826 * v
+        barrier = -np.log(cr) + BGK_BETA * step_vol
+
+    k = np.arange(1, steps + 1, dtype=np.float64)
+    liquidated = cr <= 1.0
+    todo = np.flatnonzero(~liquidated)
+    n_hit = np.zeros(len(cr), dtype=np.int64)
+    total_steps = np.zeros(len(cr), dtype=np.int64)
+    paths = 0
+
+    for shock in itertools.chain([first_block], blocks):
+        walk = np.cumsum(shock, axis=1, dtype=np.float32)       # (n, steps)
+        paths += len(walk)
+        # positions per chunk so the (p, n, steps) hit array stays within budget
+        chunk = max(1, chunk_elements // (len(walk) * steps))
+        for start in range(0, len(todo), chunk):
+            idx = todo[start:start + chunk]
+            gap = barrier[idx, None] - drift[idx, None] * k      # (p, steps)
+            v = step_vol[idx, None]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                threshold = np.where(v > 0, gap / np.where(v > 0, v, 1.0),
+                                     np.where(gap >= 0, np.inf, -np.inf)).astype(np.float32)
+
+            hit = walk[None, :, :] <= threshold[:, None, :]     # (p, n, steps)
+            first = hit.argmax(axis=2)
+            any_hit = np.take_along_axis(hit, first[..., None], axis=2)[..., 0]
+            n_hit[idx] += any_hit.sum(axis=1)
+            total_steps[idx] += np.where(any_hit, first + 1, 0).sum(axis=1)
+
+    probability = n_hit / max(1, paths)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        expected_time = np.where(n_hit > 0, total_steps / np.maximum(n_hit, 1) * step_seconds, np.nan)
+    probability[liquidated] = 1.0
+    expected_time[liquidated] = 0.0
+    return {"probability": probability, "expected_time": expected_time}
+
+
+def liquidation_prices(asset_price: Sequence[Optional[float]], collateral_ratio: np.ndarray) -> List[Optional[float]]:
+    """Price at which collateral_ratio crosses 1 (None without a price or without debt)."""
+    out: List[Optional[float]] = []
+    for price, cr in zip(asset_price, collateral_ratio):
+        if not price or not np.isfinite(cr) or cr <= 0:
+            out.append(None)
+        else:
+            out.append(float(price) / float(cr))
+    return out
+
+
+# --- request orchestration -------------------------------------------------------
+async def prepare_features(features_list: Sequence[FeatureLike],
+                           concurrency: int = 16) -> List[Union[FeatureVector, BaseException]]:
+    """
+    enrich_features + market data per position, as FeatureVectors (filled in
+    place); a position that cannot be scored becomes its exception.
+    """
+    sem = asyncio.Semaphore(max(1, concurrency))
+
+    async def one(features: FeatureLike) -> FeatureVector:
+        if not isinstance(features, FeatureVector):
+            features = FeatureVector.from_mapping(features)
+        async with sem:
+            merged = await enrich_features(features)
+        if not merged.get("asset_price") or merged.get("market_trend") is None:
+            price, trend = await get_market_data(merged.get("asset_symbol", "eth"))
+            merged.setdefault("asset_price", price)
+            merged.setdefault("market_trend", trend)
+        if is_debt_free(merged):
+            merged.collateral_ratio = math.inf  # no debt: never liquidated (not the capped ratio)
+        if merged.get("collateral_ratio") is None and merged.get("leverage") is None:
+            raise ValueError("collateral_ratio or leverage is required (or a user_wallet with a position)")
+        if merged.get("volatility") is None:
+            raise ValueError("volatility unavailable")
+        return merged
+
+    return list(await asyncio.gather(*(one(f) for f in features_list), return_exceptions=True))
+
+
+def _run_group(shocks: Iterable[np.ndarray], batch: np.ndarray, horizon: float,
+               use_trend: bool) -> Dict[str, np.ndarray]:
+    return simulate(
+        shocks,
+        collateral_ratios(batch),
+        batch["volatility"],
+        batch["market_trend"] if use_trend else np.zeros(len(batch)),
+        horizon=horizon,
+        period=parse_horizon(settings.STATS_DEFAULT_HORIZON),
+        trend_period=TREND_PERIOD_SECONDS,
+    )
+
+
+async def run_stress_test(features_list: Sequence[FeatureLike], horizon: str = "7d",
+                          paths: Optional[int] = None, steps: Optional[int] = None,
+                          method: str = "gbm", use_trend: bool = True,
+                          seed: Optional[int] = None) -> List[Union[Dict[str, Any], BaseException]]:
+    """
+    Stress-test every position; output order matches input order. Positions
+    on the same asset share one shock matrix, and each asset group is
+    simulated off the event loop.
+    """
+    if method not in METHODS:
+        raise ValueError(f"method must be one of {', '.join(METHODS)}")
+    horizon_s = parse_horizon(horizon)
+    paths = paths or settings.STRESS_DEFAULT_PATHS
+    steps = steps or settings.STRESS_DEFAULT_STEPS
+    rng = np.random.default_rng(seed)
+
+    with timed(STAGE_SECONDS, stage="stress_enrich"):
+        prepared = await prepare_features(features_list)
+    outcomes: List[Any] = list(prepared)
+
+    groups: Dict[str, List[int]] = {}
+    for i, f in enumerate(prepared):
+        if not isinstance(f, BaseException):
+            groups.setdefault(resolve_asset_id(f.get("asset_symbol", "eth")), []).append(i)
+
+    for asset_id, idx in groups.items():
+        returns = None
+        if method == "bootstrap":
+            stats = await get_stats(asset_id)
+            returns = standardized_returns([p for _, p in stats.points()])
+        used = "bootstrap" if returns is not None else "gbm"
+        # Drawn lazily, one path block at a time, inside the worker thread
+        shocks = shock_blocks(rng, paths, steps, returns)
+
+        group = [prepared[i] for i in idx]
+        batch = to_array(group)
+        with timed(STAGE_SECONDS, stage="stress_simulate"):
+            sim = await asyncio.to_thread(_run_group, shocks, batch, horizon_s, use_trend)
+        cr = collateral_ratios(batch)
+        prices = liquidation_prices([f.get("asset_price") for f in group], cr)
+        for j, (i, f) in enumerate(zip(idx, group)):
+            t = sim["expected_time"][j]
+            outcomes[i] = {
+                "liquidation_probability": round(float(sim["probability"][j]), 6),
+                "expected_time_to_liquidation_seconds": None if np.isnan(t) else round(float(t), 1),
+                "liquidation_price": None if prices[j] is None else round(prices[j], 6),
+                "collateral_ratio": float(cr[j]) if np.isfinite(cr[j]) else None,
+                "volatility": float(f.volatility),
+                "market_trend": float(f.market_trend),
+                "asset_price": f.get("asset_price"),
+                "shocks": used,
+            }
+    return outcomes
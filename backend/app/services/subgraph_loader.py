@@ -0,0 +1,186 @@
+"""
+subgraph_loader.py
+
+DataLoader-style batching for Aave subgraph lookups.
+
+Wallet lookups issued within SUBGRAPH_LOADER_WINDOW_MS of each other (up
+to SUBGRAPH_LOADER_MAX_KEYS) become ONE GraphQL query using `id_in` /
+`user_in` variables, paged with an `id_gt` cursor, and every caller's
+future is resolved from the combined result. Addresses are passed as
+variables, never interpolated into the query text.
+
+Inside `with loader_scope():` (one scheduler tick, one batch request)
+results are also memoised, so a wallet is fetched at most once per scope.
+"""
+
+import asyncio
+import contextlib
+import contextvars
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+from ..config import settings
+from .upstream import AAVE_V2_SUBGRAPH, AAVE_V3_SUBGRAPH, query_subgraph
+
+BatchFn = Callable[[List[str]], Awaitable[Dict[str, Any]]]
+
+USERS_QUERY = """
+query Users($ids: [String!]!, $first: Int!, $lastId: String!) {
+  users(first: $first, orderBy: id, orderDirection: asc,
+        where: {id_in: $ids, id_gt: $lastId}) {
+    id
+    totalCollateralETH
+    totalBorrowsETH
+  }
+}
+"""
+
+USER_RESERVES_QUERY = """
+query UserReserves($users: [String!]!, $first: Int!, $lastId: String!) {
+  userReserves(first: $first, orderBy: id, orderDirection: asc,
+               where: {user_in: $users, id_gt: $lastId}) {
+    id
+    user {
+      id
+    }
+    reserve {
+      symbol
+      decimals
+      liquidityRate
+    }
+    scaledATokenBalance
+    currentTotalDebt
+  }
+}
+"""
+
+_scope: contextvars.ContextVar[Optional[Dict[Tuple[str, str], asyncio.Future]]] = \
+    contextvars.ContextVar("subgraph_loader_scope", default=None)
+
+
+@contextlib.contextmanager
+def loader_scope():
+    """Memoise loads for the duration of the block (tasks spawned inside inherit it)."""
+    token = _scope.set({})
+    try:
+        yield
+    finally:
+        _scope.reset(token)
+
+
+async def paginate(url: str, query: str, field: str, variables: Dict[str, Any]) -> List[dict]:
+    """Fetch every row of `field`, following the id_gt cursor page by page."""
+    page_size = settings.SUBGRAPH_PAGE_SIZE
+    rows: List[dict] = []
+    last_id = ""
+    while True:
+        data = await query_subgraph(url, query, {**variables, "first": page_size, "lastId": last_id})
+        page = data.get(field) or []
+        rows.extend(page)
+        if len(page) < page_size:
+            return rows
+        last_id = page[-1]["id"]
+
+
+class BatchLoader:
+    def __init__(self, name: str, batch_fn: BatchFn, window: float, max_keys: int):
+        self.name = name
+        self.batch_fn = batch_fn
+        self.window = window
+        self.max_keys = max(1, max_keys)
+        self._queue: List[Tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # In-flight sends: the loop only keeps weak references to tasks
+        self._sending: Set[asyncio.Task] = set()
+        self.stats = {"loads": 0, "scope_hits": 0, "batches": 0, "keys_fetched": 0, "batch_failures": 0}
+
+    async def load(self, key: str) -> Any:
+        self.stats["loads"] += 1
+        cache = _scope.get()
+        if cache is not None and (self.name, key) in cache:
+            self.stats["scope_hits"] += 1
+            # shield: one caller timing out must not cancel the shared result
+            return await asyncio.shield(cache[(self.name, key)])
+
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        if cache is not None:
+            cache[(self.name, key)] = fut
+        self._queue.append((key, fut))
+        if len(self._queue) >= self.max_keys:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await asyncio.shield(fut)
+
+    async def load_many(self, keys: Sequence[str]) -> List[Any]:
+        return list(await asyncio.gather(*(self.load(k) for k in keys)))
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._queue = self._queue, []
+        if batch:
+            task = asyncio.ensure_future(self._send(batch))
+            self._sending.add(task)
+            task.add_done_callback(self._sending.discard)
+
+    async def _send(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        keys = list(dict.fromkeys(k for k, _ in batch))
+        try:
+            results = await self.batch_fn(keys)
+            self.stats["batches"] += 1
+            self.stats["keys_fetched"] += len(keys)
+        except Exception as e:
+            self.stats["batch_failures"] += 1
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+                    fut.exception()  # mark retrieved: waiters may have timed out already
+            return
+        for key, fut in batch:
+            if not fut.done():
+                fut.set_result(results.get(key))
+
+
+# --- Aave batch functions --------------------------------------------------------
+async def _users_batch(wallets: List[str]) -> Dict[str, List[dict]]:
+    rows = await paginate(AAVE_V2_SUBGRAPH, USERS_QUERY, "users", {"ids": wallets})
+    found = {r["id"].lower(): [r] for r in rows}
+    return {w: found.get(w, []) for w in wallets}
+
+
+async def _user_reserves_batch(wallets: List[str]) -> Dict[str, List[dict]]:
+    rows = await paginate(AAVE_V3_SUBGRAPH, USER_RESERVES_QUERY, "userReserves", {"users": wallets})
+    grouped: Dict[str, List[dict]] = {w: [] for w in wallets}
+    for r in rows:
+        owner = (r.get("user") or {}).get("id", "").lower()
+        if owner in grouped:
+            grouped[owner].append(r)
+    return grouped
+
+
+def _loader(name: str, batch_fn: BatchFn) -> BatchLoader:
+    return BatchLoader(
+        name, batch_fn,
+        window=settings.SUBGRAPH_LOADER_WINDOW_MS / 1000.0,
+        max_keys=settings.SUBGRAPH_LOADER_MAX_KEYS,
+    )
+
+
+aave_users = _loader("aave_v2_users", _users_batch)
+aave_user_reserves = _loader("aave_v3_user_reserves", _user_reserves_batch)
+
+
+async def load_aave_user(wallet: str) -> List[dict]:
+    """Aave v2 `users` rows for `wallet` ([] when it has no position)."""
+    return await aave_users.load(wallet.lower())
+
+
+async def load_user_reserves(wallet: str) -> List[dict]:
+    """Aave v3 `userReserves` rows for `wallet`."""
+    return await aave_user_reserves.load(wallet.lower())
+
+
+def loader_stats() -> Dict[str, Dict[str, int]]:
+    return {l.name: dict(l.stats) for l in (aave_users, aave_user_reserves)}
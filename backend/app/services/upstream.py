@@ -0,0 +1,155 @@
+"""
+upstream.py
+
+Async fetch layer shared by the wallet endpoints.
+
+All upstream calls go through the pooled session from http_client.py.
+fan_out() runs a set of named sources concurrently, each under its own
+deadline (and optionally hedged), and returns partial results plus
+per-source provenance instead of failing the whole request when one
+upstream is slow. Endpoint latency is bounded by the largest deadline,
+not by the sum of the calls. A fetch that can only serve an expired
+cached value returns it wrapped in Stale, and it is reported as "stale"
+rather than "live".
+"""
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+from ..config import settings
+from .http_client import get_session
+from .metrics import UPSTREAM_FALLBACK, upstream_call
+
+# Overridable so benchmarks can point at local stand-ins
+COINGECKO_BASE = settings.COINGECKO_BASE_URL.rstrip("/")
+AAVE_V2_SUBGRAPH = settings.AAVE_V2_SUBGRAPH_URL
+AAVE_V3_SUBGRAPH = settings.AAVE_V3_SUBGRAPH_URL
+
+
+def upstream_name(url: str) -> str:
+    """Short metrics label for an upstream URL (host for unknown ones)."""
+    if url.startswith(COINGECKO_BASE):
+        return "coingecko"
+    if url.startswith(AAVE_V2_SUBGRAPH):
+        return "aave_v2"
+    if url.startswith(AAVE_V3_SUBGRAPH):
+        return "aave_v3"
+    return urlsplit(url).netloc or "unknown"
+
+
+async def fetch_json(url: str, method: str = "GET", json: Optional[dict] = None) -> Any:
+    """GET/POST `url` on the shared session and decode the JSON body."""
+    session = await get_session()
+    with upstream_call(upstream_name(url)):
+        async with session.request(method, url, json=json) as resp:
+            resp.raise_for_status()
+            return await resp.json(content_type=None)
+
+
+async def query_subgraph(url: str, query: str, variables: Optional[dict] = None) -> dict:
+    """POST a GraphQL query and return its `data` object."""
+    body = {"query": query}
+    if variables:
+        body["variables"] = variables
+    payload = await fetch_json(url, method="POST", json=body)
+    if payload.get("errors"):
+        raise RuntimeError(f"subgraph error: {payload['errors']}")
+    return payload.get("data") or {}
+
+
+class Stale:
+    """A value served from an expired cache entry (provenance "stale")."""
+
+    __slots__ = ("value", "reason")
+
+    def __init__(self, value: Any, reason: str):
+        self.value = value
+        self.reason = reason
+
+
+class Source:
+    """
+    One upstream call in a fan-out.
+
+    fetch:       zero-arg coroutine factory (called again when hedging);
+                 it must raise rather than make a value up, and may return
+                 Stale(value, reason) for an expired cached value
+    deadline:    seconds before the fallback is used instead
+    fallback:    value returned on timeout or error
+    hedge_after: if set, fire a second identical call after this many
+                 seconds and keep whichever succeeds first
+    """
+
+    __slots__ = ("fetch", "deadline", "fallback", "hedge_after")
+
+    def __init__(
+        self,
+        fetch: Callable[[], Awaitable[Any]],
+        deadline: float,
+        fallback: Any = None,
+        hedge_after: Optional[float] = None,
+    ):
+        self.fetch = fetch
+        self.deadline = deadline
+        self.fallback = fallback
+        self.hedge_after = hedge_after
+
+
+async def _hedged(fetch: Callable[[], Awaitable[Any]], hedge_after: Optional[float]) -> Any:
+    if hedge_after is None:
+        return await fetch()
+
+    tasks = [asyncio.ensure_future(fetch())]
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+        if not done:
+            tasks.append(asyncio.ensure_future(fetch()))
+
+        pending = set(tasks)
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for t in done:
+                if t.exception() is None:
+                    return t.result()
+                error = t.exception()
+        raise error
+    finally:
+        for t in tasks:
+            if not t.done():
+                t.cancel()
+
+
+async def _resolve(name: str, source: Source) -> Tuple[Any, Dict[str, Any]]:
+    start = time.perf_counter()
+    try:
+        value = await asyncio.wait_for(_hedged(source.fetch, source.hedge_after), source.deadline)
+        if isinstance(value, Stale):
+            status = {"source": "stale", "reason": value.reason}
+            value = value.value
+        else:
+            status = {"source": "live"}
+    except asyncio.TimeoutError:
+        value = source.fallback
+        status = {"source": "fallback", "reason": f"deadline {source.deadline}s exceeded"}
+    except Exception as e:
+        value = source.fallback
+        status = {"source": "fallback", "reason": str(e) or type(e).__name__}
+    if status["source"] == "fallback":
+        UPSTREAM_FALLBACK.inc(source=name)
+    status["ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return value, status
+
+
+async def fan_out(sources: Dict[str, Source]) -> Tuple[Dict[str, Any], Dict[str, Dict[str, Any]]]:
+    """
+    Resolve every source concurrently.
+    Returns (values, provenance), both keyed by source name.
+    """
+    names = list(sources)
+    resolved = await asyncio.gather(*(_resolve(n, sources[n]) for n in names))
+    values = {n: r[0] for n, r in zip(names, resolved)}
+    provenance = {n: r[1] for n, r in zip(names, resolved)}
+    return values, provenance
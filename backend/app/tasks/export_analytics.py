@@ -0,0 +1,65 @@
+"""
+Incremental columnar export of prediction history (services/analytics_store.py).
+
+    python -m app.tasks.export_analytics export [--dir ./analytics] [--chunk-size 10000]
+    python -m app.tasks.export_analytics summary [--wallet 0x..] [--protocol Aave]
+    python -m app.tasks.export_analytics buckets --interval 1d [--by wallet|protocol]
+
+`export` appends only rows newer than the store's watermark (plus rows
+that committed late inside the overlap window), so it can be run from
+cron. The query commands map just the columns they need.
+"""
+
+import argparse
+import datetime
+import json
+
+from app.config import settings
+from app.services.analytics_store import AnalyticsStore
+from app.services.price_stats import parse_horizon
+
+
+def _dt(value):
+    return datetime.datetime.fromisoformat(value) if value else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Columnar prediction-history store")
+    parser.add_argument("--dir", default=settings.ANALYTICS_STORE_DIR)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_export = sub.add_parser("export", help="append rows newer than the watermark")
+    p_export.add_argument("--chunk-size", type=int, default=10000)
+
+    for name in ("summary", "buckets"):
+        p = sub.add_parser(name)
+        p.add_argument("--column", default="risk_probability")
+        p.add_argument("--wallet")
+        p.add_argument("--protocol")
+        p.add_argument("--since")
+        p.add_argument("--until")
+        if name == "buckets":
+            p.add_argument("--interval", default="1d")
+            p.add_argument("--by", choices=["wallet", "protocol", "none"], default="wallet")
+
+    args = parser.parse_args()
+    store = AnalyticsStore(args.dir)
+
+    if args.command == "export":
+        before = store.watermark
+        appended = store.export_incremental(args.chunk_size)
+        out = {"appended": appended, "rows": store.rows,
+               "watermark_before": before, "watermark": store.watermark}
+    elif args.command == "summary":
+        out = store.summary(args.column, wallet=args.wallet, protocol=args.protocol,
+                            since=_dt(args.since), until=_dt(args.until))
+    else:
+        out = store.bucketed(int(parse_horizon(args.interval)), args.column,
+                             by=None if args.by == "none" else args.by,
+                             wallet=args.wallet, protocol=args.protocol,
+                             since=_dt(args.since), until=_dt(args.until))
+    print(json.dumps(out, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,50 +1,302 @@
 """
-Simple scheduler script for periodic monitoring.
-This is a demo asyncio loop. For production use APScheduler or Celery.
+Scheduler for periodic multi-wallet monitoring.
+
+Each tick (SCHED_TICK_SECONDS) the scheduler:
+1. fetches market volatility/trend and builds the asset covariance
+   snapshot ONCE (shared by every wallet),
+2. pops the wallets that are due from a priority queue ordered by
+   (next due time, highest last risk first),
+3. fetches positions (batched subgraph queries, see subgraph_loader.py)
+   and runs predictions with bounded concurrency (SCHED_CONCURRENCY),
+4. re-schedules each wallet adaptively: wallets within SCHED_NEAR_BAND of
+   ALERT_THRESHOLD (or above it) are polled every SCHED_MIN_INTERVAL_SECONDS,
+   healthy wallets back off towards SCHED_INTERVAL_SECONDS.
+
+With LIQ_INDEX_ENABLED every scored position is also filed in the
+liquidation-price index (services/liquidation_index.py). At the start of a
+tick the latest price of each indexed asset is checked against it, and only
+the wallets whose collateral-ratio band boundary lies between the previous
+and the new price are pulled forward. Indexed healthy wallets can therefore
+back off to LIQ_INDEX_MAX_INTERVAL_SECONDS, and per-tick work follows the
+wallets a price move affects rather than the watch list size.
+
+Per-tick lag metrics are logged (and kept in `last_tick`, and exported via
+services/metrics.py) so it is visible when the interval cannot be met. For production use APScheduler or Celery.
+
+Results are handed to `on_result(wallet, result)` when set; with
+STREAM_ENABLED an API worker runs one scheduler in-process whose results
+feed the push stream (services/risk_stream.py). With `can_score` set, due wallets it rejects
+are skipped (sharded mode: only wallets whose lease this worker holds,
+see tasks/sharding.py).
 """
 
+import argparse
 import asyncio
+import heapq
 import logging
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
 from app.services.data_fetcher import fetch_aave_position, fetch_market_volatility, fetch_market_trend
 from app.services.risk_model import predict
+from app.services.features import FeatureVector
+from app.services.http_client import http_session
+from app.services.subgraph_loader import loader_scope
+from app.services.covariance import CovarianceSnapshot, refresh_snapshot
+from app.services.liquidation_index import LiquidationIndex, parse_bands
+from app.services.market_cache import get_price
+from app.services.metrics import SCHED_BACKLOG, SCHED_TICK_LAG, SCHED_TICK_SECONDS
 from app.config import settings
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("scheduler")
 
+
+def next_interval(risk: float, max_interval: Optional[float] = None) -> float:
+    """Poll interval (seconds) for a wallet whose last risk was `risk`."""
+    lo = settings.SCHED_MIN_INTERVAL_SECONDS
+    hi = max(lo, max_interval or settings.SCHED_INTERVAL_SECONDS)
+    band = max(settings.SCHED_NEAR_BAND, 1e-9)
+    gap = settings.ALERT_THRESHOLD - risk
+    if gap <= band:
+        return lo
+    # Linear back-off: full interval once the wallet is two bands away
+    frac = min(1.0, (gap - band) / band)
+    return lo + frac * (hi - lo)
+
+
+class WalletScheduler:
+    def __init__(self, wallets: Iterable[str] = (), concurrency: Optional[int] = None,
+                 on_result: Optional[Callable[[str, dict], Any]] = None,
+                 can_score: Optional[Callable[[str], bool]] = None):
+        self.concurrency = concurrency or settings.SCHED_CONCURRENCY
+        self.on_result = on_result
+        self.can_score = can_score
+        self.index = LiquidationIndex(parse_bands(settings.LIQ_INDEX_CR_BANDS)) \
+            if settings.LIQ_INDEX_ENABLED else None
+        # heap of (next_due, -last_risk, wallet); stale entries are skipped
+        self._heap: List[Tuple[float, float, str]] = []
+        self._due: Dict[str, float] = {}
+        self._risk: Dict[str, float] = {}
+        self._stop = asyncio.Event()
+        self.tick_count = 0
+        self.last_tick: Dict[str, float] = {}
+        for w in wallets:
+            self.add_wallet(w)
+
+    # --- watch list ---
+    def add_wallet(self, wallet: str, due: Optional[float] = None) -> None:
+        due = time.monotonic() if due is None else due
+        self._due[wallet] = due
+        heapq.heappush(self._heap, (due, -self._risk.get(wallet, 0.0), wallet))
+
+    def remove_wallet(self, wallet: str) -> None:
+        # lazy deletion: heap entry is dropped when popped
+        self._due.pop(wallet, None)
+        self._risk.pop(wallet, None)
+        if self.index is not None:
+            self.index.remove(wallet)
+
+    @property
+    def wallets(self) -> List[str]:
+        return list(self._due)
+
+    def _pop_due(self, now: float, limit: int) -> List[str]:
+        due = []
+        while self._heap and self._heap[0][0] <= now and (limit <= 0 or len(due) < limit):
+            at, _, wallet = heapq.heappop(self._heap)
+            if self._due.get(wallet) != at:
+                continue  # removed or re-scheduled since this entry was pushed
+            due.append(wallet)
+        return due
+
+    def _backlog(self, now: float) -> int:
+        # Walk only the heap's due prefix: a node's children are never due
+        # earlier than it, so subtrees past `now` are skipped entirely
+        heap, count, stack = self._heap, 0, [0] if self._heap else []
+        while stack:
+            i = stack.pop()
+            at, _, wallet = heap[i]
+            if at > now:
+                continue
+            if self._due.get(wallet) == at:
+                count += 1
+            stack.extend(c for c in (2 * i + 1, 2 * i + 2) if c < len(heap))
+        return count
+
+    def _interval(self, wallet: str, risk: float) -> float:
+        if self.index is not None and wallet in self.index:
+            return next_interval(risk, max(settings.SCHED_INTERVAL_SECONDS,
+                                           settings.LIQ_INDEX_MAX_INTERVAL_SECONDS))
+        return next_interval(risk)
+
+    async def _apply_price_moves(self, now: float) -> int:
+        """Make wallets whose band boundary the latest prices crossed due now."""
+        if self.index is None or not len(self.index):
+            return 0
+        assets = self.index.assets
+        prices = await asyncio.gather(*(get_price(a) for a in assets), return_exceptions=True)
+        moved = 0
+        for asset, price in zip(assets, prices):
+            if isinstance(price, BaseException) or not price:
+                continue
+            for wallet in self.index.on_price(asset, price):
+                if self._due.get(wallet, now) > now:
+                    self.add_wallet(wallet, now)
+                    moved += 1
+        return moved
+
+    # --- scoring ---
+    async def _score_wallet(self, wallet: str, vol: float, trend: float,
+                            snapshot: Optional[CovarianceSnapshot] = None) -> dict:
+        pos = await fetch_aave_position(wallet, snapshot)
+        if self.index is not None and wallet in self._due:
+            self.index.update(wallet, pos)
+        features = FeatureVector(
+            # portfolio volatility when the wallet's reserves could be valued
+            volatility=pos.get("volatility", vol),
+            collateral_ratio=pos.get("collateral_ratio"),
+            leverage=pos.get("leverage"),
+            asset_price=pos.get("asset_price"),
+            market_trend=trend,
+            protocol="Aave",
+            user_wallet=wallet,
+            collateral_usd=pos.get("collateral_usd"),
+            debt_usd=pos.get("debt_usd"),
+        )
+        return await predict(features)
+
+    async def run_tick(self, scheduled_at: Optional[float] = None) -> Dict[str, float]:
+        """Score every due wallet once. Returns this tick's metrics."""
+        started = time.monotonic()
+        scheduled_at = started if scheduled_at is None else scheduled_at
+        self.tick_count += 1
+
+        price_moved = await self._apply_price_moves(started)
+        due = self._pop_due(started, settings.SCHED_MAX_WALLETS_PER_TICK)
+        if self.can_score is not None:
+            allowed = [w for w in due if self.can_score(w)]
+            # Not ours right now (lease lapsed): look again next tick
+            for wallet in set(due).difference(allowed):
+                self.add_wallet(wallet, started + settings.SCHED_TICK_SECONDS)
+            due = allowed
+        alerts = errors = 0
+
+        if due:
+            # Market data + asset covariance once per tick, shared by every wallet
+            vol, trend, snapshot = await asyncio.gather(
+                fetch_market_volatility(), fetch_market_trend(), refresh_snapshot())
+            sem = asyncio.Semaphore(self.concurrency)
+
+            async def run_one(wallet: str):
+                async with sem:
+                    return await self._score_wallet(wallet, vol, trend, snapshot)
+
+            # Positions for the whole tick go out as batched subgraph queries,
+            # each wallet fetched at most once
+            with loader_scope():
+                results = await asyncio.gather(*(run_one(w) for w in due), return_exceptions=True)
+            now = time.monotonic()
+            for wallet, res in zip(due, results):
+                if wallet not in self._due:
+                    continue  # removed while being scored
+                if isinstance(res, BaseException):
+                    errors += 1
+                    logger.error("monitor error for %s: %s", wallet, res)
+                    risk = self._risk.get(wallet, 0.0)
+                else:
+                    risk = float(res.get("risk_probability", 0))
+                    logger.debug("User %s prediction: %s", wallet, res)
+                    # If above threshold, log/alert (alerting not implemented here)
+                    if risk >= settings.ALERT_THRESHOLD:
+                        alerts += 1
+                        logger.warning("ALERT: user %s risk >= %s : %s", wallet, settings.ALERT_THRESHOLD, res)
+                    if self.on_result is not None:
+                        try:
+                            self.on_result(wallet, res)
+                        except Exception as e:
+                            logger.error("on_result failed for %s: %s", wallet, e)
+                self._risk[wallet] = risk
+                self.add_wallet(wallet, now + self._interval(wallet, risk))
+
+        finished = time.monotonic()
+        self.last_tick = {
+            "tick": self.tick_count,
+            "lag_s": round(started - scheduled_at, 4),
+            "duration_s": round(finished - started, 4),
+            "scored": len(due),
+            "price_moved": price_moved,
+            "indexed": len(self.index) if self.index is not None else 0,
+            "errors": errors,
+            "alerts": alerts,
+            "backlog": self._backlog(finished),
+            "watched": len(self._due),
+        }
+        SCHED_TICK_LAG.observe(self.last_tick["lag_s"])
+        SCHED_TICK_SECONDS.observe(finished - started)
+        SCHED_BACKLOG.set(self.last_tick["backlog"])
+        if self.last_tick["backlog"] or self.last_tick["duration_s"] > settings.SCHED_TICK_SECONDS:
+            logger.warning("Tick cannot keep up with interval: %s", self.last_tick)
+        else:
+            logger.info("Tick metrics: %s", self.last_tick)
+        return self.last_tick
+
+    async def run_forever(self) -> None:
+        tick = settings.SCHED_TICK_SECONDS
+        next_at = time.monotonic()
+        while not self._stop.is_set():
+            try:
+                await self.run_tick(scheduled_at=next_at)
+            except Exception as e:
+                logger.exception("scheduler tick error: %s", e)
+            next_at += tick
+            # If a tick overran, skip missed slots instead of bursting
+            now = time.monotonic()
+            if next_at < now:
+                next_at = now
+            try:
+                await asyncio.wait_for(self._stop.wait(), next_at - now)
+            except asyncio.TimeoutError:
+                pass
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
 async def monitor_user(user_address: str):
-    while True:
-        try:
-            # fetch position and market data
-            pos_task = fetch_aave_position(user_address)
-            vol_task = fetch_market_volatility()
-            trend_task = fetch_market_trend()
-
-            pos, vol, trend = await asyncio.gather(pos_task, vol_task, trend_task)
-            features = {
-                "volatility": vol,
-                "collateral_ratio": pos.get("collateral_ratio"),
-                "leverage": pos.get("leverage"),
-                "asset_price": pos.get("asset_price"),
-                "market_trend": trend,
-                "protocol": "Aave",
-                "user_wallet": user_address
-            }
-
-            res = await predict(features)
-            logger.info("User %s prediction: %s", user_address, res)
-
-            # If above threshold, log/alert (alerting not implemented here)
-            if float(res.get("risk_probability", 0)) >= settings.ALERT_THRESHOLD:
-                logger.warning("ALERT: user %s risk >= %s : %s", user_address, settings.ALERT_THRESHOLD, res)
-
-        except Exception as e:
-            logger.exception("monitor_user error: %s", e)
-
-        await asyncio.sleep(settings.SCHED_INTERVAL_SECONDS)
+    """Watch a single wallet (kept for backwards compatibility)."""
+    await WalletScheduler([user_address]).run_forever()
+
+
+def _load_wallets(args) -> List[str]:
+    wallets = list(args.wallets)
+    if args.wallets_file:
+        with open(args.wallets_file) as fh:
+            wallets += [line.strip() for line in fh if line.strip() and not line.startswith("#")]
+    wallets += [w.strip() for w in settings.SCHED_WALLETS.split(",") if w.strip()]
+    return list(dict.fromkeys(wallets)) or ["0xExampleUserWallet"]
+
 
 if __name__ == "__main__":
-    # Example usage: python app/tasks/scheduler.py
-    # Replace with your watched wallet address(es)
-    user_wallet = "0xExampleUserWallet"
-    asyncio.run(monitor_user(user_wallet))
+    # Example usage: python -m app.tasks.scheduler 0xabc... 0xdef...
+    #            or: python -m app.tasks.scheduler --wallets-file wallets.txt
+    parser = argparse.ArgumentParser(description="Multi-wallet risk monitor")
+    parser.add_argument("wallets", nargs="*", help="wallet addresses to watch")
+    parser.add_argument("--wallets-file", help="file with one wallet address per line")
+    parser.add_argument("--shard", action="store_true",
+                        help="share the watch list with other --shard workers (DB leases)")
+    parser.add_argument("--worker-id", help="stable worker id in sharded mode (default: host:pid:random)")
+    cli_args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    async def main():
+        async with http_session():
+            if cli_args.shard:
+                from app.db import init_db
+                from app.tasks.sharding import ShardedMonitor
+
+                init_db()
+                await ShardedMonitor(_load_wallets(cli_args), worker_id=cli_args.worker_id).run_forever()
+            else:
+                await WalletScheduler(_load_wallets(cli_args)).run_forever()
+
+    asyncio.run(main())
@@ -0,0 +1,135 @@
+"""
+Sharded monitoring: several scheduler processes split the watch list.
+
+Every worker loads the same wallet list and, every SHARD_RENEW_SECONDS:
+1. heartbeats its row in monitor_workers and reads the live workers,
+2. maps each wallet to a worker with a consistent-hash ring
+   (SHARD_VNODES points per worker), so a join or a death only moves
+   about 1/N of the wallets,
+3. renews its wallet leases, releases the ones the ring now gives to
+   someone else, and acquires the newly assigned ones (services/leases.py),
+4. hands the wallets it holds to its WalletScheduler and drops the rest.
+
+A worker only scores a wallet while its own clock says the lease is
+valid (lease start + SHARD_LEASE_TTL_SECONDS). A worker that stops
+renewing (killed, partitioned, DB down) stops scoring before anyone else
+can take its leases over. A dead worker's wallets resume within
+TTL + one renew interval; on a join they move within one renew interval.
+
+    python -m app.tasks.scheduler --shard --wallets-file wallets.txt   # run N of these
+"""
+
+import asyncio
+import bisect
+import hashlib
+import logging
+import os
+import socket
+import time
+import uuid
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from app.config import settings
+from app.services.leases import LeaseStore
+from app.tasks.scheduler import WalletScheduler
+
+logger = logging.getLogger("scheduler.shard")
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    def __init__(self, workers: Iterable[str], vnodes: int):
+        points = sorted((_hash(f"{w}#{i}"), w) for w in workers for i in range(vnodes))
+        self._keys = [p for p, _ in points]
+        self._owners = [w for _, w in points]
+
+    def owner(self, key: str) -> Optional[str]:
+        if not self._keys:
+            return None
+        i = bisect.bisect(self._keys, _hash(key)) % len(self._keys)
+        return self._owners[i]
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+class ShardedMonitor:
+    def __init__(self, wallets: Iterable[str], worker_id: Optional[str] = None,
+                 store: Optional[LeaseStore] = None,
+                 on_result: Optional[Callable[[str, dict], None]] = None):
+        self.wallets = sorted(set(wallets))
+        self.worker_id = worker_id or default_worker_id()
+        self.store = store or LeaseStore(self.worker_id, settings.SHARD_LEASE_TTL_SECONDS)
+        self.scheduler = WalletScheduler(on_result=on_result, can_score=self.owns)
+        self._owned: Set[str] = set()
+        self._valid_until = 0.0
+        self._members: List[str] = []
+        self._desired: Set[str] = set()
+        self.stats: Dict[str, int] = {"syncs": 0, "sync_errors": 0, "rebalances": 0}
+
+    def owns(self, wallet: str) -> bool:
+        return wallet in self._owned and time.time() < self._valid_until
+
+    def _sync_leases(self) -> Set[str]:
+        """One lease round (blocking; runs in a worker thread)."""
+        started = time.time()
+        self.store.heartbeat(started)
+        members = self.store.live_workers(started)
+        if self.worker_id not in members:
+            members = sorted(members + [self.worker_id])
+        if members != self._members:
+            ring = HashRing(members, settings.SHARD_VNODES)
+            self._desired = {w for w in self.wallets if ring.owner(w) == self.worker_id}
+            if self._members:
+                self.stats["rebalances"] += 1
+            logger.info("shard %s: %d workers, %d of %d wallets assigned",
+                        self.worker_id, len(members), len(self._desired), len(self.wallets))
+            self._members = members
+
+        self.store.renew(started)
+        held = self.store.owned(started)
+        if held - self._desired:
+            self.store.release(held - self._desired)
+        if self._desired - held:
+            self.store.acquire(self._desired - held, started)
+        owned = self.store.owned(started)
+        # Leases were written as `started + ttl`; trust them until then, minus one renew of slack
+        self._valid_until = started + self.store.ttl - settings.SHARD_RENEW_SECONDS / 2
+        return owned
+
+    async def sync(self) -> None:
+        try:
+            owned = await asyncio.to_thread(self._sync_leases)
+        except Exception as e:
+            self.stats["sync_errors"] += 1
+            logger.error("shard %s: lease sync failed: %s", self.worker_id, e)
+            return
+        self.stats["syncs"] += 1
+        for wallet in owned - self._owned:
+            self.scheduler.add_wallet(wallet)
+        for wallet in self._owned - owned:
+            self.scheduler.remove_wallet(wallet)
+        self._owned = owned
+
+    async def _lease_loop(self) -> None:
+        while True:
+            await self.sync()
+            await asyncio.sleep(settings.SHARD_RENEW_SECONDS)
+
+    async def run_forever(self) -> None:
+        await asyncio.to_thread(self.store.register, self.wallets)
+        await self.sync()
+        leases = asyncio.create_task(self._lease_loop())
+        try:
+            await self.scheduler.run_forever()
+        finally:
+            leases.cancel()
+            await asyncio.gather(leases, return_exceptions=True)
+            await asyncio.to_thread(self.store.leave)
+
+    def stop(self) -> None:
+        self.scheduler.stop()
@@ -0,0 +1,158 @@
+"""
+Train / evaluate the distilled local risk model (services/local_model.py)
+from the input/output history in the `predictions` table.
+
+    python -m app.tasks.train_local_model train [--holdout 0.2] [--out PATH]
+    python -m app.tasks.train_local_model report [--model PATH] [--asi-sample 20]
+
+`report` prints JSON comparing the model with the stored ASI outputs
+(MAE, RMSE, risk-class agreement) and its scoring latency; with
+--asi-sample it also times live ASI calls for the same inputs.
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import statistics
+import time
+from typing import Tuple
+
+import numpy as np
+
+from app.config import settings
+from app.db import SessionLocal, Prediction
+from app.services.local_model import (
+    CLASS_BOUNDARIES,
+    FEATURES,
+    DistilledRiskModel,
+    labelled_rows,
+    train,
+)
+
+
+def load_dataset(limit: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """Stream (input, output) pairs in id order and keep ASI-labelled rows."""
+    db = SessionLocal()
+    try:
+        q = db.query(Prediction.input, Prediction.output).order_by(Prediction.id)
+        if limit:
+            q = q.limit(limit)
+        return labelled_rows(q.yield_per(1000))
+    finally:
+        db.close()
+
+
+def split(X: np.ndarray, y: np.ndarray, holdout: float):
+    """Chronological split: the newest `holdout` fraction is held out."""
+    cut = int(len(X) * (1 - holdout)) if holdout > 0 else len(X)
+    return (X[:cut], y[:cut]), (X[cut:], y[cut:])
+
+
+def _classes(scores: np.ndarray) -> np.ndarray:
+    return np.searchsorted(np.asarray(CLASS_BOUNDARIES), scores, side="right")
+
+
+def evaluate(model: DistilledRiskModel, X: np.ndarray, y: np.ndarray) -> dict:
+    if len(X) == 0:
+        return {"rows": 0}
+    pred = model.predict_matrix(X)
+    err = pred - y
+    alert = settings.ALERT_THRESHOLD
+    return {
+        "rows": int(len(X)),
+        "mae": round(float(np.mean(np.abs(err))), 3),
+        "rmse": round(float(np.sqrt(np.mean(err ** 2))), 3),
+        "class_agreement": round(float(np.mean(_classes(pred) == _classes(y))), 4),
+        "alert_agreement": round(float(np.mean((pred >= alert) == (y >= alert))), 4),
+    }
+
+
+def latency(model: DistilledRiskModel, X: np.ndarray, repeats: int = 200) -> dict:
+    row = {name: float(v) for name, v in zip(FEATURES, X[0])}
+    single = []
+    for _ in range(repeats):
+        t = time.perf_counter()
+        model.predict_one(row)
+        single.append(time.perf_counter() - t)
+
+    batch = np.repeat(X, max(1, 10000 // len(X)), axis=0)
+    t = time.perf_counter()
+    model.predict_matrix(batch)
+    per_item = (time.perf_counter() - t) / len(batch)
+    return {
+        "single_p50_us": round(statistics.median(single) * 1e6, 2),
+        "vectorized_per_item_us": round(per_item * 1e6, 3),
+        "vectorized_batch_size": int(len(batch)),
+    }
+
+
+async def asi_latency(X: np.ndarray, n: int) -> dict:
+    from app.services.asi_client import call_asi_model
+    from app.services.http_client import http_session
+    from app.services.risk_model import build_asi_payload
+
+    timings = []
+    async with http_session():
+        for x in X[:n]:
+            payload = build_asi_payload({name: float(v) for name, v in zip(FEATURES, x)})
+            t = time.perf_counter()
+            await call_asi_model(payload)
+            timings.append(time.perf_counter() - t)
+    return {"asi_calls": len(timings), "asi_p50_ms": round(statistics.median(timings) * 1e3, 2)}
+
+
+def cmd_train(args) -> None:
+    X, y = load_dataset(args.limit)
+    (X_tr, y_tr), (X_te, y_te) = split(X, y, args.holdout)
+    model = train(X_tr, y_tr, l2=args.l2)
+    model.meta.update({
+        "trained_at": datetime.datetime.utcnow().isoformat(),
+        "holdout": evaluate(model, X_te, y_te),
+    })
+    model.save(args.out)
+    print(json.dumps({"saved": args.out, **model.meta}, indent=2))
+
+
+def cmd_report(args) -> None:
+    model = DistilledRiskModel.load(args.model)
+    X, y = load_dataset(args.limit)
+    _, (X_te, y_te) = split(X, y, args.holdout)
+    if len(X_te) == 0:
+        raise SystemExit("no ASI-labelled rows to evaluate against")
+    report = {
+        "model": args.model,
+        "agreement": evaluate(model, X_te, y_te),
+        "latency": latency(model, X_te),
+    }
+    if args.asi_sample:
+        report["latency"].update(asyncio.run(asi_latency(X_te, args.asi_sample)))
+    print(json.dumps(report, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Distilled local risk model")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_train = sub.add_parser("train", help="fit the model and write it to --out")
+    p_train.add_argument("--out", default=settings.LOCAL_MODEL_PATH)
+    p_train.add_argument("--holdout", type=float, default=0.2)
+    p_train.add_argument("--l2", type=float, default=1e-3)
+    p_train.add_argument("--limit", type=int, default=0)
+    p_train.set_defaults(func=cmd_train)
+
+    p_report = sub.add_parser("report", help="compare the model against stored ASI outputs")
+    p_report.add_argument("--model", default=settings.LOCAL_MODEL_PATH)
+    p_report.add_argument("--holdout", type=float, default=0.2,
+                          help="evaluate on the newest fraction (0 = all rows)")
+    p_report.add_argument("--asi-sample", type=int, default=0,
+                          help="also time N live ASI calls")
+    p_report.add_argument("--limit", type=int, default=0)
+    p_report.set_defaults(func=cmd_report)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
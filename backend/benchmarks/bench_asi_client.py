@@ -0,0 +1,80 @@
+"""
+bench_asi_client.py
+
+Requests/sec of asi_client.call_asi_model against a local mock_asi.py,
+comparing a fresh ClientSession per call (old behaviour) with the shared
+pooled session from services/http_client.py.
+
+Usage (from backend/):
+    python -m benchmarks.bench_asi_client --requests 2000 --concurrency 50
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+import aiohttp
+
+from app.services import asi_client
+from app.services.http_client import http_session
+from benchmarks._mock_server import run_server
+
+PAYLOAD = {
+    "volatility": 0.5,
+    "collateral_ratio": 1.2,
+    "leverage": 2.0,
+    "asset_price": 2000,
+    "market_trend": 0.1,
+}
+
+
+async def _per_call_session(url: str) -> dict:
+    # Mirrors the pre-pool implementation: new session + connector per call
+    timeout = aiohttp.ClientTimeout(total=15)
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        async with session.post(url, json=PAYLOAD) as resp:
+            return await resp.json()
+
+
+async def _drive(fn, n: int, concurrency: int) -> float:
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with sem:
+            await fn()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(n)))
+    return n / (time.perf_counter() - start)
+
+
+async def run(url: str, n: int, concurrency: int) -> dict:
+    asi_client.ASI_ENDPOINTS[:] = [url]
+
+    before = await _drive(lambda: _per_call_session(url), n, concurrency)
+    async with http_session():
+        after = await _drive(lambda: asi_client.call_asi_model(PAYLOAD), n, concurrency)
+
+    return {
+        "requests": n,
+        "concurrency": concurrency,
+        "per_call_session_rps": round(before, 1),
+        "pooled_session_rps": round(after, 1),
+        "speedup": round(after / before, 2) if before else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    with run_server("mock_asi:app") as base:
+        report = asyncio.run(run(base + "/analyze", args.requests, args.concurrency))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
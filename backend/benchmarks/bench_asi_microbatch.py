@@ -0,0 +1,84 @@
+"""
+bench_asi_microbatch.py
+
+Throughput, latency and token usage of concurrent call_asi_model calls
+against the chat-completions stand-in in mock_asi.py, with and without
+the ASI:One micro-batcher.
+
+Usage (from backend/):
+    python -m benchmarks.bench_asi_microbatch --requests 500 --concurrency 64
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import urllib.request
+
+from app.config import settings
+from app.services import asi_client, asi_batcher, endpoint_health
+from app.services.http_client import http_session
+from benchmarks._mock_server import run_server
+
+PAYLOAD = {"inputs": {"volatility": 0.5, "collateral_ratio": 1.2, "leverage": 2.0,
+                      "asset_price": 2000, "market_trend": 0.1}}
+
+
+def _mock_stats(base: str) -> dict:
+    return json.loads(urllib.request.urlopen(base + "/stats").read())
+
+
+async def _drive(n: int, concurrency: int) -> dict:
+    sem = asyncio.Semaphore(concurrency)
+    latencies, sources = [], {}
+
+    async def one():
+        async with sem:
+            t = time.perf_counter()
+            res = await asi_client.call_asi_model(PAYLOAD)
+            latencies.append(time.perf_counter() - t)
+            sources[res["source"]] = sources.get(res["source"], 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(n)))
+    elapsed = time.perf_counter() - start
+    return {
+        "rps": round(n / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "sources": sources,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--latency-ms", default="80", help="injected upstream latency")
+    args = parser.parse_args()
+
+    report = {}
+    with run_server("mock_asi:app", env={"MOCK_LATENCY_MS": args.latency_ms}) as base:
+        asi_client.ASI_ENDPOINTS[:] = [base + "/v1/chat/completions"]
+
+        async def run_all():
+            async with http_session():
+                for enabled in (False, True):
+                    settings.ASI_MICROBATCH_ENABLED = enabled
+                    endpoint_health._health.clear()
+                    asi_batcher._batchers.clear()
+                    before = _mock_stats(base)
+                    res = await _drive(args.requests, args.concurrency)
+                    after = _mock_stats(base)
+                    res["upstream_requests"] = after["chat_requests"] - before["chat_requests"]
+                    res["total_tokens"] = (after["prompt_tokens"] + after["completion_tokens"]
+                                           - before["prompt_tokens"] - before["completion_tokens"])
+                    res["batcher"] = asi_batcher.batcher_stats()
+                    report["microbatch" if enabled else "per_item"] = res
+
+        asyncio.run(run_all())
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+bench_asi_routing.py
+
+Latency of call_asi_model across several local mock_asi.py instances
+with injected latency and failures:
+
+    dead  — nothing listening (connection refused)
+    slow  — 400ms ± 200ms
+    flaky — 20ms ± 30ms, 20% HTTP 503
+    fast  — 15ms ± 10ms
+
+Each scenario is run with a naive configuration (breaker effectively off,
+configured order, no hedging) and with breaker + EWMA routing + hedging.
+
+Usage (from backend/):
+    python -m benchmarks.bench_asi_routing --requests 300 --concurrency 10
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import statistics
+import time
+
+from app.config import settings
+from app.services import asi_client, endpoint_health
+from app.services.http_client import http_session
+from benchmarks._mock_server import free_port, run_server
+
+PAYLOAD = {"inputs": {"volatility": 0.5, "collateral_ratio": 1.2, "leverage": 2.0,
+                      "asset_price": 2000, "market_trend": 0.1}}
+
+MOCKS = {
+    "slow": {"MOCK_LATENCY_MS": "400", "MOCK_JITTER_MS": "200"},
+    "flaky": {"MOCK_LATENCY_MS": "20", "MOCK_JITTER_MS": "30", "MOCK_ERROR_RATE": "0.2"},
+    "fast": {"MOCK_LATENCY_MS": "15", "MOCK_JITTER_MS": "10"},
+}
+
+SCENARIOS = {
+    "dead_primary": ["dead", "fast"],
+    "slow_primary": ["slow", "fast"],
+    "flaky_then_slow": ["flaky", "slow"],
+}
+
+CONFIGS = {
+    "naive": {"ASI_BREAKER_FAILURES": 10 ** 9, "ASI_HEDGE_ENABLED": False},
+    "breaker_routing_hedge": {"ASI_BREAKER_FAILURES": 3, "ASI_HEDGE_ENABLED": True},
+}
+
+
+def _pct(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def _drive(endpoints, n, concurrency, naive):
+    asi_client.ASI_ENDPOINTS[:] = endpoints
+    endpoint_health._health.clear()
+    original = asi_client.rank_endpoints
+    if naive:
+        # configured order every time, no latency ranking
+        asi_client.rank_endpoints = lambda urls: [endpoint_health.health_for(u) for u in urls]
+    sem = asyncio.Semaphore(concurrency)
+    latencies, fallbacks = [], 0
+
+    async def one():
+        nonlocal fallbacks
+        async with sem:
+            t = time.perf_counter()
+            res = await asi_client.call_asi_model(PAYLOAD)
+            latencies.append(time.perf_counter() - t)
+            fallbacks += res.get("source") in ("local_fallback", "distilled_local")
+
+    try:
+        await asyncio.gather(*(one() for _ in range(n)))
+    finally:
+        asi_client.rank_endpoints = original
+    return {
+        "p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "p95_ms": round(_pct(latencies, 0.95) * 1000, 1),
+        "p99_ms": round(_pct(latencies, 0.99) * 1000, 1),
+        "fallback_rate": round(fallbacks / n, 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args()
+
+    settings.ASI_ATTEMPT_TIMEOUT_SECONDS = 2.0
+    settings.ASI_REQUEST_DEADLINE_SECONDS = 4.0
+    report = {}
+    with contextlib.ExitStack() as stack:
+        urls = {name: stack.enter_context(run_server("mock_asi:app", env=env)) + "/analyze"
+                for name, env in MOCKS.items()}
+        urls["dead"] = f"http://127.0.0.1:{free_port()}/analyze"
+
+        async def run_all():
+            async with http_session():
+                for scenario, names in SCENARIOS.items():
+                    report[scenario] = {}
+                    for cfg_name, cfg in CONFIGS.items():
+                        for k, v in cfg.items():
+                            setattr(settings, k, v)
+                        report[scenario][cfg_name] = await _drive(
+                            [urls[n] for n in names], args.requests, args.concurrency,
+                            naive=(cfg_name == "naive"))
+
+        asyncio.run(run_all())
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+bench_features.py
+
+Feature-record benchmark (services/features.py).
+
+Per-item overhead: the in-process work of one prediction with every
+feature supplied, with no network: building the input, enrich_features,
+the prediction-cache key, the ASI payload and the local fallback score.
+Three forms are compared:
+- dict:   RiskInput(...).dict() → merged dict copies (the HTTP path)
+- slots:  FeatureVector records, enriched in place
+- array:  FeatureVectors packed into one FEATURE_DTYPE batch, with keys
+          and scores computed once per batch (predict_batch)
+
+Peak memory: tracemalloc peak while holding --positions positions (five
+features + protocol) as dicts, as FeatureVectors, and as a structured
+array (features only; filled in chunks).
+
+    python -m benchmarks.bench_features --items 100000 --positions 1000000
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import random
+import time
+import tracemalloc
+
+import numpy as np
+
+from app.schemas import RiskInput
+from app.services.features import FEATURE_DTYPE, FeatureVector, to_array
+from app.services.prediction_cache import prediction_cache
+from app.services.risk_model import build_asi_payload, enrich_features, local_scores
+
+
+def _raw(rnd: random.Random, i: int, wallet: bool = True) -> dict:
+    raw = {
+        "volatility": rnd.uniform(0.1, 1.0),
+        "collateral_ratio": rnd.uniform(1.0, 3.0),
+        "leverage": rnd.uniform(1.0, 4.0),
+        "asset_price": rnd.uniform(100.0, 4000.0),
+        "market_trend": rnd.uniform(-0.2, 0.2),
+        "protocol": "Aave",
+    }
+    if wallet:
+        raw["user_wallet"] = f"0x{i:040x}"
+    return raw
+
+
+async def _per_item_dict(raws):
+    for raw in raws:
+        features = RiskInput(**raw).dict(exclude_none=True)
+        payload = await enrich_features(features)
+        prediction_cache.key(payload)
+        build_asi_payload(payload)
+        local_scores([payload])
+
+
+async def _per_item_slots(raws):
+    for raw in raws:
+        vec = FeatureVector(**raw)
+        payload = await enrich_features(vec)
+        prediction_cache.key(payload)
+        build_asi_payload(payload)
+        local_scores([payload])
+
+
+async def _per_item_array(raws):
+    vecs = [FeatureVector(**raw) for raw in raws]
+    for vec in vecs:
+        await enrich_features(vec)
+    batch = to_array(vecs)
+    prediction_cache.keys(batch, [v.protocol for v in vecs])
+    for vec in vecs:
+        build_asi_payload(vec)
+    local_scores(batch)
+
+
+def _time_us(fn, raws) -> float:
+    start = time.perf_counter()
+    asyncio.run(fn(raws))
+    return (time.perf_counter() - start) / len(raws) * 1e6
+
+
+def _array_batch(rnd: random.Random, n: int, chunk: int = 10000) -> np.ndarray:
+    """FEATURE_DTYPE batch filled chunk by chunk, so no per-position objects stay alive."""
+    batch = np.empty(n, dtype=FEATURE_DTYPE)
+    for start in range(0, n, chunk):
+        stop = min(n, start + chunk)
+        batch[start:stop] = to_array([_raw(rnd, i, wallet=False) for i in range(start, stop)])
+    return batch
+
+
+def _peak_mb(build) -> float:
+    gc.collect()
+    tracemalloc.start()
+    held = build()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del held
+    return peak / 2 ** 20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--items", type=int, default=100000, help="items for the per-item timing")
+    parser.add_argument("--positions", type=int, default=1000000, help="positions held for the memory peak")
+    parser.add_argument("--out", help="write the JSON report here (default: stdout)")
+    args = parser.parse_args()
+
+    rnd = random.Random(7)
+    raws = [_raw(rnd, i) for i in range(args.items)]
+    per_item = {
+        "dict": _time_us(_per_item_dict, raws),
+        "slots": _time_us(_per_item_slots, raws),
+        "array": _time_us(_per_item_array, raws),
+    }
+
+    n = args.positions
+    # Values are generated inside each build so the peak counts the floats too.
+    # Features + protocol only: a wallet string costs the same in every form.
+    memory = {
+        "dict": _peak_mb(lambda: [_raw(rnd, i, wallet=False) for i in range(n)]),
+        "slots": _peak_mb(lambda: [FeatureVector(**_raw(rnd, i, wallet=False)) for i in range(n)]),
+        "array": _peak_mb(lambda: _array_batch(rnd, n)),
+    }
+
+    report = {
+        "items": args.items,
+        "per_item_us": {k: round(v, 2) for k, v in per_item.items()},
+        "speedup_vs_dict": {k: round(per_item["dict"] / v, 2) for k, v in per_item.items()},
+        "positions": n,
+        "peak_mb": {k: round(v, 1) for k, v in memory.items()},
+        "bytes_per_position": {k: round(v * 2 ** 20 / n, 1) for k, v in memory.items()},
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as fh:
+            fh.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+bench_liq_index.py
+
+Liquidation-price index benchmark (services/liquidation_index.py).
+
+Indexes --wallets synthetic ETH-collateral / stablecoin-debt positions,
+then replays --ticks price moves (Gaussian, --tick-vol per tick) and
+reports per tick how many wallets the index selects for re-scoring and
+how long the lookup took, next to the watch-list size a full re-score
+would touch.
+
+    python -m benchmarks.bench_liq_index --wallets 100000 --ticks 1000
+"""
+
+import argparse
+import json
+import random
+import statistics
+import time
+
+from app.services.liquidation_index import LiquidationIndex, parse_bands
+
+DEFAULT_BANDS = "1.0,1.05,1.1,1.25,1.5,2.0"
+
+
+def _position(price: float, collateral_ratio: float, debt_usd: float) -> dict:
+    collateral_usd = debt_usd * collateral_ratio
+    return {
+        "collateral_usd": collateral_usd,
+        "debt_usd": debt_usd,
+        "price_driver": {"asset": "ethereum", "price": price,
+                         "collateral_usd": collateral_usd, "debt_usd": 0.0},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--wallets", type=int, default=100000)
+    parser.add_argument("--ticks", type=int, default=1000)
+    parser.add_argument("--tick-vol", type=float, default=0.002, help="stdev of one price move")
+    parser.add_argument("--bands", default=DEFAULT_BANDS)
+    parser.add_argument("--out", help="write the JSON report here (default: stdout)")
+    args = parser.parse_args()
+
+    rnd = random.Random(7)
+    price = 3000.0
+    index = LiquidationIndex(parse_bands(args.bands))
+    start = time.perf_counter()
+    for i in range(args.wallets):
+        index.update(f"0x{i:040x}", _position(price, rnd.uniform(1.02, 3.0), rnd.uniform(1e3, 1e6)))
+    build_s = time.perf_counter() - start
+
+    affected, lookup = [], []
+    index.on_price("ethereum", price)
+    for _ in range(args.ticks):
+        price *= 1 + rnd.gauss(0.0, args.tick_vol)
+        t = time.perf_counter()
+        affected.append(len(index.on_price("ethereum", price)))
+        lookup.append(time.perf_counter() - t)
+
+    report = {
+        "wallets": args.wallets,
+        "boundaries": index.snapshot()["boundaries"],
+        "build_ms": round(build_s * 1000, 1),
+        "ticks": args.ticks,
+        "affected_per_tick": {
+            "mean": round(statistics.mean(affected), 1),
+            "p95": sorted(affected)[int(0.95 * (len(affected) - 1))],
+            "max": max(affected),
+        },
+        "lookup_us_per_tick": round(statistics.mean(lookup) * 1e6, 1),
+        "rescored_fraction": round(statistics.mean(affected) / args.wallets, 5),
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as fh:
+            fh.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+bench_prediction_writer.py
+
+Insert throughput of the write-behind PredictionWriter at several batch
+sizes, plus the per-request cost of submit() compared with the old
+synchronous single-row commit. Runs against a throwaway SQLite file.
+
+Usage (from backend/):
+    python -m benchmarks.bench_prediction_writer --rows 20000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+
+_tmpdir = tempfile.mkdtemp(prefix="bench_writer_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir, 'bench.db')}"
+
+from app.db import SessionLocal, Prediction, init_db, prediction_row  # noqa: E402
+from app.services.prediction_writer import PredictionWriter  # noqa: E402
+
+FEATURES = {"volatility": 0.5, "collateral_ratio": 1.2, "leverage": 2.0,
+            "asset_price": 2000.0, "market_trend": 0.1, "protocol": "Aave",
+            "user_wallet": "0xbench"}
+RESULT = {"risk_probability": 42.0, "risk_class": "🟡 Medium Risk", "action": "hold"}
+
+
+def _sync_single_row_commit(n: int) -> dict:
+    latencies = []
+    for _ in range(n):
+        start = time.perf_counter()
+        db = SessionLocal()
+        db.add(Prediction(**prediction_row(FEATURES, RESULT)))
+        db.commit()
+        db.close()
+        latencies.append(time.perf_counter() - start)
+    return {
+        "rows_per_sec": round(n / sum(latencies), 1),
+        "p50_request_us": round(statistics.median(latencies) * 1e6, 1),
+    }
+
+
+async def _write_behind(n: int, batch_size: int) -> dict:
+    writer = PredictionWriter(batch_size=batch_size, flush_interval=0.05,
+                              max_buffer=max(10 * batch_size, 10000), policy="block")
+    writer.start()
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(n):
+        t = time.perf_counter()
+        await writer.submit([prediction_row(FEATURES, RESULT)])
+        latencies.append(time.perf_counter() - t)
+    await writer.stop()
+    elapsed = time.perf_counter() - start
+    return {
+        "batch_size": batch_size,
+        "rows_per_sec": round(n / elapsed, 1),
+        "p50_request_us": round(statistics.median(latencies) * 1e6, 1),
+        **writer.stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--sync-rows", type=int, default=1000)
+    parser.add_argument("--batch-sizes", default="1,10,100,1000")
+    args = parser.parse_args()
+
+    init_db()
+    report = {
+        "sync_single_row_commit": _sync_single_row_commit(args.sync_rows),
+        "write_behind": [
+            asyncio.run(_write_behind(args.rows, int(b)))
+            for b in args.batch_sizes.split(",")
+        ],
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
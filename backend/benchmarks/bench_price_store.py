@@ -0,0 +1,132 @@
+"""
+bench_price_store.py
+
+Local price history benchmark (services/price_store.py) on a fresh SQLite
+file.
+
+Backfills --days of --step-seconds points for --assets assets, then
+reports:
+- backfill time, and the cost of re-sending the same history (a no-op
+  below the high-water mark)
+- incremental appends of one live point each (raw row + bar updates)
+- range reads at raw / 1h / 1d resolution next to a full raw scan, and
+  the SQLite query plan of the raw range read (it must use the covering
+  index)
+
+    python -m benchmarks.bench_price_store --days 365 --step-seconds 60
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import create_engine, event, text
+
+from app.db import Base, PriceBar, PricePoint
+from app.services.price_store import PriceStore, parse_resolutions
+
+DAY = 86400.0
+
+
+def _series(rnd: random.Random, start: float, n: int, step: float, price: float):
+    out = []
+    for i in range(n):
+        price *= math.exp(rnd.gauss(0.0, 0.0008))
+        out.append((start + i * step, price))
+    return out
+
+
+def _timed(fn, *args, **kwargs):
+    t = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, (time.perf_counter() - t) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--days", type=float, default=365)
+    parser.add_argument("--step-seconds", type=float, default=60)
+    parser.add_argument("--assets", type=int, default=3)
+    parser.add_argument("--appends", type=int, default=500, help="single-point live appends")
+    parser.add_argument("--out", help="write the JSON report here (default: stdout)")
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(prefix="prices-"), "prices.db")
+    engine = create_engine(f"sqlite:///{path}")
+
+    @event.listens_for(engine, "connect")
+    def _pragmas(dbapi_conn, _record):
+        cur = dbapi_conn.cursor()
+        cur.execute("PRAGMA journal_mode=WAL")
+        cur.execute("PRAGMA synchronous=NORMAL")
+        cur.close()
+
+    Base.metadata.create_all(engine, tables=[PricePoint.__table__, PriceBar.__table__])
+    store = PriceStore(parse_resolutions("1h,1d"), raw_retention=None, engine=engine)
+
+    rnd = random.Random(7)
+    n = int(args.days * DAY / args.step_seconds)
+    now = time.time()
+    start = now - n * args.step_seconds
+    assets = [f"asset-{i}" for i in range(args.assets)]
+
+    backfill_ms = 0.0
+    for asset in assets:
+        history = _series(rnd, start, n, args.step_seconds, 3000.0)
+        _, ms = _timed(store.append, asset, history)
+        backfill_ms += ms
+    added, resend_ms = _timed(store.append, assets[-1], history[-10000:])
+
+    asset = assets[-1]
+    ts, price = history[-1]
+    append_ms = []
+    for _ in range(args.appends):
+        ts += args.step_seconds
+        price *= math.exp(rnd.gauss(0.0, 0.0008))
+        append_ms.append(_timed(store.append, asset, [(ts, price)])[1])
+
+    reads = {
+        "raw_7d": dict(since=ts - 7 * DAY, resolution="raw"),
+        "1h_30d": dict(since=ts - 30 * DAY, resolution="1h"),
+        "1d_all": dict(since=None, resolution="1d"),
+        "raw_all": dict(since=None, resolution="raw"),
+    }
+    read_report = {}
+    for name, q in reads.items():
+        rows, ms = _timed(store.series, asset, q["since"], None, q["resolution"])
+        read_report[name] = {"rows": len(rows), "ms": round(ms, 2)}
+
+    with engine.connect() as conn:
+        plan = conn.execute(text(
+            "EXPLAIN QUERY PLAN SELECT ts, price FROM price_points "
+            "WHERE asset = :a AND ts >= :s ORDER BY ts"), {"a": asset, "s": ts - 7 * DAY}).all()
+    raw_plan = " | ".join(str(row[-1]) for row in plan)
+
+    report = {
+        "assets": args.assets,
+        "points_per_asset": n,
+        "backfill_ms_per_asset": round(backfill_ms / args.assets, 1),
+        "resend_overlap": {"points": 10000, "added": added, "ms": round(resend_ms, 2)},
+        "append_ms": {
+            "mean": round(statistics.mean(append_ms), 3),
+            "p95": round(sorted(append_ms)[int(0.95 * (len(append_ms) - 1))], 3),
+        },
+        "reads": read_report,
+        "raw_range_plan": raw_plan,
+        "db_mb": round(os.path.getsize(path) / 2 ** 20, 1),
+    }
+    text_out = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as fh:
+            fh.write(text_out + "\n")
+    else:
+        print(text_out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+bench_startup.py
+
+Cold-start benchmark and import-time budget check.
+
+- import:  wall time of `import app.main` in a fresh interpreter (median of N)
+- heavy:   optional heavy modules (web3, ML runtimes) that must NOT be
+           imported at startup
+- ready:   spawn uvicorn and time until /health answers, with upstreams
+           served by the local stand-ins; also reports the per-step
+           warm-up timings from /health
+
+Exits 1 when a budget is exceeded or a heavy module is imported eagerly,
+so it can gate CI:
+    python -m benchmarks.bench_startup --import-budget-ms 1500 --ready-budget-ms 4000
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+from benchmarks._mock_server import BACKEND_DIR, free_port, run_server
+
+HEAVY_MODULES = ("web3", "eth_account", "torch", "tensorflow", "sklearn", "pandas", "pyarrow")
+
+_PROBE = """
+import sys, time, json
+t = time.perf_counter()
+import app.main
+elapsed = time.perf_counter() - t
+heavy = sorted(m for m in {heavy!r} if m in sys.modules)
+print(json.dumps({{"import_s": elapsed, "heavy": heavy, "modules": len(sys.modules)}}))
+"""
+
+
+def _measure_import(env: dict) -> dict:
+    out = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(heavy=HEAVY_MODULES)],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def _measure_ready(env: dict, timeout: float = 30.0) -> dict:
+    port = free_port()
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+         "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                body = urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1).read()
+                return {"ready_s": time.perf_counter() - start,
+                        "startup_steps": json.loads(body).get("startup_seconds", {})}
+            except Exception:
+                time.sleep(0.01)
+        raise RuntimeError("app did not become ready")
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--import-budget-ms", type=float, default=2000)
+    parser.add_argument("--ready-budget-ms", type=float, default=5000)
+    parser.add_argument("--out", help="write the JSON report here (default: stdout)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="startup-")
+    with run_server("mock_asi:app") as asi, run_server("benchmarks.standins:app") as upstream:
+        env = {
+            **os.environ,
+            "ASI_ENDPOINT": f"{asi}/analyze",
+            "COINGECKO_BASE_URL": f"{upstream}/api/v3",
+            "AAVE_V2_SUBGRAPH_URL": f"{upstream}/subgraphs/name/aave/protocol-v2",
+            "AAVE_V3_SUBGRAPH_URL": f"{upstream}/subgraphs/name/aave/protocol-v3",
+            "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'risk.db')}",
+        }
+        imports = [_measure_import(env) for _ in range(args.runs)]
+        readies = [_measure_ready(env) for _ in range(args.runs)]
+
+    report = {
+        "import_ms": round(statistics.median(r["import_s"] for r in imports) * 1000, 1),
+        "modules": imports[-1]["modules"],
+        "heavy_imported": imports[-1]["heavy"],
+        "ready_ms": round(statistics.median(r["ready_s"] for r in readies) * 1000, 1),
+        "startup_steps_s": readies[-1]["startup_steps"],
+        "budgets_ms": {"import": args.import_budget_ms, "ready": args.ready_budget_ms},
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as fh:
+            fh.write(text + "\n")
+    else:
+        print(text)
+
+    failures = []
+    if report["import_ms"] > args.import_budget_ms:
+        failures.append(f"import took {report['import_ms']}ms > {args.import_budget_ms}ms")
+    if report["ready_ms"] > args.ready_budget_ms:
+        failures.append(f"ready took {report['ready_ms']}ms > {args.ready_budget_ms}ms")
+    if report["heavy_imported"]:
+        failures.append(f"heavy modules imported at startup: {report['heavy_imported']}")
+    for line in failures:
+        print(f"[BUDGET] {line}", file=sys.stderr)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
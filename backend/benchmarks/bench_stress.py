@@ -0,0 +1,95 @@
+"""
+bench_stress.py
+
+Monte Carlo stress-test benchmark (services/stress_test.simulate).
+
+Times the simulation core for paths × positions × steps on synthetic
+positions, and checks the GBM liquidation probability of a driftless
+position against the closed-form continuous-barrier answer.
+
+Exits 1 when the run exceeds the budget or the accuracy check fails:
+    python -m benchmarks.bench_stress --paths 10000 --positions 1000 --budget-ms 5000
+"""
+
+import argparse
+import json
+import math
+import statistics
+import sys
+import time
+from statistics import NormalDist
+
+import numpy as np
+
+from app.services.stress_test import gbm_shocks, simulate
+
+WEEK = 7 * 86400.0
+
+
+def _closed_form(cr: float, vol: float) -> float:
+    """P(min of GBM with zero trend hits CR = 1 within one period)."""
+    b, m, n = -math.log(cr), -0.5 * vol ** 2, NormalDist()
+    return n.cdf((b - m) / vol) + math.exp(2 * m * b / vol ** 2) * n.cdf((b + m) / vol)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--paths", type=int, default=10000)
+    parser.add_argument("--positions", type=int, default=1000)
+    parser.add_argument("--steps", type=int, default=56)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--budget-ms", type=float, default=5000)
+    parser.add_argument("--tolerance", type=float, default=0.01, help="max |MC - closed form|")
+    parser.add_argument("--out", help="write the JSON report here (default: stdout)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(7)
+    cr = 1.05 + rng.random(args.positions)
+    vol = 0.05 + 0.3 * rng.random(args.positions)
+    trend = rng.normal(0.0, 0.03, args.positions)
+
+    timings = []
+    for _ in range(args.runs):
+        t = time.perf_counter()
+        shocks = gbm_shocks(rng, args.paths, args.steps)
+        simulate(shocks, cr, vol, trend, horizon=WEEK, period=WEEK)
+        timings.append(time.perf_counter() - t)
+
+    check_cr, check_vol = np.array([1.2, 1.5]), np.array([0.2, 0.3])
+    check = simulate(gbm_shocks(rng, args.paths, args.steps), check_cr, check_vol,
+                     np.zeros(2), horizon=WEEK, period=WEEK)["probability"]
+    expected = [_closed_form(c, v) for c, v in zip(check_cr, check_vol)]
+    error = max(abs(a - b) for a, b in zip(check, expected))
+
+    report = {
+        "paths": args.paths,
+        "positions": args.positions,
+        "steps": args.steps,
+        "simulate_ms": round(statistics.median(timings) * 1000, 1),
+        "accuracy": {
+            "monte_carlo": [round(float(p), 4) for p in check],
+            "closed_form": [round(p, 4) for p in expected],
+            "max_abs_error": round(error, 4),
+        },
+        "budget_ms": args.budget_ms,
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as fh:
+            fh.write(text + "\n")
+    else:
+        print(text)
+
+    failures = []
+    if report["simulate_ms"] > args.budget_ms:
+        failures.append(f"simulate took {report['simulate_ms']}ms > {args.budget_ms}ms")
+    if error > args.tolerance:
+        failures.append(f"liquidation probability off by {error:.4f} > {args.tolerance}")
+    for line in failures:
+        print(f"[BUDGET] {line}", file=sys.stderr)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
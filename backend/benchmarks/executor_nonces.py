@@ -0,0 +1,234 @@
+"""
+executor_nonces.py
+
+Nonce allocation check for the burst executor (services/executor.py)
+against an in-process fake node that answers JSON-RPC batches.
+
+The fake node keeps one account: it accepts a raw tx only at a nonce it
+has not seen and not below its mined count, and reports
+eth_getTransactionCount(pending) as the end of the contiguous run of
+accepted nonces (gapped txs sit in the queue, as on geth). Scenarios:
+
+- burst:         --txs concurrent send() calls plus one send_many
+- failed_burst:  the eth_sendRawTransaction request fails (connection
+                 error); the next tx must get the node's pending count
+- lost_response: the node accepts the burst but the HTTP response is
+                 lost; the next tx must not reuse an accepted nonce
+- rejected_hole: the node refuses one tx in the middle of a burst; the
+                 next tx must fill that hole
+- overlap_reset: a resync is requested while another burst's nonces are
+                 reserved but unsent; no nonce may be handed out twice
+
+The run fails (exit 1) when a nonce is issued twice, the node is left
+with a gap, or a follow-up tx is not placed at the node's pending count.
+
+    python -m benchmarks.executor_nonces --txs 120
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import sys
+
+from app.services.executor import Executor
+from app.services.jsonrpc import RpcError
+
+SENDER = "0x" + "ab" * 20
+
+
+def _sign(tx: dict) -> str:
+    return "0x" + json.dumps({"nonce": tx["nonce"], "data": tx["data"]}).encode().hex()
+
+
+def _decode(raw: str) -> dict:
+    return json.loads(bytes.fromhex(raw[2:]))
+
+
+class FakeNode:
+    """JSON-RPC batch transport with one account and failure injection."""
+
+    def __init__(self, send_delay: float = 0.0):
+        self.accepted = {}  # nonce -> tx hash
+        self.send_delay = send_delay
+        self.fail_next_send = False    # raise before accepting anything
+        self.lose_next_reply = False   # accept, then raise
+        self.reject_data = set()       # tx data refused with an RPC error
+        self.send_requests = 0
+        self._hashes = itertools.count(1)
+
+    @property
+    def pending_count(self) -> int:
+        n = 0
+        while n in self.accepted:
+            n += 1
+        return n
+
+    async def call(self, method, params=()):
+        result = (await self.batch([(method, params)]))[0]
+        if isinstance(result, RpcError):
+            raise result
+        return result
+
+    async def batch(self, calls):
+        sends = [c for c in calls if c[0] == "eth_sendRawTransaction"]
+        if sends:
+            self.send_requests += 1
+            await asyncio.sleep(self.send_delay)
+            if self.fail_next_send:
+                self.fail_next_send = False
+                raise ConnectionError("502 Bad Gateway")
+        out = [self._one(method, list(params)) for method, params in calls]
+        if sends and self.lose_next_reply:
+            self.lose_next_reply = False
+            raise ConnectionError("connection reset after the node accepted the batch")
+        return out
+
+    def _one(self, method, params):
+        if method == "eth_getBlockByNumber":
+            return {"baseFeePerGas": hex(10 ** 9)}
+        if method == "eth_maxPriorityFeePerGas":
+            return hex(10 ** 9)
+        if method == "eth_gasPrice":
+            return hex(2 * 10 ** 9)
+        if method == "eth_chainId":
+            return "0x1"
+        if method == "eth_estimateGas":
+            return hex(21000)
+        if method == "eth_getTransactionCount":
+            return hex(self.pending_count)
+        if method == "eth_sendRawTransaction":
+            tx = _decode(params[0])
+            nonce = tx["nonce"]
+            if tx["data"] in self.reject_data:
+                return RpcError(method, {"message": "insufficient funds for gas * price + value"})
+            if nonce in self.accepted:
+                return RpcError(method, {"message": "already known"})
+            self.accepted[nonce] = f"0x{next(self._hashes):064x}"
+            return self.accepted[nonce]
+        return RpcError(method, {"message": f"unsupported {method}"})
+
+
+def _tx(tag: str) -> dict:
+    return {"to": "0x" + "cd" * 20, "data": "0x" + tag.encode().hex(), "value": 0}
+
+
+def _new(node: FakeNode) -> Executor:
+    return Executor(node, signer=_sign, address=SENDER, chain_id=1)
+
+
+async def _burst(n: int) -> dict:
+    node = FakeNode(send_delay=0.001)
+    ex = _new(node)
+    singles = await asyncio.gather(*(ex.send(_tx(f"s{i}")) for i in range(n)))
+    many = await ex.send_many([_tx(f"m{i}") for i in range(n)], wait=False)
+    nonces = [r["nonce"] for r in singles + many]
+    return {
+        "txs": len(nonces),
+        "distinct": len(set(nonces)) == len(nonces),
+        "gap_free": sorted(nonces) == list(range(len(nonces))),
+        "node_pending": node.pending_count,
+        "ok": sorted(nonces) == list(range(len(nonces))) and node.pending_count == len(nonces),
+    }
+
+
+async def _failed_burst() -> dict:
+    node = FakeNode()
+    ex = _new(node)
+    await ex.send_many([_tx(f"a{i}") for i in range(5)], wait=False)
+    node.fail_next_send = True
+    failed = await ex.send_many([_tx(f"b{i}") for i in range(3)], wait=False)
+    nxt = await ex.send(_tx("c"))
+    return {
+        "burst_failed": all(r["status"] == "failed" for r in failed),
+        "next_nonce": nxt["nonce"],
+        "node_pending_before": 5,
+        "ok": all(r["status"] == "failed" for r in failed) and nxt["nonce"] == 5 and nxt["tx_hash"] is not None,
+    }
+
+
+async def _lost_response() -> dict:
+    node = FakeNode()
+    ex = _new(node)
+    node.lose_next_reply = True
+    lost = await ex.send_many([_tx(f"a{i}") for i in range(4)], wait=False)
+    nxt = await ex.send(_tx("b"))
+    return {
+        "reported_failed": all(r["status"] == "failed" for r in lost),
+        "node_accepted": len(node.accepted),
+        "next_nonce": nxt["nonce"],
+        "next_error": nxt["error"],
+        "ok": nxt["nonce"] == 4 and nxt["error"] is None,
+    }
+
+
+async def _rejected_hole() -> dict:
+    node = FakeNode()
+    ex = _new(node)
+    node.reject_data.add(_tx("a2")["data"])
+    burst = await ex.send_many([_tx(f"a{i}") for i in range(5)], wait=False)
+    node.reject_data.clear()
+    nxt = await ex.send(_tx("b"))
+    after = await ex.send(_tx("c"))
+    return {
+        "rejected_nonce": burst[2]["nonce"],
+        "next_nonce": nxt["nonce"],
+        "then": after["nonce"],
+        "node_pending": node.pending_count,
+        "ok": nxt["nonce"] == burst[2]["nonce"] and after["nonce"] == 5 and node.pending_count == 6,
+    }
+
+
+async def _overlap_reset() -> dict:
+    node = FakeNode(send_delay=0.05)
+    ex = _new(node)
+    slow = asyncio.ensure_future(ex.send_many([_tx(f"a{i}") for i in range(10)], wait=False))
+    await asyncio.sleep(0.01)  # slow burst has its nonces, its send is in flight
+    ex.nonces.reset(SENDER)
+    second = await ex.send_many([_tx(f"b{i}") for i in range(10)], wait=False)
+    first = await slow
+    nonces = [r["nonce"] for r in first + second]
+    errors = [r["error"] for r in first + second if r["error"]]
+    nxt = await ex.send(_tx("c"))  # nothing in flight now: the resync runs
+    return {
+        "distinct": len(set(nonces)) == len(nonces),
+        "errors": errors,
+        "next_nonce": nxt["nonce"],
+        "node_pending": node.pending_count,
+        "ok": len(set(nonces)) == 20 and not errors and nxt["nonce"] == 20 and node.pending_count == 21,
+    }
+
+
+async def run(txs: int) -> dict:
+    return {
+        "burst": await _burst(txs),
+        "failed_burst": await _failed_burst(),
+        "lost_response": await _lost_response(),
+        "rejected_hole": await _rejected_hole(),
+        "overlap_reset": await _overlap_reset(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--txs", type=int, default=120, help="concurrent txs in the burst scenario")
+    parser.add_argument("--out", help="write the JSON report here (default: stdout)")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args.txs))
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as fh:
+            fh.write(text + "\n")
+    else:
+        print(text)
+
+    failures = [name for name, r in report.items() if not r["ok"]]
+    for name in failures:
+        print(f"[NONCES] {name} failed", file=sys.stderr)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+"""
+load_test.py
+
+Offline load test for the API and the scheduler. Everything the app talks
+to is served locally:
+- mock_asi.py            → ASI model
+- benchmarks/standins.py → CoinGecko + Aave v2/v3 subgraphs
+
+Each scenario is driven at every requested concurrency level and reports
+throughput and p50/p95/p99 latency as JSON, so runs can be diffed:
+
+    python -m benchmarks.load_test --out baseline.json
+    python -m benchmarks.load_test --compare baseline.json   # exit 1 on regression
+
+Upstream behaviour is set with --latency-ms / --jitter-ms / --error-rate
+(forwarded to the stand-ins as MOCK_* env knobs).
+
+The "stream" scenario opens --subscribers SSE connections to
+/api/risk-stream spread over --wallets wallets (a --slow-fraction of them
+read slowly) and reports time to first update; latency is not per request.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+import aiohttp
+
+from benchmarks._mock_server import run_server
+
+SCENARIOS = ("predict", "wallet", "live", "scheduler", "stream")
+
+
+def _percentile(sorted_values, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, max(0, round(q * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+def _summary(latencies, errors: int, elapsed: float) -> dict:
+    lat = sorted(latencies)
+    return {
+        "requests": len(lat) + errors,
+        "errors": errors,
+        "rps": round((len(lat) + errors) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(_percentile(lat, 0.50) * 1000, 2),
+        "p95_ms": round(_percentile(lat, 0.95) * 1000, 2),
+        "p99_ms": round(_percentile(lat, 0.99) * 1000, 2),
+    }
+
+
+def _wallet(i: int) -> str:
+    return "0x" + f"{i:040x}"
+
+
+def _request_factory(scenario: str, base: str):
+    """Return fn(session, i) -> awaitable response for one request."""
+    if scenario == "predict":
+        def make(session, i):
+            # random features so the prediction cache does not hide the ASI path
+            body = {
+                "volatility": random.uniform(0.05, 1.0),
+                "collateral_ratio": random.uniform(0.8, 3.0),
+                "leverage": random.uniform(1.0, 5.0),
+                "asset_price": random.uniform(1000, 4000),
+                "market_trend": random.uniform(-0.3, 0.3),
+                "user_wallet": _wallet(i),
+            }
+            return session.post(f"{base}/api/predict-risk", json=body)
+    elif scenario == "wallet":
+        def make(session, i):
+            return session.post(f"{base}/api/wallet-risk", json={"wallet_address": _wallet(i)})
+    elif scenario == "live":
+        def make(session, i):
+            return session.get(f"{base}/api/live-wallet", params={"wallet": _wallet(i)})
+    else:
+        raise ValueError(scenario)
+    return make
+
+
+async def _drive_http(base: str, scenario: str, requests: int, concurrency: int) -> dict:
+    make = _request_factory(scenario, base)
+    sem = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+    connector = aiohttp.TCPConnector(limit=concurrency)
+
+    async with aiohttp.ClientSession(connector=connector) as session:
+        async def one(i: int):
+            nonlocal errors
+            async with sem:
+                t = time.perf_counter()
+                try:
+                    async with make(session, i) as resp:
+                        await resp.read()
+                        ok = resp.status == 200
+                except aiohttp.ClientError:
+                    ok = False
+                if ok:
+                    latencies.append(time.perf_counter() - t)
+                else:
+                    errors += 1
+
+        # warm-up: connection pool, price/stats caches
+        await asyncio.gather(*(one(i) for i in range(min(concurrency, 8))))
+        latencies.clear()
+        errors = 0
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(requests)))
+        elapsed = time.perf_counter() - start
+    return _summary(latencies, errors, elapsed)
+
+
+async def _drive_scheduler(wallets: int, concurrency: int, ticks: int) -> dict:
+    """Score `wallets` wallets per tick in-process; latency is per tick."""
+    from app.services.http_client import http_session
+    from app.tasks.scheduler import WalletScheduler
+
+    durations, errors = [], 0
+    async with http_session():
+        sched = WalletScheduler(concurrency=concurrency)
+        start = time.perf_counter()
+        for _ in range(ticks):
+            for i in range(wallets):
+                sched.add_wallet(_wallet(i), due=0.0)
+            metrics = await sched.run_tick()
+            durations.append(metrics["duration_s"])
+            errors += metrics["errors"]
+        elapsed = time.perf_counter() - start
+
+    summary = _summary(durations, 0, elapsed)
+    summary.update({
+        "requests": wallets * ticks,
+        "errors": errors,
+        "rps": round(wallets * ticks / elapsed, 1) if elapsed else 0.0,
+        "ticks": ticks,
+    })
+    return summary
+
+
+async def _drive_stream(base: str, subscribers: int, wallets: int, seconds: float,
+                        slow_fraction: float) -> dict:
+    """Hold `subscribers` SSE connections open for `seconds`; latency is time to first update."""
+    first_update, updates = [], [0]
+    failed = 0
+    slow_every = int(1 / slow_fraction) if slow_fraction > 0 else 0
+    connector = aiohttp.TCPConnector(limit=0)
+    timeout = aiohttp.ClientTimeout(total=None, sock_read=None)
+
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        async def one(i: int):
+            nonlocal failed
+            slow = slow_every and i % slow_every == 0
+            t = time.perf_counter()
+            got_first = False
+            try:
+                async with session.get(f"{base}/api/risk-stream",
+                                       params={"wallets": _wallet(i % wallets)}) as resp:
+                    if resp.status != 200:
+                        failed += 1
+                        return
+                    async for line in resp.content:
+                        if not line.startswith(b"data:"):
+                            continue
+                        updates[0] += len(json.loads(line[5:]))
+                        if not got_first:
+                            got_first = True
+                            first_update.append(time.perf_counter() - t)
+                        if slow:
+                            await asyncio.sleep(1.0)  # a client that cannot keep up
+            except aiohttp.ClientError:
+                failed += 1
+
+        tasks = [asyncio.ensure_future(one(i)) for i in range(subscribers)]
+        start = time.perf_counter()
+        await asyncio.sleep(seconds)
+        async with session.get(f"{base}/api/risk-stream/stats") as resp:
+            hub = await resp.json()
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        elapsed = time.perf_counter() - start
+
+    summary = _summary(first_update, 0, elapsed)
+    summary.update({
+        "requests": subscribers,
+        "errors": failed + (subscribers - failed - len(first_update)),  # no update at all
+        "rps": round(updates[0] / elapsed, 1) if elapsed else 0.0,   # updates delivered per second
+        "updates": updates[0],
+        "hub": hub,
+    })
+    return summary
+
+
+def _compare(report: dict, baseline: dict, tolerance: float) -> list:
+    """List of human-readable regressions versus `baseline`."""
+    regressions = []
+    for scenario, levels in report["results"].items():
+        for level, cur in levels.items():
+            old = baseline.get("results", {}).get(scenario, {}).get(level)
+            if not old:
+                continue
+            if old["p95_ms"] and cur["p95_ms"] > old["p95_ms"] * (1 + tolerance):
+                regressions.append(f"{scenario}@{level}: p95 {old['p95_ms']}ms -> {cur['p95_ms']}ms")
+            if old["rps"] and cur["rps"] < old["rps"] * (1 - tolerance):
+                regressions.append(f"{scenario}@{level}: rps {old['rps']} -> {cur['rps']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--concurrency", default="1,16,64", help="comma-separated levels")
+    parser.add_argument("--requests", type=int, default=500, help="requests per level")
+    parser.add_argument("--wallets", type=int, default=200, help="scheduler wallets per tick")
+    parser.add_argument("--ticks", type=int, default=5, help="scheduler ticks per level")
+    parser.add_argument("--subscribers", type=int, default=2000, help="stream subscribers")
+    parser.add_argument("--stream-seconds", type=float, default=10.0)
+    parser.add_argument("--slow-fraction", type=float, default=0.1, help="share of slow stream readers")
+    parser.add_argument("--latency-ms", default="20")
+    parser.add_argument("--jitter-ms", default="10")
+    parser.add_argument("--error-rate", default="0")
+    parser.add_argument("--pred-cache", action="store_true",
+                        help="keep the prediction cache on (off by default so the ASI path is measured)")
+    parser.add_argument("--out", help="write the JSON report here (default: stdout)")
+    parser.add_argument("--compare", help="baseline JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed regression fraction")
+    args = parser.parse_args()
+
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    knobs = {"MOCK_LATENCY_MS": args.latency_ms, "MOCK_JITTER_MS": args.jitter_ms,
+             "MOCK_ERROR_RATE": args.error_rate}
+    workdir = tempfile.mkdtemp(prefix="loadtest-")
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "requests_per_level": args.requests,
+            "upstream": knobs,
+            "pred_cache": args.pred_cache,
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": {},
+    }
+
+    with run_server("mock_asi:app", env=knobs) as asi, \
+            run_server("benchmarks.standins:app", env=knobs) as upstream:
+        app_env = {
+            "ASI_ENDPOINT": f"{asi}/analyze",
+            "COINGECKO_BASE_URL": f"{upstream}/api/v3",
+            "AAVE_V2_SUBGRAPH_URL": f"{upstream}/subgraphs/name/aave/protocol-v2",
+            "AAVE_V3_SUBGRAPH_URL": f"{upstream}/subgraphs/name/aave/protocol-v3",
+            "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'risk.db')}",
+            "LOCAL_MODEL_PATH": os.path.join(workdir, "no-model.json"),
+            "ANALYTICS_STORE_DIR": os.path.join(workdir, "analytics"),
+            "PRED_CACHE_ENABLED": "true" if args.pred_cache else "false",
+        }
+        # the scheduler runs in this process, so it reads the same settings
+        os.environ.update(app_env)
+
+        http_scenarios = [s for s in scenarios if s not in ("scheduler", "stream")]
+        if http_scenarios:
+            with run_server("app.main:app", env=app_env) as api:
+                for scenario in http_scenarios:
+                    for c in levels:
+                        res = asyncio.run(_drive_http(api, scenario, args.requests, c))
+                        report["results"].setdefault(scenario, {})[str(c)] = res
+                        print(f"[BENCH] {scenario:<9} c={c:<4} {res}", file=sys.stderr)
+
+        if "scheduler" in scenarios:
+            for c in levels:
+                res = asyncio.run(_drive_scheduler(args.wallets, c, args.ticks))
+                report["results"].setdefault("scheduler", {})[str(c)] = res
+                print(f"[BENCH] scheduler c={c:<4} {res}", file=sys.stderr)
+
+        if "stream" in scenarios:
+            # fast monitoring loop so updates flow during the run
+            stream_env = {**app_env, "SCHED_TICK_SECONDS": "1", "SCHED_MIN_INTERVAL_SECONDS": "1",
+                          "SCHED_INTERVAL_SECONDS": "2"}
+            with run_server("app.main:app", env=stream_env) as api:
+                res = asyncio.run(_drive_stream(api, args.subscribers, args.wallets,
+                                                args.stream_seconds, args.slow_fraction))
+            report["results"]["stream"] = {str(args.subscribers): res}
+            print(f"[BENCH] stream    n={args.subscribers:<4} {res}", file=sys.stderr)
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as fh:
+            fh.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as fh:
+            regressions = _compare(report, json.load(fh), args.tolerance)
+        for line in regressions:
+            print(f"[REGRESSION] {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+shard_failover.py
+
+Local multi-process failover test for the sharded monitor
+(tasks/sharding.py). Upstreams are the local stand-ins, the lease store
+is a fresh SQLite file.
+
+Timeline (each phase --phase-seconds):
+    start workers w1, w2, w3 → SIGKILL w2 → start w4 → stop everything
+
+Every worker logs each wallet it scores (wallet, worker, time). The run
+fails (exit 1) when:
+- dropped:       a wallet goes longer than the takeover bound without
+                 being scored (lease TTL + renew + interval + tick + slack),
+                 or is not scored at all in the last phase
+- double-scored: a wallet's owners interleave, i.e. a worker scores it
+                 again within one lease TTL of another worker taking it
+                 over (A, B, A). Exclusive ownership only ever hands a
+                 wallet forward, so interleaving means two workers held it.
+
+    python -m benchmarks.shard_failover --wallets 60 --phase-seconds 8
+"""
+
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+from benchmarks._mock_server import BACKEND_DIR, run_server
+
+LEASE_TTL = 4.0
+RENEW = 1.0
+INTERVAL = 1.0
+TICK = 0.5
+
+
+def _wallet(i: int) -> str:
+    return "0x" + f"{i:040x}"
+
+
+def _run_worker(args) -> None:
+    import asyncio
+
+    from app.services.http_client import http_session
+    from app.tasks.sharding import ShardedMonitor
+
+    with open(args.wallets_file) as fh:
+        wallets = [line.strip() for line in fh if line.strip()]
+    log = open(args.log, "a", buffering=1)
+
+    def record(wallet: str, _result: dict) -> None:
+        log.write(json.dumps({"w": wallet, "by": args.worker_id, "t": time.time()}) + "\n")
+
+    async def main():
+        async with http_session():
+            await ShardedMonitor(wallets, worker_id=args.worker_id, on_result=record).run_forever()
+
+    asyncio.run(main())
+
+
+def _analyze(log_path: str, wallets: list, end: float, last_phase_start: float,
+             bound: float) -> dict:
+    events = defaultdict(list)
+    with open(log_path) as fh:
+        for line in fh:
+            e = json.loads(line)
+            events[e["w"]].append((e["t"], e["by"]))
+
+    dropped, double, max_gap, handoffs, max_handoffs = [], [], 0.0, 0, 0
+    for w in wallets:
+        evs = sorted(events.get(w, []))
+        if not evs or evs[-1][0] < last_phase_start:
+            dropped.append(w)
+            continue
+        times = [t for t, _ in evs]
+        gaps = [b - a for a, b in zip(times, times[1:])] + [end - times[-1]]
+        gap = max(gaps)
+        max_gap = max(max_gap, gap)
+        if gap > bound:
+            dropped.append(w)
+
+        # owner segments: runs of consecutive events by the same worker
+        segments = []
+        for t, by in evs:
+            if segments and segments[-1][0] == by:
+                segments[-1][2] = t
+            else:
+                segments.append([by, t, t])
+        handoffs += len(segments) - 1
+        max_handoffs = max(max_handoffs, len(segments) - 1)
+        for i, (by, _, last) in enumerate(segments):
+            if any(other == by and start - last < LEASE_TTL for other, start, _ in segments[i + 2:]):
+                double.append(w)
+    return {
+        "wallets": len(wallets),
+        "events": sum(len(v) for v in events.values()),
+        "handoffs": handoffs,
+        "max_gap_s": round(max_gap, 3),
+        "gap_bound_s": bound,
+        "max_handoffs_per_wallet": max_handoffs,
+        "dropped": dropped,
+        "double_scored": sorted(set(double)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--wallets", type=int, default=60)
+    parser.add_argument("--phase-seconds", type=float, default=8.0)
+    parser.add_argument("--out", help="write the JSON report here (default: stdout)")
+    # internal: run one worker process
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--worker-id", help=argparse.SUPPRESS)
+    parser.add_argument("--wallets-file", help=argparse.SUPPRESS)
+    parser.add_argument("--log", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        _run_worker(args)
+        return
+
+    workdir = tempfile.mkdtemp(prefix="shard-")
+    wallets = [_wallet(i) for i in range(args.wallets)]
+    wallets_file = os.path.join(workdir, "wallets.txt")
+    with open(wallets_file, "w") as fh:
+        fh.write("\n".join(wallets) + "\n")
+    log_path = os.path.join(workdir, "scored.jsonl")
+    db_url = f"sqlite:///{os.path.join(workdir, 'risk.db')}"
+
+    with run_server("mock_asi:app") as asi, run_server("benchmarks.standins:app") as upstream:
+        env = {
+            **os.environ,
+            "ASI_ENDPOINT": f"{asi}/analyze",
+            "COINGECKO_BASE_URL": f"{upstream}/api/v3",
+            "AAVE_V2_SUBGRAPH_URL": f"{upstream}/subgraphs/name/aave/protocol-v2",
+            "AAVE_V3_SUBGRAPH_URL": f"{upstream}/subgraphs/name/aave/protocol-v3",
+            "DATABASE_URL": db_url,
+            "PRED_CACHE_ENABLED": "false",
+            "LIQ_INDEX_ENABLED": "false",
+            "SCHED_TICK_SECONDS": str(TICK),
+            "SCHED_MIN_INTERVAL_SECONDS": str(INTERVAL),
+            "SCHED_INTERVAL_SECONDS": str(int(INTERVAL)),
+            "SHARD_LEASE_TTL_SECONDS": str(LEASE_TTL),
+            "SHARD_RENEW_SECONDS": str(RENEW),
+        }
+        subprocess.run([sys.executable, "-c", "from app.db import init_db; init_db()"],
+                       cwd=BACKEND_DIR, env=env, check=True)
+
+        def spawn(worker_id: str) -> subprocess.Popen:
+            return subprocess.Popen(
+                [sys.executable, "-m", "benchmarks.shard_failover", "--worker",
+                 "--worker-id", worker_id, "--wallets-file", wallets_file, "--log", log_path],
+                cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL,
+                stderr=open(os.path.join(workdir, f"{worker_id}.log"), "w"),
+            )
+
+        procs = {w: spawn(w) for w in ("w1", "w2", "w3")}
+        timeline = [("start w1,w2,w3", time.time())]
+        try:
+            time.sleep(args.phase_seconds)
+            procs["w2"].send_signal(signal.SIGKILL)
+            timeline.append(("kill w2", time.time()))
+            time.sleep(args.phase_seconds)
+            procs["w4"] = spawn("w4")
+            timeline.append(("start w4", time.time()))
+            time.sleep(args.phase_seconds)
+        finally:
+            end = time.time()
+            for p in procs.values():
+                p.kill()
+                p.wait()
+
+    bound = LEASE_TTL + RENEW + INTERVAL + TICK + 1.5
+    report = _analyze(log_path, wallets, end, timeline[-1][1], bound)
+    report["timeline"] = [(name, round(t - timeline[0][1], 2)) for name, t in timeline]
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as fh:
+            fh.write(text + "\n")
+    else:
+        print(text)
+
+    failures = []
+    if report["dropped"]:
+        failures.append(f"{len(report['dropped'])} wallets dropped (gap > {bound}s)")
+    if report["double_scored"]:
+        failures.append(f"{len(report['double_scored'])} wallets double-scored")
+    for line in failures:
+        print(f"[FAILOVER] {line}", file=sys.stderr)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+standins.py
+
+Local stand-ins for the public upstreams, for offline benchmarks:
+
+- CoinGecko:  /api/v3/simple/price, /api/v3/coins/{id},
+              /api/v3/coins/{id}/market_chart
+- TheGraph:   POST /subgraphs/name/aave/protocol-v2|protocol-v3
+
+Latency, jitter and error rate use the same env knobs as mock_asi.py
+(MOCK_LATENCY_MS, MOCK_JITTER_MS, MOCK_ERROR_RATE). Run with e.g.
+    MOCK_LATENCY_MS=50 uvicorn benchmarks.standins:app --port 8002
+"""
+
+import asyncio
+import hashlib
+import math
+import os
+import random
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+app = FastAPI(title="Upstream stand-ins (CoinGecko + Aave subgraph)")
+
+MOCK_LATENCY_MS = float(os.getenv("MOCK_LATENCY_MS", "0"))
+MOCK_JITTER_MS = float(os.getenv("MOCK_JITTER_MS", "0"))
+MOCK_ERROR_RATE = float(os.getenv("MOCK_ERROR_RATE", "0"))
+
+BASE_PRICES = {"ethereum": 3000.0, "bitcoin": 60000.0, "uniswap": 8.0, "aave": 150.0,
+               "usd-coin": 1.0, "tether": 1.0, "dai": 1.0, "solana": 150.0,
+               "chainlink": 15.0, "wrapped-steth": 3500.0}
+STABLES = {"usd-coin", "tether", "dai"}
+STATS = {"requests": 0, "errors": 0}
+
+
+def _price(asset_id: str, ts: float) -> float:
+    base = BASE_PRICES.get(asset_id, 100.0)
+    if asset_id in STABLES:
+        return round(base * (1 + 0.0005 * math.sin(ts / 3600.0)), 6)
+    # deterministic wiggle so repeated runs see the same series
+    return round(base * (1 + 0.03 * math.sin(ts / 7200.0) + 0.01 * math.sin(ts / 600.0)), 4)
+
+
+async def _inject_faults():
+    STATS["requests"] += 1
+    delay = MOCK_LATENCY_MS + random.uniform(0, MOCK_JITTER_MS)
+    if delay > 0:
+        await asyncio.sleep(delay / 1000)
+    if MOCK_ERROR_RATE and random.random() < MOCK_ERROR_RATE:
+        STATS["errors"] += 1
+        return JSONResponse(status_code=503, content={"error": "injected failure"})
+    return None
+
+
+@app.get("/")
+def root():
+    return {"status": "ready", "stats": STATS}
+
+
+# --- CoinGecko ---------------------------------------------------------------
+@app.get("/api/v3/simple/price")
+async def simple_price(ids: str, vs_currencies: str = "usd", include_24hr_change: bool = False):
+    error = await _inject_faults()
+    if error is not None:
+        return error
+    now = time.time()
+    out = {}
+    for asset_id in ids.split(","):
+        out[asset_id] = {"usd": _price(asset_id, now)}
+        if include_24hr_change:
+            out[asset_id]["usd_24h_change"] = (_price(asset_id, now) / _price(asset_id, now - 86400) - 1) * 100
+    return out
+
+
+@app.get("/api/v3/coins/{asset_id}")
+async def coin(asset_id: str):
+    error = await _inject_faults()
+    if error is not None:
+        return error
+    now = time.time()
+    change = (_price(asset_id, now) / _price(asset_id, now - 86400) - 1) * 100
+    return {"id": asset_id, "market_data": {"price_change_percentage_24h": round(change, 4)}}
+
+
+@app.get("/api/v3/coins/{asset_id}/market_chart")
+async def market_chart(asset_id: str, vs_currency: str = "usd", days: float = 7):
+    error = await _inject_faults()
+    if error is not None:
+        return error
+    now = time.time()
+    step = 300 if days <= 7 else 3600
+    start = now - days * 86400
+    points = [[int((start + i * step) * 1000), _price(asset_id, start + i * step)]
+              for i in range(int(days * 86400 // step) + 1)]
+    return {"prices": points}
+
+
+# --- Aave subgraph -------------------------------------------------------------
+def _position(wallet: str):
+    """Deterministic synthetic position per wallet."""
+    h = int(hashlib.sha256(wallet.lower().encode()).hexdigest()[:8], 16)
+    collateral = 1 + (h % 1000) / 10.0
+    debt = collateral * ((h >> 10) % 80) / 100.0
+    return collateral, debt
+
+
+def _page(rows: list, variables: dict) -> list:
+    """Apply the id_gt cursor and `first` limit the batched queries use."""
+    rows = sorted(rows, key=lambda r: r["id"])
+    last_id = variables.get("lastId") or ""
+    first = int(variables.get("first") or 100)
+    return [r for r in rows if r["id"] > last_id][:first]
+
+
+@app.post("/subgraphs/name/aave/{version}")
+async def subgraph(version: str, request: Request):
+    body = await request.json()
+    error = await _inject_faults()
+    if error is not None:
+        return error
+
+    STATS["subgraph_queries"] = STATS.get("subgraph_queries", 0) + 1
+    query = body.get("query", "")
+    variables = body.get("variables") or {}
+    wallets = variables.get("ids") or variables.get("users") or []
+    if not wallets:
+        # legacy string-interpolated queries: pull the first quoted address
+        start = query.find('"0x')
+        if start >= 0:
+            wallets = [query[start + 1:query.find('"', start + 1)]]
+
+    if "userReserves" in query:
+        rows = []
+        eth_usd = _price("ethereum", time.time())
+        for w in wallets:
+            collateral, debt = _position(w)
+            # WETH collateral against USDC debt, in base units
+            rows.append({"id": f"{w.lower()}-usdc", "user": {"id": w.lower()},
+                         "reserve": {"symbol": "USDC", "decimals": "6", "liquidityRate": "0"},
+                         "scaledATokenBalance": "0",
+                         "currentTotalDebt": str(int(debt * eth_usd * 10 ** 6))})
+            rows.append({"id": f"{w.lower()}-weth", "user": {"id": w.lower()},
+                         "reserve": {"symbol": "WETH", "decimals": "18", "liquidityRate": "0"},
+                         "scaledATokenBalance": str(int(collateral * 10 ** 18)),
+                         "currentTotalDebt": "0"})
+        return {"data": {"userReserves": _page(rows, variables)}}
+
+    users = []
+    for w in wallets:
+        collateral, debt = _position(w)
+        users.append({"id": w.lower(), "totalCollateralETH": str(collateral),
+                      "totalBorrowsETH": str(debt)})
+    return {"data": {"users": _page(users, variables)}}
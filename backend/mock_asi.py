@@ -1,21 +1,36 @@
 # backend/mock_asi.py
 from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+import ast
+import asyncio
+import json
+import os
 import random
 
 app = FastAPI(title="Mock ASI Engine")
 
-@app.get("/")
-def root():
-    return {
-        "message": "🤖 Mock ASI Engine is running",
-        "status": "ready",
-        "endpoint": "/analyze"
-    }
+# Fault injection for local benchmarks (all optional)
+MOCK_LATENCY_MS = float(os.getenv("MOCK_LATENCY_MS", "0"))
+MOCK_JITTER_MS = float(os.getenv("MOCK_JITTER_MS", "0"))
+MOCK_ERROR_RATE = float(os.getenv("MOCK_ERROR_RATE", "0"))
 
-@app.post("/analyze")
-async def analyze(request: Request):
-    data = await request.json()
+# Scoring changed in this series: the mock now scores the features under
+# "inputs" (what risk_model actually sends). The original mock read the
+# top-level body, so every field fell back to its default and scores sat
+# around 35 +/- 5 regardless of the position. Set MOCK_LEGACY_SCORING=1 to
+# keep benchmark baselines comparable with runs against the original mock.
+MOCK_LEGACY_SCORING = os.getenv("MOCK_LEGACY_SCORING", "0") == "1"
+
+# Request / token counters (GET /stats)
+STATS = {"requests": 0, "chat_requests": 0, "prompt_tokens": 0, "completion_tokens": 0}
 
+
+def _features(data: dict) -> dict:
+    """The scored fields: the "inputs" envelope unless MOCK_LEGACY_SCORING is set."""
+    return data if MOCK_LEGACY_SCORING else data.get("inputs", data)
+
+
+def _score(data: dict):
     volatility = data.get("volatility", 0.5)
     collateral = data.get("collateral_ratio", 1.0)
     leverage = data.get("leverage", 1.0)
@@ -38,13 +53,96 @@ async def analyze(request: Request):
         risk_class = "🟡 Medium Risk"
     else:
         risk_class = "🔴 High Risk"
+    return risk_score, risk_class
+
+
+async def _inject_faults():
+    """Sleep for the configured latency; return an error response or None."""
+    STATS["requests"] += 1
+    delay = MOCK_LATENCY_MS + random.uniform(0, MOCK_JITTER_MS)
+    if delay > 0:
+        await asyncio.sleep(delay / 1000)
+    if MOCK_ERROR_RATE and random.random() < MOCK_ERROR_RATE:
+        return JSONResponse(status_code=503, content={"error": "injected failure"})
+    return None
 
+
+@app.get("/")
+def root():
+    return {
+        "message": "🤖 Mock ASI Engine is running",
+        "status": "ready",
+        "endpoint": "/analyze"
+    }
+
+
+@app.get("/stats")
+def stats():
+    return STATS
+
+
+@app.post("/analyze")
+async def analyze(request: Request):
+    # risk_model sends {"inputs": {...}, "context": {...}}
+    data = _features(await request.json())
+
+    error = await _inject_faults()
+    if error is not None:
+        return error
+
+    risk_score, risk_class = _score(data)
     return {
         "risk_probability": risk_score,
         "risk_class": risk_class,
         "message": f"Risk Score: {risk_score} — {risk_class}"
     }
 
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    """
+    Local stand-in for ASI:One's chat-completions API. Understands the
+    single-portfolio prompt from asi_client and the batched JSON prompt
+    from asi_batcher.
+    """
+    body = await request.json()
+    STATS["chat_requests"] += 1
+    error = await _inject_faults()
+    if error is not None:
+        return error
+
+    prompt = body["messages"][-1]["content"]
+    head, _, rest = prompt.partition("\n")
+    if head.startswith("Portfolios:"):
+        portfolios = json.loads(rest)
+        results = []
+        for p in portfolios:
+            risk_score, risk_class = _score(p)
+            results.append({"id": p["id"], "risk_probability": risk_score, "risk_class": risk_class})
+        content = json.dumps({"results": results})
+    else:
+        try:
+            data = ast.literal_eval(rest.strip())
+        except (ValueError, SyntaxError):
+            data = {}
+        risk_score, risk_class = _score(_features(data))
+        content = f"Risk probability: {risk_score}. Classification: {risk_class}."
+
+    prompt_tokens = sum(len(m["content"]) for m in body["messages"]) // 4
+    completion_tokens = len(content) // 4
+    STATS["prompt_tokens"] += prompt_tokens
+    STATS["completion_tokens"] += completion_tokens
+    return {
+        "id": "mock-chat",
+        "object": "chat.completion",
+        "model": body.get("model", "asi1-mini"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                     "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                  "total_tokens": prompt_tokens + completion_tokens},
+    }
+
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="127.0.0.1", port=8001)
+    uvicorn.run(app, host="127.0.0.1", port=int(os.getenv("MOCK_PORT", "8001")))